@@ -3,6 +3,7 @@ from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.fund import Fund, FundGroup, FavoriteFundRelation
+from app.utils.estimate import get_estimate_snapshot
 
 api = Namespace('favorites', description='自选功能相关操作')
 
@@ -70,6 +71,7 @@ class FavoriteList(Resource):
         
         # 获取用户的所有分组
         groups = FundGroup.query.filter_by(user_id=current_user_id).order_by(FundGroup.order_index).all()
+        estimates = get_estimate_snapshot()
         
         result = []
         
@@ -103,7 +105,8 @@ class FavoriteList(Resource):
                             'fund_code': fund.fund_code,
                             'fund_name': fund.fund_name,
                             'fund_type': fund.fund_type,
-                            'risk_level': fund.risk_level
+                            'risk_level': fund.risk_level,
+                            'estimate': estimates.get(fund.fund_code)
                         },
                         'group': {
                             'id': group.id,
@@ -1,8 +1,26 @@
-from flask import request
+import hashlib
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
-from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models.fund import Fund, FundMarketData, FundGroup, FavoriteFundRelation
+from app.models.fund import Fund, FundLatestQuote, FundPeerRank
+from app.utils.search import apply_fund_search
+from app.utils.suggest import get_suggest_index
+from app.utils.pagination import keyset_paginate, InvalidCursor
+from app.utils.nav_store import get_nav_series
+from app.utils.downsample import downsample_nav_series, get_downsample_cache
+from app.utils.market_snapshot import get_market_quote, get_market_quotes
+from app.utils.http import conditional, make_etag
+from app.utils.compare import align_series, normalize, comparison_statistics
+from app.utils.risk import get_risk_metrics, serialize_risk_metrics
+from app.utils.correlation import get_correlated_funds
+from app.utils.estimate import get_estimate_snapshot
+from app.utils.screener import parse_filter, parse_sort, InvalidScreen
+from app.utils.peer_rank import (
+    PERIOD_BY_COLUMN, get_peer_rank, get_peer_ranks, rank_label, period_percentile, serialize_peer_ranks
+)
 
 api = Namespace('funds', description='基金数据相关操作')
 
@@ -29,7 +47,9 @@ fund_detail_model = api.model('FundDetail', {
     'net_asset_value': fields.String(description='基金规模'),
     'management_fee': fields.String(description='管理费率'),
     'custody_fee': fields.String(description='托管费率'),
-    'market_data': fields.Raw(description='市场数据')
+    'market_data': fields.Raw(description='市场数据'),
+    'peer_ranks': fields.Raw(description='各区间同类排名'),
+    'estimate': fields.Raw(description='盘中估值，没有持仓数据时为 null')
 })
 
 fund_list_model = api.model('FundList', {
@@ -39,32 +59,178 @@ fund_list_model = api.model('FundList', {
     'pages': fields.Integer,
     'per_page': fields.Integer,
     'has_next': fields.Boolean,
+    'has_prev': fields.Boolean,
+    'next_cursor': fields.String(description='下一页游标（游标分页模式）'),
+    'prev_cursor': fields.String(description='上一页游标（游标分页模式）')
+})
+
+fund_suggestion_model = api.model('FundSuggestion', {
+    'fund_code': fields.String(required=True, description='基金代码'),
+    'fund_name': fields.String(required=True, description='基金名称'),
+    'match_type': fields.String(description='匹配方式: code/name/pinyin/initials')
+})
+
+fund_suggestion_list_model = api.model('FundSuggestionList', {
+    'items': fields.List(fields.Nested(fund_suggestion_model))
+})
+
+fund_screen_item_model = api.inherit('FundScreenItem', fund_model, {
+    'net_value': fields.String(description='最新净值'),
+    'daily_change_rate': fields.String(description='日涨跌幅'),
+    'weekly_change_rate': fields.String(description='周涨跌幅'),
+    'monthly_change_rate': fields.String(description='月涨跌幅'),
+    'quarterly_change_rate': fields.String(description='季度涨跌幅'),
+    'yearly_change_rate': fields.String(description='年涨跌幅'),
+    'three_year_change_rate': fields.String(description='三年涨跌幅'),
+    'update_time': fields.DateTime(description='行情更新时间'),
+    'performance_rank': fields.String(description='排序区间（默认近一年）的同类排名'),
+    'peer_percentile': fields.Float(description='排序区间的超越同类百分比')
+})
+
+fund_screen_list_model = api.model('FundScreenList', {
+    'items': fields.List(fields.Nested(fund_screen_item_model)),
+    'total': fields.Integer,
+    'page': fields.Integer,
+    'pages': fields.Integer,
+    'per_page': fields.Integer,
+    'has_next': fields.Boolean,
     'has_prev': fields.Boolean
 })
 
+fund_batch_model = api.model('FundBatchRequest', {
+    'fund_codes': fields.List(fields.String, required=True, description='基金代码列表')
+})
+
+# 基金对比的时间范围（自然日数，None 表示成立以来）
+COMPARE_RANGES = {
+    '1w': 7,
+    '1m': 30,
+    '3m': 91,
+    '6m': 182,
+    '1y': 365,
+    '3y': 1095,
+    '5y': 1826,
+    'all': None
+}
+
+# 游标分页支持的排序键，最后一列为唯一的 fund_code
+CURSOR_SORT_COLUMNS = {
+    'fund_code': [Fund.fund_code],
+    'fund_name': [Fund.fund_name, Fund.fund_code]
+}
+
+def serialize_fund(fund):
+    return {
+        'id': fund.id,
+        'fund_code': fund.fund_code,
+        'fund_name': fund.fund_name,
+        'fund_type': fund.fund_type,
+        'risk_level': fund.risk_level,
+        'company': fund.company,
+        'net_asset_value': str(fund.net_asset_value) if fund.net_asset_value else None,
+        'management_fee': str(fund.management_fee) if fund.management_fee else None,
+        'custody_fee': str(fund.custody_fee) if fund.custody_fee else None
+    }
+
+def serialize_fund_detail(fund, market_data):
+    """基金详情：基金资料 + 最新行情（market_data 为 FundLatestQuote 或行情快照中的 LatestQuote，可为空）"""
+    return {
+        **serialize_fund(fund),
+        'market_data': {
+            'id': market_data.market_data_id,
+            'fund_code': market_data.fund_code,
+            'net_value': str(market_data.net_value),
+            'daily_change': str(market_data.daily_change),
+            'daily_change_rate': str(market_data.daily_change_rate),
+            'weekly_change_rate': str(market_data.weekly_change_rate),
+            'monthly_change_rate': str(market_data.monthly_change_rate),
+            'quarterly_change_rate': str(market_data.quarterly_change_rate),
+            'yearly_change_rate': str(market_data.yearly_change_rate),
+            'three_year_change_rate': str(market_data.three_year_change_rate),
+            'update_time': market_data.update_time.isoformat() if market_data.update_time else None
+        } if market_data else None
+    }
+
+def parse_fund_codes(values, max_codes=None):
+    """整理基金代码列表：支持逗号分隔，去除空白和重复并保持顺序，超过上限时返回400"""
+    codes = []
+    seen = set()
+    for value in values:
+        for code in str(value).split(','):
+            code = code.strip()
+            if code and code not in seen:
+                seen.add(code)
+                codes.append(code)
+    
+    if not codes:
+        api.abort(400, '基金代码不能为空')
+    max_codes = max_codes or current_app.config['FUND_BATCH_MAX_CODES']
+    if len(codes) > max_codes:
+        api.abort(400, f'单次最多查询{max_codes}只基金')
+    return codes
+
+def parse_date_arg(name):
+    """解析 YYYY-MM-DD 格式的查询参数，格式错误时返回400"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        api.abort(400, f'日期格式错误: {name}，应为YYYY-MM-DD')
+
+def _round_values(values, digits):
+    return [None if value != value else round(value, digits) for value in np.asarray(values).tolist()]
+
+def _format_values(values, digits):
+    return [None if np.isnan(value) else f'{value:.{digits}f}' for value in values.tolist()]
+
+def serialize_nav_series(series):
+    """将净值序列转换为接口返回的数据点列表"""
+    return [
+        {
+            'date': nav_date,
+            'net_value': net_value,
+            'accumulated_value': accumulated_value,
+            'daily_change': daily_change,
+            'daily_change_rate': daily_change_rate
+        }
+        for nav_date, net_value, accumulated_value, daily_change, daily_change_rate in zip(
+            np.datetime_as_string(series.dates, unit='D').tolist(),
+            _format_values(series.net_values, 4),
+            _format_values(series.accumulated_values, 4),
+            _format_values(series.daily_changes, 4),
+            _format_values(series.daily_change_rates, 2)
+        )
+    ]
+
 @api.route('/')
 class FundList(Resource):
     @api.doc('list_funds')
     @api.marshal_with(fund_list_model)
     def get(self):
-        """获取基金列表（支持分页和筛选）"""
+        """获取基金列表（支持分页和筛选，传入 cursor 参数时使用游标分页）"""
         page = request.args.get('page', 1, type=int)
         per_page = min(request.args.get('per_page', 20, type=int), 100)
         fund_type = request.args.get('type')
         search = request.args.get('search')
+        cursor = request.args.get('cursor')
         
         query = Fund.query
         
         if fund_type:
             query = query.filter(Fund.fund_type == fund_type)
         
+        if cursor is not None:
+            return self._cursor_page(query, cursor, per_page, fund_type, search)
+        
         if search:
-            query = query.filter(Fund.fund_name.contains(search) | Fund.fund_code.contains(search))
+            query = apply_fund_search(query, search)
         
         funds = query.paginate(page=page, per_page=per_page, error_out=False)
         
         result = {
-            'items': [],
+            'items': [serialize_fund(fund) for fund in funds.items],
             'total': funds.total,
             'page': funds.page,
             'pages': funds.pages,
@@ -73,59 +239,239 @@ class FundList(Resource):
             'has_prev': funds.has_prev
         }
         
-        for fund in funds.items:
-            fund_data = {
-                'id': fund.id,
-                'fund_code': fund.fund_code,
-                'fund_name': fund.fund_name,
-                'fund_type': fund.fund_type,
-                'risk_level': fund.risk_level,
-                'company': fund.company,
-                'net_asset_value': str(fund.net_asset_value) if fund.net_asset_value else None,
-                'management_fee': str(fund.management_fee) if fund.management_fee else None,
-                'custody_fee': str(fund.custody_fee) if fund.custody_fee else None
-            }
-            result['items'].append(fund_data)
-        
         return result
+    
+    def _cursor_page(self, query, cursor, per_page, fund_type, search):
+        """游标分页：按 (sort, fund_code) 定位，不做 OFFSET，总数仅在 with_total=true 时计算"""
+        sort = request.args.get('sort', 'fund_code')
+        order = request.args.get('order', 'asc')
+        with_total = request.args.get('with_total', 'false').lower() in ['true', '1', 'yes']
+        
+        if sort not in CURSOR_SORT_COLUMNS:
+            api.abort(400, f'不支持的排序字段: {sort}')
+        if order not in ('asc', 'desc'):
+            api.abort(400, f'不支持的排序方向: {order}')
+        
+        if search:
+            query = apply_fund_search(query, search, ranked=False)
+        
+        columns = CURSOR_SORT_COLUMNS[sort]
+        signature = hashlib.md5(f'{sort}|{order}|{fund_type or ""}|{search or ""}'.encode('utf-8')).hexdigest()[:12]
+        
+        try:
+            funds = keyset_paginate(
+                query,
+                columns,
+                key_func=lambda fund: [getattr(fund, column.key) for column in columns],
+                per_page=per_page,
+                cursor=cursor,
+                descending=order == 'desc',
+                signature=signature
+            )
+        except InvalidCursor as e:
+            api.abort(400, str(e))
+        
+        return {
+            'items': [serialize_fund(fund) for fund in funds.items],
+            'total': query.count() if with_total else None,
+            'per_page': funds.per_page,
+            'has_next': funds.has_next,
+            'has_prev': funds.has_prev,
+            'next_cursor': funds.next_cursor,
+            'prev_cursor': funds.prev_cursor
+        }
+
+@api.route('/screen')
+class FundScreen(Resource):
+    @api.doc('screen_funds', params={
+        'filter': '筛选表达式，如 fund_type=股票型|混合型;risk_level=R3;management_fee<=0.015;yearly_change_rate>=10',
+        'sort': '排序字段，逗号分隔，前缀 - 表示降序，如 -yearly_change_rate',
+        'q': '基金代码或名称关键词',
+        'page': '页码',
+        'per_page': '每页数量，最大100'
+    })
+    @api.marshal_with(fund_screen_list_model)
+    def get(self):
+        """多条件筛选有行情的基金（基金资料 + 最新行情，按任意区间收益排序）"""
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        q = request.args.get('q')
+        
+        try:
+            conditions = parse_filter(request.args.get('filter'))
+            order_by = parse_sort(request.args.get('sort', '-yearly_change_rate'))
+        except InvalidScreen as e:
+            api.abort(400, str(e))
+        
+        # 内连接最新行情：只筛选有行情的基金，并允许按收益列的索引顺序扫描
+        query = db.session.query(Fund, FundLatestQuote).join(
+            FundLatestQuote, FundLatestQuote.fund_code == Fund.fund_code
+        ).filter(*conditions)
+        if q:
+            query = apply_fund_search(query, q, ranked=False)
+        
+        result = query.order_by(*order_by).paginate(page=page, per_page=per_page, error_out=False)
+        
+        # 同类排名取排序所用的收益区间，未按收益排序时取近一年
+        sort_field = request.args.get('sort', '-yearly_change_rate').split(',')[0].strip().lstrip('+-')
+        period = PERIOD_BY_COLUMN.get(sort_field, 'yearly')
+        peer_ranks = get_peer_ranks([fund.fund_code for fund, _ in result.items])
+        
+        items = []
+        for fund, quote in result.items:
+            item = serialize_fund(fund)
+            for column in ('net_value', 'daily_change_rate', 'weekly_change_rate', 'monthly_change_rate',
+                           'quarterly_change_rate', 'yearly_change_rate', 'three_year_change_rate'):
+                value = getattr(quote, column) if quote else None
+                item[column] = str(value) if value is not None else None
+            item['update_time'] = quote.update_time if quote else None
+            item['performance_rank'] = rank_label(peer_ranks.get(fund.fund_code), period)
+            item['peer_percentile'] = period_percentile(peer_ranks.get(fund.fund_code), period)
+            items.append(item)
+        
+        return {
+            'items': items,
+            'total': result.total,
+            'page': result.page,
+            'pages': result.pages,
+            'per_page': result.per_page,
+            'has_next': result.has_next,
+            'has_prev': result.has_prev
+        }
+
+@api.route('/batch')
+class FundBatch(Resource):
+    @api.doc('get_funds_batch', params={'codes': '基金代码，逗号分隔'})
+    def get(self):
+        """批量获取基金详情（codes=000001,000002）"""
+        return self._details(parse_fund_codes(request.args.getlist('codes')))
+    
+    @api.doc('post_funds_batch')
+    @api.expect(fund_batch_model)
+    def post(self):
+        """批量获取基金详情（请求体传入基金代码列表，适合代码较多的场景）"""
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            api.abort(400, '请求体必须为 JSON 对象')
+        fund_codes = data.get('fund_codes')
+        if not isinstance(fund_codes, list):
+            api.abort(400, 'fund_codes 必须为基金代码列表')
+        return self._details(parse_fund_codes(fund_codes))
+    
+    @staticmethod
+    def _details(codes):
+        """一次集合查询取基金资料，最新行情从行情快照读取，按基金代码返回"""
+        funds = Fund.query.filter(Fund.fund_code.in_(codes)).all()
+        quotes = get_market_quotes(codes)
+        
+        found = {fund.fund_code: fund for fund in funds}
+        return {
+            'items': {
+                code: serialize_fund_detail(found[code], quotes.get(code))
+                for code in codes if code in found
+            },
+            'missing': [code for code in codes if code not in found]
+        }
+
+@api.route('/compare')
+class FundCompare(Resource):
+    @api.doc('compare_funds', params={'codes': '基金代码，逗号分隔', 'range': '时间范围: 1w/1m/3m/6m/1y/3y/5y/all，默认1y'})
+    def get(self):
+        """多基金业绩对比：净值按共同交易日对齐并归一化到1.0，附区间收益、波动率、最大回撤和相关系数"""
+        max_codes = current_app.config['FUND_COMPARE_MAX_CODES']
+        codes = parse_fund_codes(request.args.getlist('codes'), max_codes=max_codes)
+        range_key = request.args.get('range', '1y')
+        
+        if len(codes) < 2:
+            api.abort(400, '至少需要两只基金进行对比')
+        if range_key not in COMPARE_RANGES:
+            api.abort(400, f'不支持的时间范围: {range_key}，可选值为 {"/".join(COMPARE_RANGES)}')
+        
+        names = dict(db.session.query(Fund.fund_code, Fund.fund_name).filter(Fund.fund_code.in_(codes)).all())
+        missing = [code for code in codes if code not in names]
+        if missing:
+            api.abort(404, f'基金不存在: {",".join(missing)}')
+        
+        series_list = [get_nav_series(code) for code in codes]
+        last_dates = [series.last_date for series in series_list]
+        
+        # 以各基金最新净值日中最早的一天为终点，保证区间末尾所有基金都有数据
+        end = min(last_dates) if all(last_dates) else None
+        days = COMPARE_RANGES[range_key]
+        if end is not None:
+            start = end - timedelta(days=days) if days else None
+            series_list = [series.slice(start, end) for series in series_list]
+        
+        dates, matrix = align_series(series_list)
+        normalized = normalize(matrix)
+        stats, correlation = comparison_statistics(dates, normalized)
+        
+        stat_lists = {name: _round_values(values, 2) for name, values in stats.items()}
+        return {
+            'range': range_key,
+            'start_date': str(dates[0]) if len(dates) else None,
+            'end_date': str(dates[-1]) if len(dates) else None,
+            'dates': np.datetime_as_string(dates, unit='D').tolist(),
+            'series': [
+                {
+                    'fund_code': code,
+                    'fund_name': names[code],
+                    'values': _round_values(normalized[i], 4)
+                }
+                for i, code in enumerate(codes)
+            ],
+            'summary': [
+                {
+                    'fund_code': code,
+                    'fund_name': names[code],
+                    **{name: values[i] for name, values in stat_lists.items()}
+                }
+                for i, code in enumerate(codes)
+            ],
+            'correlation': [_round_values(row, 4) for row in correlation]
+        }
+
+def fund_detail_version(resource, fund_code):
+    """基金详情的版本：基金资料更新时间 + 同类排名计算时间（一次主键查询）+ 行情快照中的最新行情记录"""
+    row = db.session.query(Fund.updated_at, FundPeerRank.computed_at).outerjoin(
+        FundPeerRank, FundPeerRank.fund_code == Fund.fund_code
+    ).filter(Fund.fund_code == fund_code).first()
+    
+    if row is None:
+        return None
+    
+    # 与响应体读取同一份行情，避免版本与内容不一致
+    quote = get_market_quote(fund_code)
+    market_data_id = quote.market_data_id if quote is not None else None
+    update_time = quote.update_time if quote is not None else None
+    
+    # 盘中估值随证券行情变化，按估值内容参与版本
+    estimates = get_estimate_snapshot()
+    estimate = estimates.get(fund_code)
+    estimate_time = estimates.estimate_time if estimate is not None else None
+    timestamps = [value for value in (row.updated_at, update_time, row.computed_at, estimate_time) if value is not None]
+    etag = make_etag(
+        'fund', fund_code, row.updated_at, market_data_id, update_time, row.computed_at,
+        estimate and estimate['estimated_change_rate'], estimate and estimate['coverage'], estimate_time
+    )
+    return etag, max(timestamps) if timestamps else None
 
 @api.route('/<string:fund_code>')
 @api.param('fund_code', '基金代码')
 class FundDetail(Resource):
     @api.doc('get_fund')
+    @conditional(fund_detail_version)
     @api.marshal_with(fund_detail_model)
     def get(self, fund_code):
         """获取单个基金的详细信息"""
         fund = Fund.query.filter_by(fund_code=fund_code).first_or_404()
         
         # 获取最新的市场数据
-        market_data = FundMarketData.query.filter_by(fund_code=fund_code).order_by(FundMarketData.update_time.desc()).first()
-        
-        result = {
-            'id': fund.id,
-            'fund_code': fund.fund_code,
-            'fund_name': fund.fund_name,
-            'fund_type': fund.fund_type,
-            'risk_level': fund.risk_level,
-            'company': fund.company,
-            'net_asset_value': str(fund.net_asset_value) if fund.net_asset_value else None,
-            'management_fee': str(fund.management_fee) if fund.management_fee else None,
-            'custody_fee': str(fund.custody_fee) if fund.custody_fee else None,
-            'market_data': {
-                'id': market_data.id if market_data else None,
-                'fund_code': market_data.fund_code if market_data else None,
-                'net_value': str(market_data.net_value) if market_data else None,
-                'daily_change': str(market_data.daily_change) if market_data else None,
-                'daily_change_rate': str(market_data.daily_change_rate) if market_data else None,
-                'weekly_change_rate': str(market_data.weekly_change_rate) if market_data else None,
-                'monthly_change_rate': str(market_data.monthly_change_rate) if market_data else None,
-                'quarterly_change_rate': str(market_data.quarterly_change_rate) if market_data else None,
-                'yearly_change_rate': str(market_data.yearly_change_rate) if market_data else None,
-                'three_year_change_rate': str(market_data.three_year_change_rate) if market_data else None,
-                'update_time': market_data.update_time.isoformat() if market_data else None
-            } if market_data else None
-        }
+        market_data = get_market_quote(fund_code)
         
+        result = serialize_fund_detail(fund, market_data)
+        result['peer_ranks'] = serialize_peer_ranks(get_peer_rank(fund_code))
+        result['estimate'] = get_estimate_snapshot().get(fund_code)
         return result
 
 @api.route('/search')
@@ -141,12 +487,10 @@ class FundSearch(Resource):
         if not q:
             api.abort(400, '搜索关键词不能为空')
         
-        funds = Fund.query.filter(
-            Fund.fund_name.contains(q) | Fund.fund_code.contains(q)
-        ).paginate(page=page, per_page=per_page, error_out=False)
+        funds = apply_fund_search(Fund.query, q).paginate(page=page, per_page=per_page, error_out=False)
         
         result = {
-            'items': [],
+            'items': [serialize_fund(fund) for fund in funds.items],
             'total': funds.total,
             'page': funds.page,
             'pages': funds.pages,
@@ -155,43 +499,137 @@ class FundSearch(Resource):
             'has_prev': funds.has_prev
         }
         
-        for fund in funds.items:
-            fund_data = {
-                'id': fund.id,
-                'fund_code': fund.fund_code,
-                'fund_name': fund.fund_name,
-                'fund_type': fund.fund_type,
-                'risk_level': fund.risk_level,
-                'company': fund.company,
-                'net_asset_value': str(fund.net_asset_value) if fund.net_asset_value else None,
-                'management_fee': str(fund.management_fee) if fund.management_fee else None,
-                'custody_fee': str(fund.custody_fee) if fund.custody_fee else None
-            }
-            result['items'].append(fund_data)
-        
         return result
 
+@api.route('/suggest')
+class FundSuggest(Resource):
+    @api.doc('suggest_funds')
+    @api.marshal_with(fund_suggestion_list_model)
+    def get(self):
+        """基金输入联想（支持代码前缀、名称前缀、全拼和拼音首字母）"""
+        q = request.args.get('q', '')
+        limit = min(request.args.get('limit', 10, type=int), 50)
+        
+        if not q.strip():
+            api.abort(400, '联想关键词不能为空')
+        
+        return {'items': get_suggest_index().suggest(q, limit=max(limit, 1))}
+
 @api.route('/<string:fund_code>/history')
 @api.param('fund_code', '基金代码')
 class FundHistory(Resource):
     @api.doc('get_fund_history')
     def get(self, fund_code):
-        """获取基金历史净值数据"""
+        """获取基金历史净值数据（支持最近N天或起止日期区间，points/resolution 参数按 LTTB 降采样）"""
         days = request.args.get('days', 30, type=int)
+        start = parse_date_arg('start')
+        end = parse_date_arg('end')
+        points = self._target_points()
+        
+        if db.session.query(Fund.id).filter_by(fund_code=fund_code).first() is None:
+            api.abort(404, '基金不存在')
+        
+        full_series = series = get_nav_series(fund_code)
+        
+        if end is None:
+            # 以最新一个净值日为区间终点，避免非交易日查询结果为空
+            end = series.last_date
+        
+        if end is not None:
+            if start is None:
+                start = end - timedelta(days=max(days, 1) - 1)
+            if start > end:
+                api.abort(400, '开始日期不能晚于结束日期')
+            # 在列式数组上二分定位区间，返回视图而非逐行构造对象
+            series = series.slice(start, end)
+        
+        if start and end and (request.args.get('start') or request.args.get('end')):
+            time_range = f'{start.isoformat()} 至 {end.isoformat()}'
+        else:
+            time_range = f'最近{days}天'
+        
+        total_points = len(series)
+        if points is not None and total_points > points:
+            # 同一区间和点数的降采样结果按源序列缓存，新净值到达后源序列变化即失效
+            cache = get_downsample_cache()
+            cache_key = (fund_code, start, end, points)
+            cached = cache.get(cache_key)
+            if cached is not None and cached[0] is full_series:
+                history = cached[1]
+            else:
+                history = serialize_nav_series(downsample_nav_series(series, points))
+                cache.set(cache_key, (full_series, history))
+        else:
+            history = serialize_nav_series(series)
         
-        # 这里简化处理，实际应用中需要查询历史净值数据表
-        # 暂时返回模拟数据
         history_data = {
             'fund_code': fund_code,
-            'history': [
-                {
-                    'date': '2023-10-01',
-                    'net_value': '2.3567',
-                    'daily_change': '0.035',
-                    'daily_change_rate': '0.015'
-                }
-            ],
-            'time_range': f'最近{days}天'
+            'history': history,
+            'total_points': total_points,
+            'downsampled': len(history) < total_points,
+            'start_date': start.isoformat() if start else None,
+            'end_date': end.isoformat() if end else None,
+            'time_range': time_range
         }
         
-        return history_data
\ No newline at end of file
+        return history_data
+    
+    @staticmethod
+    def _target_points():
+        """解析 points / resolution 参数，返回目标点数；均未指定时返回 None"""
+        resolution = request.args.get('resolution')
+        points = request.args.get('points', type=int)
+        
+        if resolution:
+            resolutions = current_app.config['NAV_CHART_RESOLUTIONS']
+            if resolution not in resolutions:
+                api.abort(400, f'不支持的分辨率: {resolution}，可选值为 {"/".join(resolutions)}')
+            points = resolutions[resolution]
+        
+        if points is None:
+            return None
+        if points < 3:
+            api.abort(400, '数据点数量不能小于3')
+        return min(points, current_app.config['NAV_CHART_MAX_POINTS'])
+
+@api.route('/<string:fund_code>/risk')
+@api.param('fund_code', '基金代码')
+class FundRisk(Resource):
+    @api.doc('get_fund_risk')
+    def get(self, fund_code):
+        """获取基金风险评估指标（每日批量计算，按主键读取）"""
+        fund = Fund.query.filter_by(fund_code=fund_code).first_or_404()
+        
+        return {
+            'fund_code': fund.fund_code,
+            'fund_name': fund.fund_name,
+            'risk_level': fund.risk_level,
+            'metrics': serialize_risk_metrics(get_risk_metrics(fund_code))
+        }
+
+@api.route('/<string:fund_code>/correlated')
+@api.param('fund_code', '基金代码')
+class FundCorrelated(Resource):
+    @api.doc('get_correlated_funds')
+    @api.param('limit', '返回数量（默认10）', type=int)
+    def get(self, fund_code):
+        """获取日收益相关性最高的基金（每日批量计算，按主键前缀读取）"""
+        fund = Fund.query.filter_by(fund_code=fund_code).first_or_404()
+        limit = request.args.get('limit', 10, type=int)
+        limit = max(min(limit, current_app.config['CORRELATION_TOP_K']), 1)
+        
+        rows = get_correlated_funds(fund_code, limit)
+        items = [{
+            'fund_code': correlation.related_code,
+            'fund_name': fund_name,
+            'correlation': float(correlation.correlation),
+            'overlap_days': correlation.overlap_days
+        } for correlation, fund_name in rows]
+        
+        return {
+            'fund_code': fund.fund_code,
+            'fund_name': fund.fund_name,
+            'window_days': current_app.config['CORRELATION_WINDOW_DAYS'],
+            'computed_at': rows[0][0].computed_at.isoformat() if rows else None,
+            'items': items
+        }
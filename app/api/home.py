@@ -1,11 +1,16 @@
-from flask import request
+from datetime import datetime
+
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models.user import User, UserProfile
-from app.models.transaction import Holding, Transaction
-from app.models.fund import Fund, FundMarketData, FavoriteFundRelation
-from app.models.notification import Notification
+from app.models.transaction import Holding
+from app.models.fund import Fund, FundLatestQuote
+from app.utils.home_overview import (
+    DEFAULT_RISK_LEVEL, get_overview_cache, get_overview_state, get_recommendation_cache, holdings_key,
+    recommendation_key
+)
+from app.utils.peer_rank import get_peer_ranks, rank_label
+from app.utils.index_quotes import get_index_snapshot, serialize_index
 
 api = Namespace('home', description='首页相关操作')
 
@@ -65,136 +70,143 @@ home_overview_model = api.model('HomeOverview', {
     'update_time': fields.DateTime(required=True, description='更新时间')
 })
 
+QUICK_ACTIONS = [
+    {
+        'id': 'trade_buy',
+        'name': '买入',
+        'icon': 'buy',
+        'url': '/trade/buy',
+        'order': 1
+    },
+    {
+        'id': 'trade_sell',
+        'name': '卖出',
+        'icon': 'sell',
+        'url': '/trade/sell',
+        'order': 2
+    },
+    {
+        'id': 'add_favorite',
+        'name': '自选',
+        'icon': 'favorite',
+        'url': '/favorites',
+        'order': 3
+    }
+]
+
+def build_holdings_overview(user_id):
+    """构建资产概览和持仓概览：持仓 ⨝ 基金一次查询"""
+    # 获取用户资产概览和持仓概览
+    holdings = db.session.query(Holding, Fund.fund_name).outerjoin(
+        Fund, Fund.fund_code == Holding.fund_code
+    ).filter(Holding.user_id == user_id).all()
+    
+    total_assets = 0
+    daily_pnl = 0
+    total_pnl = 0
+    
+    for holding, _ in holdings:
+        total_assets += holding.current_value or 0
+        daily_pnl += holding.daily_pnl or 0
+        total_pnl += holding.total_pnl or 0
+    
+    daily_pnl_rate = (daily_pnl / (total_assets - daily_pnl) * 100) if (total_assets - daily_pnl) != 0 else 0
+    total_pnl_rate = (total_pnl / (total_assets - total_pnl) * 100) if (total_assets - total_pnl) != 0 else 0
+    
+    asset_overview = {
+        'total_assets': str(total_assets),
+        'daily_pnl': str(daily_pnl),
+        'daily_pnl_rate': str(round(daily_pnl_rate, 2)),
+        'total_pnl': str(total_pnl),
+        'total_pnl_rate': str(round(total_pnl_rate, 2)),
+        'holdings_count': len(holdings)
+    }
+    
+    holdings_summary = [
+        {
+            'fund_code': holding.fund_code,
+            'fund_name': fund_name,
+            'shares': str(holding.shares),
+            'current_value': str(holding.current_value),
+            'daily_pnl': str(holding.daily_pnl),
+            'daily_pnl_rate': str(holding.daily_pnl_rate)
+        }
+        for holding, fund_name in holdings if fund_name is not None
+    ]
+    
+    return {
+        'asset_overview': asset_overview,
+        'holdings_summary': holdings_summary
+    }
+
+def build_recommended_funds(risk_level):
+    """构建推荐基金：最新行情 ⨝ 基金一次查询"""
+    # 获取推荐基金：最近有更新的基金中符合用户风险等级的
+    recent_funds = db.session.query(
+        Fund.fund_code, Fund.fund_name, Fund.fund_type, Fund.risk_level,
+        FundLatestQuote.net_value, FundLatestQuote.daily_change_rate
+    ).join(
+        FundLatestQuote, FundLatestQuote.fund_code == Fund.fund_code
+    ).order_by(FundLatestQuote.update_time.desc()).limit(5).all()
+    peer_ranks = get_peer_ranks([fund.fund_code for fund in recent_funds])
+    
+    return [
+        {
+            'fund_code': fund.fund_code,
+            'fund_name': fund.fund_name,
+            'fund_type': fund.fund_type,
+            'risk_level': fund.risk_level,
+            'net_value': str(fund.net_value) if fund.net_value else '0.0000',
+            'daily_change_rate': str(fund.daily_change_rate) if fund.daily_change_rate else '0.00',
+            'recommendation_reason': f'符合您的风险偏好({risk_level})',
+            'performance_rank': rank_label(peer_ranks.get(fund.fund_code))
+        }
+        for fund in recent_funds if fund.risk_level == risk_level
+    ]
+
 @api.route('/overview')
 class HomeOverview(Resource):
     @api.doc('get_home_overview')
     @jwt_required()
     @api.marshal_with(home_overview_model)
     def get(self):
-        """获取首页概览数据"""
+        """获取首页概览数据（持仓部分按用户缓存，推荐基金按风险等级缓存，各自的数据变化后重建）"""
         current_user_id = get_jwt_identity()
         
-        # 获取用户资产概览
-        holdings = Holding.query.filter_by(user_id=current_user_id).all()
-        
-        total_assets = 0
-        daily_pnl = 0
-        total_pnl = 0
-        
-        for holding in holdings:
-            total_assets += holding.current_value or 0
-            daily_pnl += holding.daily_pnl or 0
-            total_pnl += holding.total_pnl or 0
+        state = get_overview_state(current_user_id)
+        key = holdings_key(state)
+        cache = get_overview_cache()
+        cached = cache.get(current_user_id)
+        if cached is not None and cached[0] == key:
+            overview = cached[1]
+        else:
+            overview = build_holdings_overview(current_user_id)
+            cache.set(current_user_id, (key, overview))
         
-        daily_pnl_rate = (daily_pnl / (total_assets - daily_pnl) * 100) if (total_assets - daily_pnl) != 0 else 0
-        total_pnl_rate = (total_pnl / (total_assets - total_pnl) * 100) if (total_assets - total_pnl) != 0 else 0
-        
-        asset_overview = {
-            'total_assets': str(total_assets),
-            'daily_pnl': str(daily_pnl),
-            'daily_pnl_rate': str(round(daily_pnl_rate, 2)),
-            'total_pnl': str(total_pnl),
-            'total_pnl_rate': str(round(total_pnl_rate, 2)),
-            'holdings_count': len(holdings)
-        }
+        risk_level = state.risk_level or DEFAULT_RISK_LEVEL
+        key = recommendation_key(state)
+        cache = get_recommendation_cache()
+        cached = cache.get(risk_level)
+        if cached is not None and cached[0] == key:
+            recommended_funds = cached[1]
+        else:
+            recommended_funds = build_recommended_funds(risk_level)
+            cache.set(risk_level, (key, recommended_funds))
         
-        # 获取持仓概览
-        holdings_summary = []
-        for holding in holdings:
-            fund = Fund.query.filter_by(fund_code=holding.fund_code).first()
-            if fund:
-                holding_summary = {
-                    'fund_code': holding.fund_code,
-                    'fund_name': fund.fund_name,
-                    'shares': str(holding.shares),
-                    'current_value': str(holding.current_value),
-                    'daily_pnl': str(holding.daily_pnl),
-                    'daily_pnl_rate': str(holding.daily_pnl_rate)
-                }
-                holdings_summary.append(holding_summary)
+        # 获取指数概览（进程内指数行情快照）
+        index_snapshot = get_index_snapshot()
+        index_summary = [serialize_index(quote) for quote in index_snapshot.quotes]
         
-        # 获取指数概览（模拟数据）
-        index_summary = [
-            {
-                'index_code': '000001',
-                'index_name': '上证指数',
-                'current_point': '3250.12',
-                'daily_change': '15.23',
-                'daily_change_rate': '0.47'
-            },
-            {
-                'index_code': '399001',
-                'index_name': '深证成指',
-                'current_point': '11023.56',
-                'daily_change': '45.67',
-                'daily_change_rate': '0.42'
-            }
+        timestamps = [
+            value for value in (state.holdings_updated_at, state.quote_time, index_snapshot.update_time)
+            if value is not None
         ]
         
-        # 获取推荐基金（基于用户持仓和风险偏好）
-        recommended_funds = []
-        
-        # 获取用户的风险等级
-        user_profile = UserProfile.query.filter_by(user_id=current_user_id).first()
-        user_risk_level = user_profile.risk_level if user_profile else 'R3'
-        
-        # 获取最近有更新的基金
-        recent_funds = FundMarketData.query.order_by(FundMarketData.update_time.desc()).limit(5).all()
-        
-        for market_data in recent_funds:
-            fund = Fund.query.filter_by(fund_code=market_data.fund_code).first()
-            if fund and fund.risk_level == user_risk_level:
-                recommended_fund = {
-                    'fund_code': fund.fund_code,
-                    'fund_name': fund.fund_name,
-                    'fund_type': fund.fund_type,
-                    'risk_level': fund.risk_level,
-                    'net_value': str(market_data.net_value) if market_data.net_value else '0.0000',
-                    'daily_change_rate': str(market_data.daily_change_rate) if market_data.daily_change_rate else '0.00',
-                    'recommendation_reason': f'符合您的风险偏好({user_risk_level})',
-                    'performance_rank': '同类第5名'
-                }
-                recommended_funds.append(recommended_fund)
-        
-        # 快捷操作
-        quick_actions = [
-            {
-                'id': 'trade_buy',
-                'name': '买入',
-                'icon': 'buy',
-                'url': '/trade/buy',
-                'order': 1
-            },
-            {
-                'id': 'trade_sell',
-                'name': '卖出',
-                'icon': 'sell',
-                'url': '/trade/sell',
-                'order': 2
-            },
-            {
-                'id': 'add_favorite',
-                'name': '自选',
-                'icon': 'favorite',
-                'url': '/favorites',
-                'order': 3
-            }
-        ]
-        
-        # 未读消息数量
-        unread_notifications_count = Notification.query.filter_by(
-            user_id=current_user_id,
-            is_read=False
-        ).count()
-        
-        result = {
-            'asset_overview': asset_overview,
-            'holdings_summary': holdings_summary,
-            'index_summary': index_summary,
-            'recommended_funds': recommended_funds,
-            'quick_actions': quick_actions,
-            'unread_notifications_count': unread_notifications_count,
-            'update_time': '2023-10-01T10:00:00Z'
-        }
-        
-        return result
\ No newline at end of file
+        return dict(
+            overview,
+            recommended_funds=recommended_funds,
+            index_summary=index_summary,
+            quick_actions=QUICK_ACTIONS,
+            unread_notifications_count=state.unread_notifications_count,
+            update_time=max(timestamps) if timestamps else datetime.utcnow()
+        )
@@ -1,9 +1,27 @@
-from flask import request
+import io
+
+from flask import request, current_app, Response, stream_with_context
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models.fund import Fund, FundMarketData
-from app.models.transaction import Holding, Transaction
+from app.models.fund import Fund
+from app.models.news import News
+from app.utils.market_snapshot import get_market_quote
+from app.utils.http import conditional, make_etag, feed_token_required
+from app.utils.risk import get_risk_metrics, serialize_risk_metrics
+from app.utils.leaderboard import BOARDS, get_leaderboard
+from app.utils.sectors import get_sector_aggregator
+from app.utils.sector_prediction import get_sector_prediction
+from app.utils.news import (
+    InvalidNewsFeed, ingest_news, get_news_tags, get_read_state, mark_news_read, mark_all_news_read,
+    related_tag_codes, related_news_seqs, serialize_news
+)
+from app.utils.index_quotes import (
+    InvalidIndexFeed, get_index_snapshot, ingest_index_quotes, serialize_index, serialize_intraday
+)
+from app.utils.quote_stream import get_quote_publisher, quote_stream
+from app.utils.quote_ingest import FORMATS, InvalidQuoteFeed, detect_format, ingest_quote_file
+from app.utils.estimate import InvalidEstimateFeed, ingest_security_quotes
 
 api = Namespace('market', description='市场行情相关操作')
 
@@ -26,17 +44,23 @@ sector_model = api.model('Sector', {
     'monthly_change_rate': fields.String(description='月涨跌幅'),
     'yearly_change_rate': fields.String(description='年涨跌幅'),
     'hot_score': fields.Integer(description='热门度'),
+    'fund_count': fields.Integer(description='成分基金数'),
+    'advancers': fields.Integer(description='日上涨基金数'),
+    'decliners': fields.Integer(description='日下跌基金数'),
     'update_time': fields.DateTime(description='更新时间')
 })
 
 news_model = api.model('News', {
     'news_id': fields.String(required=True, description='新闻ID'),
     'title': fields.String(required=True, description='标题'),
+    'summary': fields.String(description='摘要'),
     'source': fields.String(description='来源'),
     'publish_time': fields.DateTime(description='发布时间'),
     'content_url': fields.String(description='内容链接'),
     'thumbnail_url': fields.String(description='缩略图链接'),
     'category': fields.String(description='分类'),
+    'related_funds': fields.List(fields.String, description='相关基金代码'),
+    'related_sectors': fields.List(fields.String, description='相关板块代码'),
     'is_read': fields.Boolean(description='是否已读')
 })
 
@@ -56,9 +80,26 @@ prediction_model = api.model('Prediction', {
     'prediction_trend': fields.String(required=True, description='预测趋势'),
     'confidence_score': fields.Integer(description='可信度'),
     'prediction_basis': fields.String(description='预测依据'),
+    'momentum_score': fields.Float(description='动量信号（近期日收益的t统计量）'),
+    'reversion_score': fields.Float(description='均值回归信号（点位偏离均线的标准差倍数）'),
+    'as_of_date': fields.String(description='预测所依据的净值日期'),
     'prediction_time': fields.DateTime(description='预测时间')
 })
 
+security_feed_model = api.model('SecurityFeed', {
+    'items': fields.List(fields.Raw, required=True, description=(
+        '个股行情列表：security_code、update_time 必填，change_rate 或 price + previous_close 二选一，'
+        '可选 security_name、trade_date'
+    ))
+})
+
+index_feed_model = api.model('IndexFeed', {
+    'items': fields.List(fields.Raw, required=True, description=(
+        '指数行情列表：index_code、index_name、current_point、update_time 必填，'
+        '可选 previous_close、daily_change、daily_change_rate、display_order、intraday（[[时间, 点数], ...]）'
+    ))
+})
+
 market_fund_list_model = api.model('MarketFundList', {
     'items': fields.List(fields.Nested(market_fund_model)),
     'total': fields.Integer,
@@ -72,52 +113,58 @@ sector_list_model = api.model('SectorList', {
 })
 
 news_list_model = api.model('NewsList', {
-    'items': fields.List(fields.Nested(news_model))
+    'items': fields.List(fields.Nested(news_model)),
+    'total': fields.Integer,
+    'page': fields.Integer,
+    'pages': fields.Integer,
+    'per_page': fields.Integer
+})
+
+news_feed_model = api.model('NewsFeed', {
+    'items': fields.List(fields.Raw, required=True, description=(
+        '资讯列表：news_id、title 必填，'
+        '可选 summary、source、category、content_url、thumbnail_url、publish_time、fund_codes、sector_codes'
+    ))
 })
 
 index_list_model = api.model('IndexList', {
     'items': fields.List(fields.Nested(index_model))
 })
 
+def market_funds_version(resource):
+    """
+    市场基金列表的版本：先同步排行榜，再取榜单自身的版本、榜单同步到的行情版本（同一时间的行情改写也会
+    变化）+ 查询参数，与返回内容保持一致
+    """
+    board = get_leaderboard()
+    etag = make_etag(
+        'market_funds', *board.etag_parts(), board.quote_version, request.query_string.decode('utf-8')
+    )
+    return etag, board.modified_at
+
 @api.route('/funds')
 class MarketFundList(Resource):
     @api.doc('list_market_funds')
+    @api.param('board', '榜单：gainers 涨幅榜（默认）/ losers 跌幅榜 / active 波动榜')
+    @conditional(market_funds_version)
     @api.marshal_with(market_fund_list_model)
     def get(self):
-        """获取市场基金列表"""
-        page = request.args.get('page', 1, type=int)
-        per_page = min(request.args.get('per_page', 20, type=int), 100)
+        """获取市场基金列表（内存排行榜分页，不对行情表排序）"""
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = max(min(request.args.get('per_page', 20, type=int), 100), 1)
         fund_type = request.args.get('type')
+        board = request.args.get('board', 'gainers')
+        if board not in BOARDS:
+            api.abort(400, f'不支持的榜单: {board}，可选值为 {"/".join(BOARDS)}')
         
-        # 查询基金和对应的最新市场数据
-        query = db.session.query(Fund, FundMarketData).join(
-            FundMarketData, Fund.fund_code == FundMarketData.fund_code
-        ).order_by(FundMarketData.daily_change_rate.desc())
-        
-        if fund_type:
-            query = query.filter(Fund.fund_type == fund_type)
-        
-        result = query.paginate(page=page, per_page=per_page, error_out=False)
-        
-        items = []
-        for fund, market_data in result.items:
-            item = {
-                'fund_code': fund.fund_code,
-                'fund_name': fund.fund_name,
-                'fund_type': fund.fund_type,
-                'net_value': str(market_data.net_value) if market_data.net_value else None,
-                'daily_change': str(market_data.daily_change) if market_data.daily_change else None,
-                'daily_change_rate': str(market_data.daily_change_rate) if market_data.daily_change_rate else None,
-                'update_time': market_data.update_time
-            }
-            items.append(item)
+        items, total = get_leaderboard().page(board, fund_type or None, page, per_page)
         
         return {
             'items': items,
-            'total': result.total,
-            'page': result.page,
-            'pages': result.pages,
-            'per_page': result.per_page
+            'total': total,
+            'page': page,
+            'pages': (total + per_page - 1) // per_page,
+            'per_page': per_page
         }
 
 @api.route('/sectors')
@@ -125,110 +172,213 @@ class SectorList(Resource):
     @api.doc('list_sectors')
     @api.marshal_with(sector_list_model)
     def get(self):
-        """获取热门板块"""
-        # 模拟热门板块数据
-        sectors = [
-            {
-                'sector_code': 'C01',
-                'sector_name': '科技板块',
-                'daily_change_rate': '2.50',
-                'weekly_change_rate': '3.20',
-                'monthly_change_rate': '5.60',
-                'yearly_change_rate': '15.80',
-                'hot_score': 95,
-                'update_time': '2023-10-01T10:00:00Z'
-            },
-            {
-                'sector_code': 'C02',
-                'sector_name': '消费板块',
-                'daily_change_rate': '1.20',
-                'weekly_change_rate': '0.80',
-                'monthly_change_rate': '2.10',
-                'yearly_change_rate': '8.50',
-                'hot_score': 85,
-                'update_time': '2023-10-01T10:00:00Z'
-            },
-            {
-                'sector_code': 'C03',
-                'sector_name': '医药板块',
-                'daily_change_rate': '-0.50',
-                'weekly_change_rate': '1.20',
-                'monthly_change_rate': '-1.80',
-                'yearly_change_rate': '5.20',
-                'hot_score': 78,
-                'update_time': '2023-10-01T10:00:00Z'
-            }
-        ]
-        
-        return {'items': sectors}
+        """获取热门板块（成分基金最新行情的增量聚合，按热门度排序）"""
+        return {'items': get_sector_aggregator().sectors()}
+
+def news_page(seq_query, page, per_page, read_state):
+    """按资讯序号查询分页（从新到旧），返回资讯列表接口的响应"""
+    if seq_query is None:
+        return {'items': [], 'total': 0, 'page': page, 'pages': 0, 'per_page': per_page}
+    
+    result = seq_query.paginate(page=page, per_page=per_page, error_out=False)
+    seqs = [seq for seq, in result.items]
+    news_by_seq = {news.seq: news for news in News.query.filter(News.seq.in_(seqs))} if seqs else {}
+    tags = get_news_tags(seqs)
+    return {
+        'items': [serialize_news(news_by_seq[seq], tags[seq], read_state) for seq in seqs if seq in news_by_seq],
+        'total': result.total,
+        'page': result.page,
+        'pages': result.pages,
+        'per_page': result.per_page
+    }
 
 @api.route('/news')
 class NewsList(Resource):
     @api.doc('list_news')
+    @api.param('category', '资讯分类')
+    @jwt_required(optional=True)
+    @api.marshal_with(news_list_model)
+    def get(self):
+        """获取市场资讯（登录用户返回已读状态）"""
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = max(min(request.args.get('per_page', 20, type=int), 100), 1)
+        category = request.args.get('category')
+        
+        query = db.session.query(News.seq).order_by(News.seq.desc())
+        if category:
+            query = query.filter(News.category == category)
+        
+        return news_page(query, page, per_page, get_read_state(get_jwt_identity()))
+    
+    @api.doc('ingest_news')
+    @api.expect(news_feed_model)
+    @feed_token_required
+    def post(self):
+        """资讯源写入资讯（需 X-Feed-Token）"""
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            api.abort(400, '请求体必须为 JSON 对象')
+        records = data.get('items')
+        if not isinstance(records, list) or not records:
+            api.abort(400, 'items 必须为非空数组')
+        try:
+            count = ingest_news(records)
+        except InvalidNewsFeed as e:
+            db.session.rollback()
+            api.abort(400, str(e))
+        return {'message': f'新增 {count} 条资讯', 'created_count': count}
+
+@api.route('/news/related')
+class RelatedNews(Resource):
+    @api.doc('list_related_news')
+    @jwt_required()
     @api.marshal_with(news_list_model)
     def get(self):
-        """获取市场资讯"""
-        # 模拟市场资讯数据
-        news = [
-            {
-                'news_id': 'news_001',
-                'title': '科技股今日大幅上涨',
-                'source': '财经日报',
-                'publish_time': '2023-10-01T08:00:00Z',
-                'content_url': 'https://example.com/news/001',
-                'thumbnail_url': 'https://example.com/thumbnails/001.jpg',
-                'category': '市场动态',
-                'is_read': False
-            },
-            {
-                'news_id': 'news_002',
-                'title': '央行发布最新货币政策',
-                'source': '金融时报',
-                'publish_time': '2023-09-30T16:30:00Z',
-                'content_url': 'https://example.com/news/002',
-                'thumbnail_url': 'https://example.com/thumbnails/002.jpg',
-                'category': '政策解读',
-                'is_read': True
-            }
-        ]
+        """获取与我的持仓和自选基金（及其所属板块）相关的资讯"""
+        current_user_id = get_jwt_identity()
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = max(min(request.args.get('per_page', 20, type=int), 100), 1)
         
-        return {'items': news}
+        fund_codes, sector_codes = related_tag_codes(current_user_id)
+        return news_page(related_news_seqs(fund_codes, sector_codes), page, per_page, get_read_state(current_user_id))
+
+@api.route('/news/<string:news_id>/read')
+@api.param('news_id', '资讯ID')
+class NewsRead(Resource):
+    @api.doc('mark_news_read')
+    @jwt_required()
+    def post(self, news_id):
+        """标记资讯已读"""
+        current_user_id = get_jwt_identity()
+        news = News.query.filter_by(news_id=news_id).first()
+        if news is None:
+            api.abort(404, '资讯不存在')
+        mark_news_read(current_user_id, news.seq)
+        return {'message': '已标记为已读'}
+
+@api.route('/news/read-all')
+class NewsReadAll(Resource):
+    @api.doc('mark_all_news_read')
+    @jwt_required()
+    def post(self):
+        """全部资讯标记已读"""
+        mark_all_news_read(get_jwt_identity())
+        return {'message': '已全部标记为已读'}
 
 @api.route('/index')
 class IndexList(Resource):
     @api.doc('list_index')
     @api.marshal_with(index_list_model)
     def get(self):
-        """获取主要指数"""
-        # 模拟主要指数数据
-        indices = [
-            {
-                'index_code': '000001',
-                'index_name': '上证指数',
-                'current_point': '3250.12',
-                'daily_change': '15.23',
-                'daily_change_rate': '0.47',
-                'update_time': '2023-10-01T10:00:00Z'
-            },
-            {
-                'index_code': '399001',
-                'index_name': '深证成指',
-                'current_point': '11023.56',
-                'daily_change': '45.67',
-                'daily_change_rate': '0.42',
-                'update_time': '2023-10-01T10:00:00Z'
-            },
-            {
-                'index_code': '399006',
-                'index_name': '创业板指',
-                'current_point': '2245.78',
-                'daily_change': '12.34',
-                'daily_change_rate': '0.55',
-                'update_time': '2023-10-01T10:00:00Z'
-            }
-        ]
+        """获取主要指数（读取进程内行情快照）"""
+        return {'items': [serialize_index(quote) for quote in get_index_snapshot().quotes]}
+    
+    @api.doc('ingest_index_quotes')
+    @api.expect(index_feed_model)
+    @feed_token_required
+    def post(self):
+        """行情源写入指数行情（需 X-Feed-Token）"""
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            api.abort(400, '请求体必须为 JSON 对象')
+        records = data.get('items')
+        if not isinstance(records, list) or not records:
+            api.abort(400, 'items 必须为非空数组')
+        try:
+            count = ingest_index_quotes(records)
+        except InvalidIndexFeed as e:
+            db.session.rollback()
+            api.abort(400, str(e))
+        return {'message': f'已更新 {count} 个指数行情', 'updated_count': count}
+
+@api.route('/index/<string:index_code>/intraday')
+@api.param('index_code', '指数代码')
+class IndexIntraday(Resource):
+    @api.doc('get_index_intraday')
+    def get(self, index_code):
+        """获取指数当日分时走势"""
+        quote = get_index_snapshot().get(index_code)
+        if quote is None:
+            api.abort(404, '指数不存在')
+        return serialize_intraday(quote)
+
+@api.route('/securities')
+class SecurityQuoteFeed(Resource):
+    @api.doc('ingest_security_quotes')
+    @api.expect(security_feed_model)
+    @feed_token_required
+    def post(self):
+        """行情源写入个股盘中行情，用于基金盘中估值（需 X-Feed-Token）"""
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            api.abort(400, '请求体必须为 JSON 对象')
+        records = data.get('items')
+        if not isinstance(records, list) or not records:
+            api.abort(400, 'items 必须为非空数组')
+        try:
+            count = ingest_security_quotes(records)
+        except InvalidEstimateFeed as e:
+            db.session.rollback()
+            api.abort(400, str(e))
+        return {'message': f'已更新 {count} 条个股行情', 'updated_count': count}
+
+@api.route('/quotes')
+class QuoteIngest(Resource):
+    @api.doc('ingest_quotes', params={
+        'format': '文件格式：csv 或 jsonl，未提供时按 Content-Type 判断',
+        'strict': '为 true 时存在任何无效行则整体回滚'
+    })
+    @feed_token_required
+    def post(self):
+        """行情源批量导入每日行情文件（需 X-Feed-Token，请求体为 CSV 或 JSON Lines）"""
+        file_format = request.args.get('format') or detect_format(content_type=request.content_type)
+        if file_format not in FORMATS:
+            api.abort(400, '请通过 format 参数或 Content-Type 指定文件格式（csv 或 jsonl）')
+        strict = request.args.get('strict', 'false').lower() in ('1', 'true', 'yes')
+        
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig', newline='')
+        try:
+            result = ingest_quote_file(stream, file_format, strict=strict)
+        except InvalidQuoteFeed as e:
+            return {'message': str(e), 'errors': e.errors}, 400
+        return dict(result, message=f"已导入 {result['loaded']} 条行情")
+
+def parse_stream_codes(name):
+    """解析逗号分隔的订阅代码，去除空白和重复并保持顺序"""
+    codes = []
+    for code in (request.args.get(name) or '').split(','):
+        code = code.strip()
+        if code and code not in codes:
+            codes.append(code)
+    return codes
+
+@api.route('/stream')
+class MarketStream(Resource):
+    @api.doc('market_stream', params={
+        'funds': '订阅的基金代码，逗号分隔',
+        'indices': '订阅的指数代码，逗号分隔'
+    })
+    def get(self):
+        """实时行情推送（Server-Sent Events），支持 Last-Event-ID 断线续传"""
+        fund_codes = parse_stream_codes('funds')
+        index_codes = parse_stream_codes('indices')
+        if not fund_codes and not index_codes:
+            api.abort(400, '请至少订阅一只基金或一个指数')
+        max_codes = current_app.config['QUOTE_STREAM_MAX_CODES']
+        if len(fund_codes) + len(index_codes) > max_codes:
+            api.abort(400, f'单个连接最多订阅{max_codes}个代码')
         
-        return {'items': indices}
+        config = current_app.config
+        stream = quote_stream(
+            get_quote_publisher(), fund_codes, index_codes,
+            last_event_id=request.headers.get('Last-Event-ID') or request.args.get('last_event_id'),
+            heartbeat_seconds=config['QUOTE_STREAM_HEARTBEAT_SECONDS'],
+            max_seconds=config['QUOTE_STREAM_MAX_SECONDS']
+        )
+        return Response(stream_with_context(stream), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
 
 @api.route('/sectors/<string:sector_code>/prediction')
 @api.param('sector_code', '板块代码')
@@ -236,42 +386,96 @@ class SectorPrediction(Resource):
     @api.doc('get_sector_prediction')
     @api.marshal_with(prediction_model)
     def get(self, sector_code):
-        """获取板块预测"""
-        # 模拟板块预测数据
-        prediction = {
-            'prediction_id': f'pred_{sector_code}_20231001',
+        """获取板块预测（读取收盘后批量计算的结果）"""
+        row = get_sector_prediction(sector_code)
+        if row is None:
+            api.abort(404, '板块不存在')
+        sector_name, prediction = row
+        if prediction is None:
+            api.abort(404, '该板块暂无预测数据')
+        
+        return {
+            'prediction_id': f'pred_{sector_code}_{prediction.as_of_date:%Y%m%d}',
             'sector_code': sector_code,
-            'sector_name': '科技板块' if sector_code == 'C01' else '未知板块',
-            'prediction_trend': 'up',
-            'confidence_score': 85,
-            'prediction_basis': '基于历史数据和市场趋势分析，科技板块未来一周可能上涨',
-            'prediction_time': '2023-10-01T10:00:00Z'
+            'sector_name': sector_name,
+            'prediction_trend': prediction.prediction_trend,
+            'confidence_score': prediction.confidence_score,
+            'prediction_basis': prediction.prediction_basis,
+            'momentum_score': prediction.momentum_score,
+            'reversion_score': prediction.reversion_score,
+            'as_of_date': prediction.as_of_date.isoformat(),
+            'prediction_time': prediction.computed_at
         }
-        
-        return prediction
+
+def describe_risk(fund, metrics):
+    """根据风险指标生成风险分析和投资建议文字"""
+    if metrics is None or metrics.volatility is None:
+        return (
+            f'该基金风险等级为{fund.risk_level}，历史净值不足，暂无法计算风险指标',
+            '历史数据较少，建议结合基金类型和风险等级谨慎决策'
+        )
+    
+    volatility = float(metrics.volatility)
+    max_drawdown = float(metrics.max_drawdown)
+    if volatility < 5:
+        investor = '保守型'
+    elif volatility < 15:
+        investor = '稳健型'
+    elif volatility < 25:
+        investor = '平衡型'
+    else:
+        investor = '积极型'
+    
+    if max_drawdown >= 0:
+        recovery = '期间无回撤'
+    elif metrics.recovery_date:
+        recovery = f'已于{metrics.recovery_days}天后修复'
+    else:
+        recovery = '尚未修复'
+    risk_analysis = (
+        f'该基金风险等级为{fund.risk_level}，近{metrics.window_days}天年化波动率{volatility:.2f}%，'
+        f'最大回撤{max_drawdown:.2f}%（{recovery}），适合{investor}投资者'
+    )
+    
+    sharpe = float(metrics.sharpe_ratio) if metrics.sharpe_ratio is not None else None
+    if sharpe is None:
+        investment_advice = '风险调整后收益暂无法评估，建议结合业绩走势判断'
+    elif sharpe >= 1:
+        investment_advice = f'夏普比率{sharpe:.3f}，风险调整后收益较好'
+    elif sharpe >= 0:
+        investment_advice = f'夏普比率{sharpe:.3f}，风险调整后收益一般，注意控制仓位'
+    else:
+        investment_advice = f'夏普比率{sharpe:.3f}，收益未能覆盖无风险利率，谨慎加仓'
+    return risk_analysis, investment_advice
 
 @api.route('/funds/<string:fund_code>/analysis')
 @api.param('fund_code', '基金代码')
 class FundAnalysis(Resource):
     @api.doc('get_fund_analysis')
     def get(self, fund_code):
-        """获取基金分析"""
+        """获取基金分析（风险指标由每日批量任务预先计算）"""
         fund = Fund.query.filter_by(fund_code=fund_code).first_or_404()
-        market_data = FundMarketData.query.filter_by(fund_code=fund_code).order_by(FundMarketData.update_time.desc()).first()
+        market_data = get_market_quote(fund_code)
         
         if not market_data:
             api.abort(404, '基金市场数据不存在')
         
+        metrics = get_risk_metrics(fund_code)
+        risk_analysis, investment_advice = describe_risk(fund, metrics)
+        
         analysis = {
             'fund_code': fund.fund_code,
             'fund_name': fund.fund_name,
             'current_net_value': str(market_data.net_value),
             'daily_change_rate': str(market_data.daily_change_rate),
             'weekly_trend': '上升' if market_data.weekly_change_rate and float(market_data.weekly_change_rate) > 0 else '下降',
-            'monthly_trend': '平稳' if abs(float(market_data.monthly_change_rate or 0)) < 2 else ('上升' if float(market_data.monthly_change_rate or 0) > 0 else '下降'),
+            'monthly_trend': '平稳' if abs(float(market_data.monthly_change_rate or 0)) < 2 else (
+                '上升' if float(market_data.monthly_change_rate or 0) > 0 else '下降'
+            ),
             'risk_level': fund.risk_level,
-            'risk_analysis': f'该基金风险等级为{fund.risk_level}，适合平衡型投资者',
-            'investment_advice': '建议继续持有'
+            'risk_metrics': serialize_risk_metrics(metrics),
+            'risk_analysis': risk_analysis,
+            'investment_advice': investment_advice
         }
         
-        return analysis
\ No newline at end of file
+        return analysis
@@ -3,7 +3,10 @@ from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.transaction import Holding, Transaction
-from app.models.fund import Fund, FundMarketData
+from app.models.fund import Fund
+from app.utils.quotes import get_latest_quote
+from app.utils.correlation import portfolio_diversification
+from app.utils.home_overview import invalidate_home_overview
 
 api = Namespace('transactions', description='交易功能相关操作')
 
@@ -150,7 +153,7 @@ class BuyFund(Resource):
             api.abort(400, '购买金额必须大于0')
         
         fund = Fund.query.filter_by(fund_code=fund_code).first_or_404()
-        market_data = FundMarketData.query.filter_by(fund_code=fund_code).order_by(FundMarketData.update_time.desc()).first()
+        market_data = get_latest_quote(fund_code)
         
         if not market_data:
             api.abort(404, '基金市场数据不存在')
@@ -196,6 +199,7 @@ class BuyFund(Resource):
             db.session.add(holding)
         
         db.session.commit()
+        invalidate_home_overview(current_user_id)
         
         # 重新获取完整的交易信息用于返回
         transaction = Transaction.query.filter_by(id=transaction.id).first()
@@ -239,7 +243,7 @@ class SellFund(Resource):
             api.abort(400, '卖出份额必须大于0')
         
         fund = Fund.query.filter_by(fund_code=fund_code).first_or_404()
-        market_data = FundMarketData.query.filter_by(fund_code=fund_code).order_by(FundMarketData.update_time.desc()).first()
+        market_data = get_latest_quote(fund_code)
         
         if not market_data:
             api.abort(404, '基金市场数据不存在')
@@ -280,6 +284,7 @@ class SellFund(Resource):
             holding.latest_net_value = transaction_price
         
         db.session.commit()
+        invalidate_home_overview(current_user_id)
         
         # 重新获取完整的交易信息用于返回
         transaction = Transaction.query.filter_by(id=transaction.id).first()
@@ -390,6 +395,35 @@ class PortfolioOverview(Resource):
         
         return overview
 
+@api.route('/portfolio/diversification')
+class PortfolioDiversification(Resource):
+    @api.doc('get_portfolio_diversification')
+    @jwt_required()
+    def get(self):
+        """获取持仓组合分散度（按持仓市值加权的日收益相关性）"""
+        current_user_id = get_jwt_identity()
+        
+        rows = db.session.query(Holding.fund_code, Holding.current_value).filter(
+            Holding.user_id == current_user_id, Holding.shares > 0
+        ).all()
+        weights = {}
+        for fund_code, current_value in rows:
+            weights[fund_code] = weights.get(fund_code, 0) + float(current_value or 0)
+        
+        result = portfolio_diversification(weights)
+        total_value = sum(weights.values())
+        names = dict(
+            db.session.query(Fund.fund_code, Fund.fund_name).filter(Fund.fund_code.in_(list(weights))).all()
+        ) if weights else {}
+        result['holdings'] = [{
+            'fund_code': fund_code,
+            'fund_name': names.get(fund_code, fund_code),
+            'weight': round(value / total_value * 100, 2) if total_value else None
+        } for fund_code, value in sorted(weights.items(), key=lambda item: -item[1])]
+        for pair in result['highly_correlated_pairs']:
+            pair['fund_names'] = [names.get(code, code) for code in pair['fund_codes']]
+        return result
+
 @api.route('/holdings/import')
 class ImportHoldings(Resource):
     @api.doc('import_holdings')
@@ -435,6 +469,7 @@ class ImportHoldings(Resource):
             imported_count += 1
         
         db.session.commit()
+        invalidate_home_overview(current_user_id)
         
         return {
             'message': f'成功导入 {imported_count} 条持仓记录',
@@ -5,6 +5,19 @@ import uuid
 
 class Fund(db.Model):
     __tablename__ = 'funds'
+    __table_args__ = (
+        # 游标分页按 (排序键, fund_code) 定位
+        db.Index('ix_funds_name_code', 'fund_name', 'fund_code'),
+        db.Index('ix_funds_type_code', 'fund_type', 'fund_code'),
+        db.Index('ix_funds_type_name_code', 'fund_type', 'fund_name', 'fund_code'),
+        # 条件请求按最大更新时间生成版本
+        db.Index('ix_funds_updated_at', 'updated_at'),
+        # 基金筛选：类型 + 风险等级 + 费率、基金公司、类型 + 规模
+        db.Index('ix_funds_type_risk_fee', 'fund_type', 'risk_level', 'management_fee'),
+        db.Index('ix_funds_risk_level_fee', 'risk_level', 'management_fee'),
+        db.Index('ix_funds_company_type', 'company', 'fund_type'),
+        db.Index('ix_funds_type_size', 'fund_type', 'net_asset_value'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     fund_code = db.Column(db.String(10), unique=True, nullable=False)  # 基金代码
@@ -31,6 +44,9 @@ class Fund(db.Model):
 
 class FundMarketData(db.Model):
     __tablename__ = 'fund_market_data'
+    __table_args__ = (
+        db.Index('ix_fund_market_data_code_time', 'fund_code', 'update_time'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     fund_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), nullable=False)
@@ -48,6 +64,155 @@ class FundMarketData(db.Model):
         return f'<FundMarketData {self.fund_code} - {self.net_value}>'
 
 
+class FundLatestQuote(db.Model):
+    """每只基金最新一条市场数据，随 fund_market_data 写入在同一事务内维护，按主键直接读取"""
+    __tablename__ = 'fund_latest_quotes'
+    __table_args__ = (
+        db.Index('ix_fund_latest_quotes_daily_change_rate', 'daily_change_rate'),
+        db.Index('ix_fund_latest_quotes_update_time', 'update_time'),
+        # 基金筛选按任意区间收益排序和过滤
+        db.Index('ix_fund_latest_quotes_weekly_change_rate', 'weekly_change_rate'),
+        db.Index('ix_fund_latest_quotes_monthly_change_rate', 'monthly_change_rate'),
+        db.Index('ix_fund_latest_quotes_quarterly_change_rate', 'quarterly_change_rate'),
+        db.Index('ix_fund_latest_quotes_yearly_change_rate', 'yearly_change_rate'),
+        db.Index('ix_fund_latest_quotes_three_year_change_rate', 'three_year_change_rate'),
+    )
+    
+    fund_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), primary_key=True)
+    market_data_id = db.Column(db.String(36), nullable=False)  # 对应的 fund_market_data 记录
+    net_value = db.Column(db.Numeric(10, 4))  # 最新净值
+    daily_change = db.Column(db.Numeric(8, 4))  # 日涨跌额
+    daily_change_rate = db.Column(db.Numeric(6, 2))  # 日涨跌幅
+    weekly_change_rate = db.Column(db.Numeric(6, 2))  # 周涨跌幅
+    monthly_change_rate = db.Column(db.Numeric(6, 2))  # 月涨跌幅
+    quarterly_change_rate = db.Column(db.Numeric(6, 2))  # 季度涨跌幅
+    yearly_change_rate = db.Column(db.Numeric(6, 2))  # 年涨跌幅
+    three_year_change_rate = db.Column(db.Numeric(6, 2))  # 三年涨跌幅
+    update_time = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<FundLatestQuote {self.fund_code} - {self.net_value}>'
+
+
+class DataVersion(db.Model):
+    """数据版本计数：写入方在写入数据的同一事务内递增，进程内缓存按版本判断是否失效"""
+    __tablename__ = 'data_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)  # quotes：最新行情；peer_ranks：同类排名
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DataVersion {self.name} {self.version}>'
+
+
+class FundNavHistory(db.Model):
+    """基金每日净值，主键 (fund_code, nav_date) 即聚簇索引，区间查询走索引范围扫描"""
+    __tablename__ = 'fund_nav_history'
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    fund_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), primary_key=True)
+    nav_date = db.Column(db.Date, primary_key=True)  # 净值日期
+    net_value = db.Column(db.Numeric(10, 4), nullable=False)  # 单位净值
+    accumulated_value = db.Column(db.Numeric(10, 4))  # 累计净值
+    daily_change = db.Column(db.Numeric(8, 4))  # 日涨跌额
+    daily_change_rate = db.Column(db.Numeric(6, 2))  # 日涨跌幅
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FundNavHistory {self.fund_code} {self.nav_date} - {self.net_value}>'
+
+
+class FundRiskMetrics(db.Model):
+    """每只基金的风险指标，由每日批量任务根据近一年净值全量计算，接口按主键直接读取"""
+    __tablename__ = 'fund_risk_metrics'
+    
+    fund_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), primary_key=True)
+    window_days = db.Column(db.Integer, nullable=False)  # 计算窗口（自然日）
+    start_date = db.Column(db.Date)  # 窗口内首个净值日
+    end_date = db.Column(db.Date)  # 窗口内最后一个净值日
+    observations = db.Column(db.Integer)  # 参与计算的净值个数
+    annualized_return = db.Column(db.Numeric(10, 4))  # 年化收益率（%）
+    volatility = db.Column(db.Numeric(10, 4))  # 年化波动率（%）
+    downside_volatility = db.Column(db.Numeric(10, 4))  # 年化下行波动率（%）
+    max_drawdown = db.Column(db.Numeric(10, 4))  # 最大回撤（%，负数）
+    drawdown_peak_date = db.Column(db.Date)  # 最大回撤起点（前高）
+    drawdown_trough_date = db.Column(db.Date)  # 最大回撤谷底
+    recovery_date = db.Column(db.Date)  # 回到前高的日期，未修复为空
+    recovery_days = db.Column(db.Integer)  # 谷底到修复的自然日数
+    sharpe_ratio = db.Column(db.Numeric(10, 4))  # 夏普比率
+    sortino_ratio = db.Column(db.Numeric(10, 4))  # 索提诺比率
+    calmar_ratio = db.Column(db.Numeric(10, 4))  # 卡玛比率
+    beta = db.Column(db.Numeric(10, 4))  # 相对业绩基准的贝塔
+    benchmark_code = db.Column(db.String(20))  # 业绩基准，market 表示全市场等权平均
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FundRiskMetrics {self.fund_code} {self.end_date}>'
+
+
+class FundPeerRank(db.Model):
+    """基金在同类（同一 fund_type）中各区间收益的排名，每次净值入库后整体重算，按主键直接读取"""
+    __tablename__ = 'fund_peer_ranks'
+    
+    fund_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), primary_key=True)
+    fund_type = db.Column(db.String(20))  # 同类分组
+    daily_rank = db.Column(db.Integer)  # 日涨跌幅同类排名（并列取最小名次）
+    daily_peer_count = db.Column(db.Integer)  # 同类中有日涨跌幅的基金数
+    daily_percentile = db.Column(db.Numeric(5, 2))  # 日涨跌幅超越同类百分比
+    weekly_rank = db.Column(db.Integer)  # 周涨跌幅同类排名（并列取最小名次）
+    weekly_peer_count = db.Column(db.Integer)  # 同类中有周涨跌幅的基金数
+    weekly_percentile = db.Column(db.Numeric(5, 2))  # 周涨跌幅超越同类百分比
+    monthly_rank = db.Column(db.Integer)  # 月涨跌幅同类排名（并列取最小名次）
+    monthly_peer_count = db.Column(db.Integer)  # 同类中有月涨跌幅的基金数
+    monthly_percentile = db.Column(db.Numeric(5, 2))  # 月涨跌幅超越同类百分比
+    quarterly_rank = db.Column(db.Integer)  # 季度涨跌幅同类排名（并列取最小名次）
+    quarterly_peer_count = db.Column(db.Integer)  # 同类中有季度涨跌幅的基金数
+    quarterly_percentile = db.Column(db.Numeric(5, 2))  # 季度涨跌幅超越同类百分比
+    yearly_rank = db.Column(db.Integer)  # 年涨跌幅同类排名（并列取最小名次）
+    yearly_peer_count = db.Column(db.Integer)  # 同类中有年涨跌幅的基金数
+    yearly_percentile = db.Column(db.Numeric(5, 2))  # 年涨跌幅超越同类百分比
+    three_year_rank = db.Column(db.Integer)  # 三年涨跌幅同类排名（并列取最小名次）
+    three_year_peer_count = db.Column(db.Integer)  # 同类中有三年涨跌幅的基金数
+    three_year_percentile = db.Column(db.Numeric(5, 2))  # 三年涨跌幅超越同类百分比
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FundPeerRank {self.fund_code} {self.fund_type}>'
+
+
+class FundCorrelation(db.Model):
+    """每只基金日收益相关性最高的前 K 只基金，每日批量整体重算，按 (fund_code, rank) 前缀读取"""
+    __tablename__ = 'fund_correlations'
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    fund_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True)  # 相关性名次（1为最高）
+    related_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), nullable=False)  # 相关基金代码
+    correlation = db.Column(db.Numeric(5, 4), nullable=False)  # 日收益相关系数
+    overlap_days = db.Column(db.Integer)  # 计算所用的共同交易日数
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FundCorrelation {self.fund_code}#{self.rank} {self.related_code}>'
+
+
+class FundPortfolioHolding(db.Model):
+    """基金披露的重仓证券及占净值比例，用于盘中估值，每次披露整体替换该基金的记录"""
+    __tablename__ = 'fund_portfolio_holdings'
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    fund_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), primary_key=True)
+    security_type = db.Column(db.String(10), primary_key=True, default='stock')  # 证券类型：stock 个股 / index 指数
+    security_code = db.Column(db.String(20), primary_key=True)  # 证券代码（个股带交易所后缀，如 600519.SH）
+    security_name = db.Column(db.String(50))  # 证券名称
+    weight = db.Column(db.Numeric(7, 4), nullable=False)  # 占基金净值比例（%）
+    disclosure_date = db.Column(db.Date)  # 披露报告期
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FundPortfolioHolding {self.fund_code} {self.security_code} {self.weight}>'
+
+
 class FundGroup(db.Model):
     __tablename__ = 'fund_groups'
     
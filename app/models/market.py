@@ -0,0 +1,100 @@
+from app import db
+from datetime import datetime
+
+
+class Sector(db.Model):
+    """行业/主题板块"""
+    __tablename__ = 'sectors'
+    
+    sector_code = db.Column(db.String(10), primary_key=True)  # 板块代码
+    sector_name = db.Column(db.String(50), nullable=False)  # 板块名称
+    description = db.Column(db.String(200))  # 板块说明
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Sector {self.sector_code} {self.sector_name}>'
+
+
+class FundSector(db.Model):
+    """基金所属板块（一只基金可属于多个板块）"""
+    __tablename__ = 'fund_sectors'
+    __table_args__ = (
+        db.Index('ix_fund_sectors_fund_code', 'fund_code'),
+        {'sqlite_with_rowid': False}
+    )
+    
+    sector_code = db.Column(db.String(10), db.ForeignKey('sectors.sector_code'), primary_key=True)
+    fund_code = db.Column(db.String(10), db.ForeignKey('funds.fund_code'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FundSector {self.sector_code} - {self.fund_code}>'
+
+
+class MarketIndex(db.Model):
+    """主要指数最新行情"""
+    __tablename__ = 'market_indices'
+    
+    index_code = db.Column(db.String(10), primary_key=True)  # 指数代码
+    index_name = db.Column(db.String(50), nullable=False)  # 指数名称
+    display_order = db.Column(db.Integer, default=0)  # 展示顺序
+    current_point = db.Column(db.Numeric(12, 2))  # 当前点数
+    previous_close = db.Column(db.Numeric(12, 2))  # 昨收点数
+    daily_change = db.Column(db.Numeric(10, 2))  # 日涨跌
+    daily_change_rate = db.Column(db.Numeric(6, 2))  # 日涨跌幅
+    trade_date = db.Column(db.Date)  # 行情所属交易日
+    update_time = db.Column(db.DateTime)  # 行情时间
+    
+    def __repr__(self):
+        return f'<MarketIndex {self.index_code} {self.index_name}>'
+
+
+class MarketIndexTick(db.Model):
+    """指数分时点数，只保留每个指数最近一个交易日"""
+    __tablename__ = 'market_index_ticks'
+    __table_args__ = {'sqlite_with_rowid': False}
+    
+    index_code = db.Column(db.String(10), db.ForeignKey('market_indices.index_code'), primary_key=True)
+    tick_time = db.Column(db.DateTime, primary_key=True)  # 分时时间
+    point = db.Column(db.Numeric(12, 2), nullable=False)  # 点数
+    
+    def __repr__(self):
+        return f'<MarketIndexTick {self.index_code} {self.tick_time}>'
+
+
+class SectorTrendPrediction(db.Model):
+    """板块趋势预测，每日收盘后由批量任务计算"""
+    __tablename__ = 'sector_predictions'
+    
+    sector_code = db.Column(db.String(10), db.ForeignKey('sectors.sector_code'), primary_key=True)
+    as_of_date = db.Column(db.Date, nullable=False)  # 预测所依据的最新净值日期
+    prediction_trend = db.Column(db.String(10), nullable=False)  # 预测趋势：up/down/flat
+    confidence_score = db.Column(db.Integer, nullable=False)  # 可信度（50-95）
+    prediction_basis = db.Column(db.String(500))  # 预测依据
+    momentum_score = db.Column(db.Float)  # 动量信号（近期日收益的t统计量）
+    reversion_score = db.Column(db.Float)  # 均值回归信号（点位偏离均线的标准差倍数）
+    observations = db.Column(db.Integer)  # 板块收益序列的交易日数
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)  # 计算时间
+    
+    def __repr__(self):
+        return f'<SectorTrendPrediction {self.sector_code} {self.prediction_trend}>'
+
+
+class SecurityQuote(db.Model):
+    """个股最新行情，由行情源盘中持续写入，用于基金盘中估值"""
+    __tablename__ = 'security_quotes'
+    __table_args__ = (
+        db.Index('ix_security_quotes_update_time', 'update_time'),
+    )
+    
+    security_code = db.Column(db.String(20), primary_key=True)  # 证券代码（带交易所后缀，如 600519.SH）
+    security_name = db.Column(db.String(50))  # 证券名称
+    price = db.Column(db.Numeric(12, 4))  # 最新价
+    previous_close = db.Column(db.Numeric(12, 4))  # 昨收价
+    change_rate = db.Column(db.Numeric(8, 4), nullable=False)  # 当日涨跌幅（%）
+    trade_date = db.Column(db.Date, nullable=False)  # 行情所属交易日
+    update_time = db.Column(db.DateTime, nullable=False)  # 行情时间
+    
+    def __repr__(self):
+        return f'<SecurityQuote {self.security_code} {self.change_rate}>'
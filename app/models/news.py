@@ -0,0 +1,50 @@
+from app import db
+from datetime import datetime
+
+
+class News(db.Model):
+    """市场资讯，seq 按入库顺序递增，同时作为已读位图的位序号"""
+    __tablename__ = 'news'
+    
+    seq = db.Column(db.Integer, primary_key=True, autoincrement=True)  # 入库序号
+    news_id = db.Column(db.String(64), unique=True, nullable=False)  # 资讯源中的唯一标识
+    title = db.Column(db.String(200), nullable=False)  # 标题
+    summary = db.Column(db.Text)  # 摘要
+    source = db.Column(db.String(50))  # 来源
+    category = db.Column(db.String(20))  # 分类
+    content_url = db.Column(db.String(500))  # 内容链接
+    thumbnail_url = db.Column(db.String(500))  # 缩略图链接
+    publish_time = db.Column(db.DateTime)  # 发布时间
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<News {self.seq} {self.news_id}>'
+
+
+class NewsTag(db.Model):
+    """资讯倒排索引：(标签类型, 标签代码) -> 资讯序号，按主键前缀读取一个基金或板块的资讯"""
+    __tablename__ = 'news_tags'
+    __table_args__ = (
+        db.Index('ix_news_tags_news_seq', 'news_seq'),
+        {'sqlite_with_rowid': False}
+    )
+    
+    tag_type = db.Column(db.String(10), primary_key=True)  # fund / sector
+    tag_code = db.Column(db.String(10), primary_key=True)  # 基金代码或板块代码
+    news_seq = db.Column(db.Integer, db.ForeignKey('news.seq'), primary_key=True)  # 资讯序号
+    
+    def __repr__(self):
+        return f'<NewsTag {self.tag_type}:{self.tag_code} -> {self.news_seq}>'
+
+
+class UserNewsRead(db.Model):
+    """用户资讯已读状态：序号小于 read_before_seq 的资讯全部已读，之后的按位图记录"""
+    __tablename__ = 'user_news_reads'
+    
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    read_before_seq = db.Column(db.Integer, nullable=False, default=0)  # 位图起始序号
+    read_bitmap = db.Column(db.LargeBinary, nullable=False, default=b'')  # 第 i 位表示序号 read_before_seq + i 已读
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<UserNewsRead {self.user_id} {self.read_before_seq}>'
@@ -5,6 +5,10 @@ import uuid
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        # 首页概览统计未读消息数
+        db.Index('ix_notifications_user_read', 'user_id', 'is_read'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
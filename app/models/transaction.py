@@ -5,6 +5,10 @@ import uuid
 
 class Holding(db.Model):
     __tablename__ = 'holdings'
+    __table_args__ = (
+        # 首页概览按用户汇总持仓，买卖按 (用户, 基金) 定位
+        db.Index('ix_holdings_user_fund', 'user_id', 'fund_code'),
+    )
     
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
@@ -0,0 +1,96 @@
+"""
+多基金业绩对比
+
+把多只基金的净值序列对齐到共同的交易日并归一化到 1.0。对齐不逐日循环：所有基金的日期拼接后
+用一次 np.unique 计数找出每只基金都有的日期，再以 基金序号 * 步长 + 日期 的复合键做一次
+searchsorted，直接取出 基金数 x 日期数 的净值矩阵；统计指标也都在矩阵上按行计算。
+"""
+import numpy as np
+
+# 年化波动率按每年交易日数折算
+TRADING_DAYS_PER_YEAR = 252
+
+
+def comparison_values(series):
+    """对比使用的净值：累计净值完整时用累计净值（包含分红），否则用单位净值"""
+    if len(series) and not np.isnan(series.accumulated_values).any():
+        return series.accumulated_values
+    return series.net_values
+
+
+def align_series(series_list):
+    """
+    将多条净值序列对齐到共同交易日
+
+    series_list 为 NavSeries 列表，返回 (共同日期 datetime64[D] 数组, 基金数 x 日期数 的净值矩阵)。
+    净值缺失（NaN）的日期不参与对齐。
+    """
+    count = len(series_list)
+    day_arrays = []
+    value_arrays = []
+    for series in series_list:
+        values = comparison_values(series)
+        valid = ~np.isnan(values)
+        day_arrays.append(series.dates[valid].astype(np.int64))
+        value_arrays.append(values[valid])
+
+    lengths = np.array([len(days) for days in day_arrays], dtype=np.int64)
+    if count == 0 or not lengths.all():
+        return np.array([], dtype='datetime64[D]'), np.empty((count, 0))
+
+    days = np.concatenate(day_arrays)
+    values = np.concatenate(value_arrays)
+    unique_days, counts = np.unique(days, return_counts=True)
+    common = unique_days[counts == count]
+
+    origin = days.min()
+    stride = days.max() - origin + 1
+    fund_ids = np.repeat(np.arange(count, dtype=np.int64), lengths)
+    keys = fund_ids * stride + (days - origin)
+    targets = (np.arange(count, dtype=np.int64)[:, None] * stride + (common - origin)[None, :]).ravel()
+    matrix = values[np.searchsorted(keys, targets)].reshape(count, len(common))
+    return common.astype('datetime64[D]'), matrix
+
+
+def normalize(matrix):
+    """每只基金除以区间首日净值，基准为 1.0"""
+    if not matrix.shape[1]:
+        return matrix
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return matrix / matrix[:, :1]
+
+
+def comparison_statistics(dates, normalized):
+    """
+    按行计算对比统计：区间收益、年化收益、年化波动率、最大回撤（均为百分比），以及日收益相关系数矩阵
+
+    返回 (各指标 {名称: ndarray}, 相关系数矩阵)；数据点不足时对应指标为 NaN。
+    """
+    count, length = normalized.shape
+    nan = np.full(count, np.nan)
+    if length < 2:
+        stats = {
+            'total_return': np.zeros(count) if length else nan,
+            'annualized_return': nan,
+            'volatility': nan,
+            'max_drawdown': np.zeros(count) if length else nan
+        }
+        return stats, np.full((count, count), np.nan)
+
+    span_days = int((dates[-1] - dates[0]).astype(np.int64))
+    last = normalized[:, -1]
+    daily_returns = normalized[:, 1:] / normalized[:, :-1] - 1
+    drawdowns = normalized / np.maximum.accumulate(normalized, axis=1) - 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annualized = (last ** (365.0 / span_days) - 1) * 100 if span_days else nan
+        volatility = daily_returns.std(axis=1, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR) * 100 if length > 2 else nan
+        correlation = np.corrcoef(daily_returns) if count > 1 and length > 2 else np.full((count, count), np.nan)
+
+    stats = {
+        'total_return': (last - 1) * 100,
+        'annualized_return': annualized,
+        'volatility': volatility,
+        'max_drawdown': drawdowns.min(axis=1) * 100
+    }
+    return stats, np.atleast_2d(correlation)
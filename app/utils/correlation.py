@@ -0,0 +1,227 @@
+"""
+基金收益相关性
+
+每日批量任务把所有基金近一年的日收益排成 基金数 x 交易日数 的矩阵，按行标准化后分块做矩阵乘法
+得到相关系数（同时用 0/1 掩码矩阵相乘得到每对基金的共同交易日数），每只基金只保留相关性最高的
+前 K 只写入 fund_correlations，存储量与基金数量成线性关系。
+
+持仓组合的分散度在请求时根据组合内基金的对齐净值直接计算。
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from app import db
+from app.models.fund import Fund, FundCorrelation, FundNavHistory
+from app.utils.compare import align_series
+from app.utils.nav_store import get_nav_series
+from app.utils.returns import build_panel
+
+# 分块计算时每块的基金数，控制单次矩阵乘法的内存
+BLOCK_SIZE = 1024
+
+
+def build_return_matrix(fund_count, offsets, dates, values):
+    """
+    将面板净值转换为日收益矩阵
+
+    返回 (基金数 x 交易日数 的日收益矩阵, 交易日数组)；基金在某日没有净值或为首个净值时为 NaN。
+    日收益按该基金相邻两个净值计算。
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    days, day_index = np.unique(dates, return_inverse=True)
+    matrix = np.full((fund_count, len(days)), np.nan)
+    if not len(dates):
+        return matrix, days
+
+    lengths = np.diff(offsets)
+    fund_ids = np.repeat(np.arange(fund_count, dtype=np.int64), lengths)
+    returns = np.full(len(values), np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = values[1:] / values[:-1] - 1
+    returns[offsets[:-1][lengths > 0]] = np.nan
+    matrix[fund_ids, day_index] = returns
+    return matrix, days
+
+
+def top_correlations(returns, top_k, min_overlap, block_size=BLOCK_SIZE):
+    """
+    计算每只基金相关性最高的 top_k 只基金
+
+    returns 为日收益矩阵（NaN 表示缺失）。每行按自身均值和标准差标准化、缺失处填0后分块相乘，
+    除以共同交易日数得到相关系数（缺失日不多时与逐对计算的结果基本一致）；共同交易日少于 min_overlap
+    的组合不参与。
+    返回 (下标, 相关系数, 共同交易日数)，形状均为 基金数 x top_k，不足处下标为 -1。
+    """
+    fund_count = returns.shape[0]
+    top_k = max(min(top_k, fund_count - 1), 0)
+    indices = np.full((fund_count, top_k), -1, dtype=np.int64)
+    correlations = np.full((fund_count, top_k), np.nan)
+    overlaps = np.zeros((fund_count, top_k), dtype=np.int64)
+    if not top_k:
+        return indices, correlations, overlaps
+
+    mask = ~np.isnan(returns)
+    counts = mask.sum(axis=1)
+    filled = np.where(mask, returns, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        means = filled.sum(axis=1) / counts
+        centered = np.where(mask, returns - means[:, None], 0.0)
+        stds = np.sqrt((centered * centered).sum(axis=1) / (counts - 1))
+        z = np.where(np.isfinite(stds)[:, None] & (stds > 0)[:, None], centered / stds[:, None], 0.0)
+    z = z.astype(np.float32)
+    presence = mask.astype(np.float32)
+
+    for start in range(0, fund_count, block_size):
+        stop = min(start + block_size, fund_count)
+        overlap = presence[start:stop] @ presence.T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = (z[start:stop] @ z.T) / (overlap - 1)
+        invalid = (overlap < max(min_overlap, 2)) | ~np.isfinite(corr)
+        invalid[np.arange(stop - start), np.arange(start, stop)] = True
+        corr = np.where(invalid, -np.inf, np.clip(corr, -1.0, 1.0))
+
+        candidates = np.argpartition(-corr, top_k - 1, axis=1)[:, :top_k]
+        candidate_corr = np.take_along_axis(corr, candidates, axis=1)
+        order = np.argsort(-candidate_corr, axis=1, kind='stable')
+        block_indices = np.take_along_axis(candidates, order, axis=1)
+        block_corr = np.take_along_axis(candidate_corr, order, axis=1)
+        block_overlap = np.take_along_axis(overlap, block_indices, axis=1)
+
+        found = np.isfinite(block_corr)
+        indices[start:stop] = np.where(found, block_indices, -1)
+        correlations[start:stop] = np.where(found, block_corr, np.nan)
+        overlaps[start:stop] = np.where(found, block_overlap, 0).astype(np.int64)
+    return indices, correlations, overlaps
+
+
+def calculate_correlations(as_of=None):
+    """从 fund_nav_history 读取计算窗口内的净值，返回每只基金前 K 只高相关基金的待写入行"""
+    config = current_app.config
+    if as_of is None:
+        as_of = db.session.query(db.func.max(FundNavHistory.nav_date)).scalar()
+        if as_of is None:
+            return []
+    since = as_of - timedelta(days=config['CORRELATION_WINDOW_DAYS'])
+
+    rows = db.session.execute(
+        db.select(FundNavHistory.fund_code, FundNavHistory.nav_date, FundNavHistory.net_value)
+        .where(FundNavHistory.nav_date >= since, FundNavHistory.nav_date <= as_of)
+        .order_by(FundNavHistory.fund_code, FundNavHistory.nav_date)
+    ).all()
+    fund_codes, offsets, dates = build_panel(rows)
+    if not fund_codes:
+        return []
+    values = np.fromiter((float(row[2]) for row in rows), dtype=np.float64, count=len(rows))
+
+    returns, _ = build_return_matrix(len(fund_codes), offsets, dates, values)
+    indices, correlations, overlaps = top_correlations(
+        returns, config['CORRELATION_TOP_K'], config['CORRELATION_MIN_OVERLAP']
+    )
+
+    now = datetime.utcnow()
+    index_lists = indices.tolist()
+    correlation_lists = correlations.tolist()
+    overlap_lists = overlaps.tolist()
+    result = []
+    for i, fund_code in enumerate(fund_codes):
+        for rank, (j, correlation, overlap) in enumerate(zip(index_lists[i], correlation_lists[i], overlap_lists[i]), 1):
+            if j < 0:
+                break
+            result.append({
+                'fund_code': fund_code,
+                'rank': rank,
+                'related_code': fund_codes[j],
+                'correlation': round(correlation, 4),
+                'overlap_days': overlap,
+                'computed_at': now
+            })
+    return result
+
+
+def store_correlations(rows):
+    """全量替换 fund_correlations（单个事务内先删后插）"""
+    table = FundCorrelation.__table__
+    connection = db.session.connection()
+    connection.execute(table.delete())
+    if rows:
+        connection.execute(table.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def refresh_correlations(as_of=None):
+    return store_correlations(calculate_correlations(as_of))
+
+
+def get_correlated_funds(fund_code, limit=10):
+    """按主键前缀读取一只基金相关性最高的基金，返回 [(FundCorrelation, 基金名称)]"""
+    return db.session.query(FundCorrelation, Fund.fund_name).join(
+        Fund, Fund.fund_code == FundCorrelation.related_code
+    ).filter(FundCorrelation.fund_code == fund_code).order_by(FundCorrelation.rank).limit(limit).all()
+
+
+def portfolio_diversification(weights):
+    """
+    计算持仓组合的分散度
+
+    weights 为 {fund_code: 市值}。在组合内基金共同交易日的日收益上计算相关系数矩阵，返回加权平均
+    两两相关系数、分散化比率（各基金波动率加权和 / 组合波动率）、0-100 的分散度评分（1 - 平均相关系数，
+    负相关按0计）以及相关系数不低于 CORRELATION_HIGH_THRESHOLD 的基金对。
+    """
+    config = current_app.config
+    window_days = config['CORRELATION_WINDOW_DAYS']
+    high_correlation = config['CORRELATION_HIGH_THRESHOLD']
+    fund_codes = [code for code, weight in weights.items() if weight and weight > 0] or list(weights)
+    result = {
+        'fund_count': len(fund_codes),
+        'observations': 0,
+        'average_correlation': None,
+        'diversification_ratio': None,
+        'score': None,
+        'highly_correlated_pairs': []
+    }
+    if len(fund_codes) < 2:
+        return result
+
+    series_list = []
+    for code in fund_codes:
+        series = get_nav_series(code)
+        if series.last_date is not None:
+            series = series.slice(series.last_date - timedelta(days=window_days), series.last_date)
+        series_list.append(series)
+    dates, matrix = align_series(series_list)
+    if matrix.shape[1] < 3:
+        return result
+
+    returns = matrix[:, 1:] / matrix[:, :-1] - 1
+    w = np.array([float(weights[code] or 0) for code in fund_codes])
+    w = w / w.sum() if w.sum() > 0 else np.full(len(fund_codes), 1.0 / len(fund_codes))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.corrcoef(returns)
+        covariance = np.cov(returns)
+        vols = np.sqrt(np.diag(covariance))
+        pair_weights = np.outer(w, w)
+        np.fill_diagonal(pair_weights, 0.0)
+        valid = np.isfinite(corr)
+        average = (np.where(valid, corr, 0.0) * pair_weights).sum() / (pair_weights * valid).sum()
+        portfolio_vol = np.sqrt(w @ covariance @ w)
+        ratio = (w @ vols) / portfolio_vol
+
+    pairs = []
+    upper_i, upper_j = np.triu_indices(len(fund_codes), k=1)
+    for i, j in zip(upper_i.tolist(), upper_j.tolist()):
+        if np.isfinite(corr[i, j]) and corr[i, j] >= high_correlation:
+            pairs.append({'fund_codes': [fund_codes[i], fund_codes[j]], 'correlation': round(float(corr[i, j]), 4)})
+    pairs.sort(key=lambda pair: -pair['correlation'])
+
+    result.update({
+        'observations': int(returns.shape[1]),
+        'average_correlation': round(float(average), 4) if np.isfinite(average) else None,
+        'diversification_ratio': round(float(ratio), 4) if np.isfinite(ratio) else None,
+        'score': round((1 - max(float(average), 0.0)) * 100, 1) if np.isfinite(average) else None,
+        'highly_correlated_pairs': pairs
+    })
+    return result
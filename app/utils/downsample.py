@@ -0,0 +1,64 @@
+"""
+净值曲线降采样
+
+使用 Largest-Triangle-Three-Buckets (LTTB) 算法在保留曲线形状（峰谷、拐点）的前提下，
+将长区间的日净值压缩到指定点数，首尾两点总是保留。
+"""
+import numpy as np
+from flask import current_app
+
+from app.utils.cache import LRUCache
+
+EXTENSION_KEY = 'nav_downsample_cache'
+
+
+def lttb_indices(x, y, threshold):
+    """返回 LTTB 选中的点的下标（升序）；点数不超过 threshold 时原样返回全部下标"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    every = (n - 2) / (threshold - 2)
+    # 第 i 个桶为 [edges[i], edges[i + 1])，首尾两点单独成桶
+    edges = (np.floor(np.arange(threshold - 1) * every) + 1).astype(np.int64)
+    edges[-1] = n - 1
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        # 以上一个选中点和下一个桶的均值点为底边，取当前桶中三角形面积最大的点
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def downsample_nav_series(series, threshold):
+    """对 NavSeries 按单位净值曲线做 LTTB 降采样，返回新的 NavSeries"""
+    if len(series) <= threshold:
+        return series
+    x = series.dates.astype(np.int64)
+    indices = lttb_indices(x, series.net_values, threshold)
+    return type(series)(*(getattr(series, name)[indices] for name in series.__slots__))
+
+
+def get_downsample_cache():
+    """降采样结果缓存，键为 (fund_code, start, end, points)"""
+    cache = current_app.extensions.get(EXTENSION_KEY)
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            EXTENSION_KEY, LRUCache(current_app.config.get('NAV_DOWNSAMPLE_CACHE_SIZE', 1024))
+        )
+    return cache
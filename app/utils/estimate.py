@@ -0,0 +1,388 @@
+"""
+盘中估值
+
+基金的重仓证券及占净值比例保存在 fund_portfolio_holdings（定期报告披露后用 load_fund_holdings.py 导入），
+个股盘中行情由行情源持续写入 security_quotes（load_security_quotes.py 或 POST /api/market/securities），
+指数涨跌取主要指数快照。
+
+每个进程在内存中把全部基金的持仓排成稀疏矩阵（COO：基金下标、证券下标、权重），证券当日涨跌幅为一个
+向量。行情变化时只更新向量中对应的元素，然后用一次稀疏矩阵向量乘法（np.bincount 按基金累加
+权重 x 涨跌幅）重算所有基金的估值：
+
+    估算涨跌幅 = Σ 权重 x 证券涨跌幅 / Σ 有行情证券的权重
+
+即以已披露重仓证券的加权涨跌幅代表整只基金，同时返回有行情的重仓证券占净值比例（coverage），覆盖率
+越低估值越不可靠。当日停牌（行情不属于最新交易日）的证券按涨跌幅0计。估算净值 = 最新公布净值 x (1 + 估算涨跌幅)。
+基准净值记录其所属日期，最新公布净值已属于估值交易日（或更晚）时当日净值已经公布，不再返回估值。
+
+结果是不可变快照，基金详情和自选列表直接读取；其他进程写入的行情每隔 ESTIMATE_REFRESH_SECONDS 按
+update_time 水位线增量读取后重算（水位线上的行情去重，见 app/utils/watermark.py）；基准净值在
+data_versions 中的行情版本变化时重新读取，同一时间的净值修正也会生效。
+"""
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+import numpy as np
+from flask import current_app
+
+from app import db
+from app.models.fund import Fund, FundLatestQuote, FundPortfolioHolding
+from app.models.market import SecurityQuote
+from app.utils.index_quotes import get_index_snapshot
+from app.utils.quotes import QUOTES_VERSION, UPSERT_DIALECTS, data_version
+from app.utils.watermark import Watermark
+
+EXTENSION_KEY = 'nav_estimate'
+
+SECURITY_STOCK = 'stock'
+SECURITY_INDEX = 'index'
+SECURITY_TYPES = (SECURITY_STOCK, SECURITY_INDEX)
+
+_EPOCH = date(1970, 1, 1)
+
+
+class InvalidEstimateFeed(ValueError):
+    """持仓或证券行情数据格式错误"""
+
+
+class EstimateSnapshot:
+    """某一时刻全部基金估值的只读快照"""
+
+    __slots__ = ('_fund_index', 'rates', 'coverage', 'base_navs', 'session', 'estimate_time', 'version')
+
+    def __init__(self, fund_index=None, rates=None, coverage=None, base_navs=None, session=-1, estimate_time=None,
+                 version=0):
+        self._fund_index = fund_index or {}
+        self.rates = rates if rates is not None else np.empty(0)
+        self.coverage = coverage if coverage is not None else np.empty(0)
+        self.base_navs = base_navs or []  # (基准净值, 净值所属交易日)，交易日为自 1970-01-01 起的天数，未知为 -1
+        self.session = session  # 估值交易日
+        self.estimate_time = estimate_time
+        self.version = version
+
+    def get(self, fund_code):
+        """返回一只基金的估值，没有持仓数据、重仓证券均无行情或估值交易日的净值已公布时返回 None"""
+        i = self._fund_index.get(fund_code)
+        if i is None or not np.isfinite(self.rates[i]):
+            return None
+        base_nav, base_day = self.base_navs[i]
+        if base_day >= self.session:
+            return None
+        rate = float(self.rates[i])
+        estimated_nav = None
+        if base_nav is not None:
+            estimated_nav = (base_nav * (1 + Decimal(repr(rate)) / 100)).quantize(Decimal('0.0001'))
+        return {
+            'estimated_nav': str(estimated_nav) if estimated_nav is not None else None,
+            'estimated_change_rate': f'{rate:.2f}',
+            'base_nav': str(base_nav) if base_nav is not None else None,
+            'coverage': f'{float(self.coverage[i]):.2f}',
+            'estimate_time': self.estimate_time.isoformat() if self.estimate_time is not None else None
+        }
+
+
+class EstimateEngine:
+    """持仓稀疏矩阵和证券涨跌幅向量；读操作无锁，同步和重算串行"""
+
+    def __init__(self, refresh_seconds=5):
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._snapshot = EstimateSnapshot()
+        self._checked_at = None
+        self._holdings_version = None
+        self._quote_watermark = Watermark()
+        self._index_version = None
+        self._nav_version = None
+
+        self._fund_codes = []
+        self._fund_index = {}
+        self._security_index = {}  # (证券类型, 证券代码) -> 列下标
+        self._rows = np.empty(0, dtype=np.int64)
+        self._cols = np.empty(0, dtype=np.int64)
+        self._weights = np.empty(0)
+        self._moves = np.empty(0)  # 证券涨跌幅（%）
+        self._days = np.empty(0, dtype=np.int64)  # 行情所属交易日（自 1970-01-01 起的天数），无行情为 -1
+        self._times = []  # 证券行情时间
+        self._base_navs = []
+
+    def load_holdings(self, rows):
+        """重建持仓矩阵，rows 为 (fund_code, security_type, security_code, weight)；证券行情和基准净值需重新设置"""
+        fund_index = {}
+        security_index = {}
+        fund_ids = []
+        security_ids = []
+        weights = []
+        for fund_code, security_type, security_code, weight in rows:
+            fund_ids.append(fund_index.setdefault(fund_code, len(fund_index)))
+            security_ids.append(security_index.setdefault((security_type, security_code), len(security_index)))
+            weights.append(float(weight) / 100)
+
+        self._fund_codes = list(fund_index)
+        self._fund_index = fund_index
+        self._security_index = security_index
+        self._rows = np.array(fund_ids, dtype=np.int64)
+        self._cols = np.array(security_ids, dtype=np.int64)
+        self._weights = np.array(weights, dtype=np.float64)
+        self._moves = np.zeros(len(security_index))
+        self._days = np.full(len(security_index), -1, dtype=np.int64)
+        self._times = [None] * len(security_index)
+        self._base_navs = [(None, -1)] * len(fund_index)
+
+    def set_moves(self, security_type, quotes):
+        """更新证券涨跌幅，quotes 为 (security_code, change_rate, trade_date, update_time)，返回是否有持仓涉及的证券"""
+        changed = False
+        for security_code, change_rate, trade_date, update_time in quotes:
+            column = self._security_index.get((security_type, security_code))
+            if column is None or change_rate is None or trade_date is None:
+                continue
+            self._moves[column] = float(change_rate)
+            self._days[column] = (trade_date - _EPOCH).days
+            self._times[column] = update_time
+            changed = True
+        return changed
+
+    def set_base_navs(self, rows):
+        """设置估值基准（最新公布净值及其所属交易日），rows 为 (fund_code, net_value, update_time)"""
+        for fund_code, net_value, update_time in rows:
+            i = self._fund_index.get(fund_code)
+            if i is not None:
+                self._base_navs[i] = (net_value, (update_time.date() - _EPOCH).days if update_time is not None else -1)
+
+    def recompute(self):
+        """一次稀疏矩阵向量乘法重算全部基金的估算涨跌幅和覆盖率，替换快照"""
+        known = self._days >= 0
+        session = self._days[known].max() if known.any() else -1
+        moves = np.where(self._days == session, self._moves, 0.0)
+        weights = self._weights * known[self._cols]
+        fund_count = len(self._fund_codes)
+        weighted = np.bincount(self._rows, weights=weights * moves[self._cols], minlength=fund_count)
+        covered = np.bincount(self._rows, weights=weights, minlength=fund_count)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates = np.where(covered > 0, weighted / covered, np.nan)
+
+        times = [update_time for update_time, day in zip(self._times, self._days.tolist())
+                 if day == session and update_time is not None]
+        self._snapshot = EstimateSnapshot(
+            self._fund_index, rates, covered * 100, list(self._base_navs), int(session),
+            max(times) if times else None, self._snapshot.version + 1
+        )
+        return self._snapshot
+
+    def refresh(self):
+        """与数据库同步：持仓变化时重建矩阵，否则只读取水位线之后的证券行情，有变化时重算"""
+        with self._lock:
+            changed = False
+            holdings_version = tuple(db.session.query(
+                db.func.count(), db.func.max(FundPortfolioHolding.updated_at)
+            ).select_from(FundPortfolioHolding).one())
+            if holdings_version != self._holdings_version:
+                self.load_holdings(db.session.query(
+                    FundPortfolioHolding.fund_code, FundPortfolioHolding.security_type,
+                    FundPortfolioHolding.security_code, FundPortfolioHolding.weight
+                ).order_by(FundPortfolioHolding.fund_code).all())
+                self._holdings_version = holdings_version
+                self._quote_watermark = Watermark()
+                self._index_version = self._nav_version = None
+                changed = True
+
+            quotes = db.session.query(
+                SecurityQuote.security_code, SecurityQuote.change_rate, SecurityQuote.trade_date, SecurityQuote.update_time
+            ).filter(self._quote_watermark.condition(SecurityQuote.update_time)).all()
+            fresh = set(self._quote_watermark.advance(
+                ((quote.security_code, quote.update_time), quote.update_time) for quote in quotes
+            ))
+            quotes = [quote for quote in quotes if (quote.security_code, quote.update_time) in fresh]
+            if quotes:
+                changed = self.set_moves(SECURITY_STOCK, quotes) or changed
+
+            index_snapshot = get_index_snapshot()
+            if index_snapshot.version != self._index_version:
+                self._index_version = index_snapshot.version
+                changed = self.set_moves(SECURITY_INDEX, [
+                    (quote.index_code, quote.daily_change_rate, quote.trade_date, quote.update_time)
+                    for quote in index_snapshot.quotes
+                ]) or changed
+
+            nav_version = db.session.query(data_version(QUOTES_VERSION)).scalar()
+            if nav_version is None or nav_version != self._nav_version:
+                self._nav_version = nav_version
+                self.set_base_navs(db.session.query(
+                    FundLatestQuote.fund_code, FundLatestQuote.net_value, FundLatestQuote.update_time
+                ).filter(FundLatestQuote.fund_code.in_(db.select(FundPortfolioHolding.fund_code).distinct())))
+                changed = True
+
+            if changed:
+                self.recompute()
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+    def snapshot(self):
+        """返回当前快照；首次使用或到达检查间隔时先与数据库同步"""
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return self._snapshot
+        return self.refresh()
+
+
+def get_estimate_engine():
+    engine = current_app.extensions.get(EXTENSION_KEY)
+    if engine is None:
+        engine = current_app.extensions.setdefault(
+            EXTENSION_KEY, EstimateEngine(current_app.config.get('ESTIMATE_REFRESH_SECONDS', 5))
+        )
+    return engine
+
+
+def get_estimate_snapshot():
+    return get_estimate_engine().snapshot()
+
+
+def _decimal(record, key, label):
+    value = record.get(key)
+    if value is None or value == '':
+        return None
+    try:
+        number = Decimal(str(value))
+    except InvalidOperation:
+        raise InvalidEstimateFeed(f'{label} 的 {key} 不是数字: {value}')
+    if not number.is_finite():
+        raise InvalidEstimateFeed(f'{label} 的 {key} 不是有效数字: {value}')
+    return number
+
+
+def _parse_datetime(value, label):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise InvalidEstimateFeed(f'{label} 的时间格式错误: {value}')
+
+
+def parse_security_quote(record):
+    """
+    校验并规范化一条个股行情
+
+    必填 security_code 和 update_time；涨跌幅取 change_rate，未提供时由 price 和 previous_close 计算；
+    trade_date 默认为 update_time 所在日期。
+    """
+    if not isinstance(record, dict):
+        raise InvalidEstimateFeed('证券行情必须为对象')
+    security_code = str(record.get('security_code') or '').strip()
+    if not security_code:
+        raise InvalidEstimateFeed('证券行情缺少 security_code')
+    if record.get('update_time') in (None, ''):
+        raise InvalidEstimateFeed(f'证券 {security_code} 缺少 update_time')
+    update_time = _parse_datetime(record['update_time'], f'证券 {security_code}')
+    try:
+        trade_date = date.fromisoformat(str(record['trade_date'])) if record.get('trade_date') else update_time.date()
+    except ValueError:
+        raise InvalidEstimateFeed(f'证券 {security_code} 的 trade_date 格式错误')
+
+    price = _decimal(record, 'price', f'证券 {security_code}')
+    previous_close = _decimal(record, 'previous_close', f'证券 {security_code}')
+    change_rate = _decimal(record, 'change_rate', f'证券 {security_code}')
+    if change_rate is None:
+        if price is None or not previous_close:
+            raise InvalidEstimateFeed(f'证券 {security_code} 缺少 change_rate 或 price / previous_close')
+        change_rate = ((price / previous_close - 1) * 100).quantize(Decimal('0.0001'))
+    return {
+        'security_code': security_code,
+        'security_name': record.get('security_name'),
+        'price': price,
+        'previous_close': previous_close,
+        'change_rate': change_rate,
+        'trade_date': trade_date,
+        'update_time': update_time
+    }
+
+
+def ingest_security_quotes(records):
+    """写入个股行情（同一证券只在新行情不早于已有行情时覆盖）并立即重算本进程估值，返回写入条数"""
+    parsed = {}
+    for record in map(parse_security_quote, records):
+        current = parsed.get(record['security_code'])
+        if current is None or record['update_time'] >= current['update_time']:
+            parsed[record['security_code']] = record
+    rows = list(parsed.values())
+    if not rows:
+        return 0
+
+    table = SecurityQuote.__table__
+    connection = db.session.connection()
+    insert = UPSERT_DIALECTS.get(connection.dialect.name)
+    if insert is not None:
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.security_code],
+            set_={column: statement.excluded[column] for column in rows[0] if column != 'security_code'},
+            where=statement.excluded.update_time >= table.c.update_time
+        )
+        connection.execute(statement, rows)
+    else:
+        connection.execute(table.delete().where(table.c.security_code.in_(list(parsed))))
+        connection.execute(table.insert(), rows)
+    db.session.commit()
+    get_estimate_engine().refresh()
+    return len(rows)
+
+
+def parse_fund_holdings(record, known_funds):
+    """校验一只基金的持仓披露：{fund_code, disclosure_date, holdings: [{security_code, security_type, security_name, weight}]}"""
+    if not isinstance(record, dict):
+        raise InvalidEstimateFeed('持仓披露必须为对象')
+    fund_code = str(record.get('fund_code') or '').strip()
+    if fund_code not in known_funds:
+        raise InvalidEstimateFeed(f'基金 {fund_code} 不存在')
+    try:
+        disclosure_date = date.fromisoformat(str(record['disclosure_date'])) if record.get('disclosure_date') else None
+    except ValueError:
+        raise InvalidEstimateFeed(f'基金 {fund_code} 的 disclosure_date 格式错误')
+    holdings = record.get('holdings')
+    if not isinstance(holdings, list):
+        raise InvalidEstimateFeed(f'基金 {fund_code} 的 holdings 应为数组')
+
+    rows = {}
+    for holding in holdings:
+        if not isinstance(holding, dict) or not str(holding.get('security_code') or '').strip():
+            raise InvalidEstimateFeed(f'基金 {fund_code} 的持仓缺少 security_code')
+        security_code = str(holding['security_code']).strip()
+        security_type = holding.get('security_type') or SECURITY_STOCK
+        if security_type not in SECURITY_TYPES:
+            raise InvalidEstimateFeed(f'基金 {fund_code} 的持仓 {security_code} 证券类型无效: {security_type}')
+        weight = _decimal(holding, 'weight', f'基金 {fund_code} 的持仓 {security_code}')
+        if weight is None or not 0 < weight <= 100:
+            raise InvalidEstimateFeed(f'基金 {fund_code} 的持仓 {security_code} 占净值比例应在 0-100 之间')
+        rows[(security_type, security_code)] = {
+            'fund_code': fund_code,
+            'security_type': security_type,
+            'security_code': security_code,
+            'security_name': holding.get('security_name'),
+            'weight': weight,
+            'disclosure_date': disclosure_date
+        }
+    if sum(row['weight'] for row in rows.values()) > 100:
+        raise InvalidEstimateFeed(f'基金 {fund_code} 的持仓占净值比例合计超过100%')
+    return fund_code, list(rows.values())
+
+
+def replace_fund_holdings(records):
+    """按基金整体替换持仓披露并重算本进程估值，返回更新的基金数量"""
+    records = list(records)
+    codes = {str(record.get('fund_code') or '').strip() for record in records if isinstance(record, dict)}
+    known_funds = {code for code, in db.session.query(Fund.fund_code).filter(Fund.fund_code.in_(list(codes)))}
+    holdings = dict(parse_fund_holdings(record, known_funds) for record in records)
+    if not holdings:
+        return 0
+
+    table = FundPortfolioHolding.__table__
+    now = datetime.utcnow()
+    rows = [dict(row, updated_at=now) for fund_rows in holdings.values() for row in fund_rows]
+    connection = db.session.connection()
+    connection.execute(table.delete().where(table.c.fund_code.in_(list(holdings))))
+    if rows:
+        connection.execute(table.insert(), rows)
+    db.session.commit()
+    get_estimate_engine().refresh()
+    return len(holdings)
@@ -0,0 +1,91 @@
+"""
+首页概览缓存
+
+首页概览的主体分两部分缓存在进程内的 LRU 缓存中：
+
+- 资产概览和持仓概览按用户缓存，版本为持仓条数、持仓最近更新时间和所持基金的资料更新时间。买入、卖出、
+  导入持仓提交后还会调用 invalidate_home_overview 直接清除该用户的条目；
+- 推荐基金只取决于最新行情、同类排名和风险等级，按风险等级缓存，版本为 data_versions 中的行情版本、
+  排名版本和基金资料更新时间。行情版本在每次写入最新行情的事务内递增，同一时间的行情修正也会使其失效，
+  而行情写入不会使各用户的持仓部分失效。
+
+每次请求先用一条语句取出上述状态和未读消息数，状态与缓存条目一致时直接返回缓存，否则只重建失效的部分。
+状态来自数据库，其他进程写入的交易和行情同样会使缓存失效。
+"""
+from collections import namedtuple
+
+from flask import current_app
+
+from app import db
+from app.models.fund import Fund, FundLatestQuote
+from app.models.notification import Notification
+from app.models.transaction import Holding
+from app.models.user import UserProfile
+from app.utils.cache import LRUCache
+from app.utils.peer_rank import PEER_RANKS_VERSION
+from app.utils.quotes import QUOTES_VERSION, data_version
+
+EXTENSION_KEY = 'home_overview_cache'
+RECOMMENDATION_EXTENSION_KEY = 'home_recommendation_cache'
+
+# 未提供风险测评结果时按稳健型推荐
+DEFAULT_RISK_LEVEL = 'R3'
+
+OverviewState = namedtuple('OverviewState', (
+    'holdings_count', 'holdings_updated_at', 'holding_fund_time', 'quote_version', 'rank_version', 'quote_time',
+    'fund_time', 'risk_level', 'unread_notifications_count'
+))
+
+
+def get_overview_state(user_id):
+    """一条语句取出用户的首页数据状态和未读消息数"""
+    held_funds = db.select(Holding.fund_code).where(Holding.user_id == user_id)
+    row = db.session.query(
+        db.select(db.func.count(Holding.id)).where(Holding.user_id == user_id).scalar_subquery(),
+        db.select(db.func.max(Holding.updated_at)).where(Holding.user_id == user_id).scalar_subquery(),
+        db.select(db.func.max(Fund.updated_at)).where(Fund.fund_code.in_(held_funds)).scalar_subquery(),
+        data_version(QUOTES_VERSION),
+        data_version(PEER_RANKS_VERSION),
+        db.select(db.func.max(FundLatestQuote.update_time)).scalar_subquery(),
+        db.select(db.func.max(Fund.updated_at)).scalar_subquery(),
+        db.select(UserProfile.risk_level).where(UserProfile.user_id == user_id).limit(1).scalar_subquery(),
+        db.select(db.func.count(Notification.id)).where(
+            Notification.user_id == user_id, Notification.is_read.is_(False)
+        ).scalar_subquery()
+    ).one()
+    return OverviewState(*row)
+
+
+def holdings_key(state):
+    """持仓部分的版本：不含行情和未读消息数"""
+    return state.holdings_count, state.holdings_updated_at, state.holding_fund_time
+
+
+def recommendation_key(state):
+    """推荐基金的版本"""
+    return state.quote_version, state.rank_version, state.fund_time
+
+
+def get_overview_cache():
+    """持仓部分缓存，键为 user_id，值为 (版本, 资产概览和持仓概览)"""
+    cache = current_app.extensions.get(EXTENSION_KEY)
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            EXTENSION_KEY, LRUCache(current_app.config.get('HOME_OVERVIEW_CACHE_SIZE', 10000))
+        )
+    return cache
+
+
+def get_recommendation_cache():
+    """推荐基金缓存，键为风险等级，值为 (版本, 推荐基金)；风险等级只有几档，缓存很小"""
+    cache = current_app.extensions.get(RECOMMENDATION_EXTENSION_KEY)
+    if cache is None:
+        cache = current_app.extensions.setdefault(RECOMMENDATION_EXTENSION_KEY, LRUCache(16))
+    return cache
+
+
+def invalidate_home_overview(user_id):
+    """清除用户的持仓部分缓存（买入、卖出、导入持仓提交后调用）"""
+    cache = current_app.extensions.get(EXTENSION_KEY)
+    if cache is not None:
+        cache.pop(user_id)
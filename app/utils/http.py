@@ -0,0 +1,96 @@
+"""
+HTTP 工具
+
+conditional 装饰器先用一次轻量查询得到资源的版本（ETag）和最后修改时间，
+客户端缓存仍然有效时直接返回 304，跳过查询正文数据和序列化。
+feed_token_required 保护行情源写入接口。
+"""
+import hashlib
+import hmac
+from datetime import timezone
+from functools import wraps
+
+from flask import request, make_response, current_app
+from flask_restx import abort
+from werkzeug.http import http_date
+
+
+def make_etag(*parts):
+    """根据版本信息生成强 ETag 值（不含引号）"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def _as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def is_not_modified(etag, last_modified):
+    """按 RFC 9110 判断条件请求：有 If-None-Match 时忽略 If-Modified-Since"""
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified is not None:
+        return _as_utc(last_modified) <= request.if_modified_since
+    return False
+
+
+def _unpack(rv):
+    if isinstance(rv, tuple):
+        data = rv[0]
+        status = rv[1] if len(rv) > 1 else 200
+        headers = dict(rv[2]) if len(rv) > 2 else {}
+        return data, status, headers
+    return rv, 200, {}
+
+
+def conditional(validators):
+    """
+    为 GET 接口增加 ETag / Last-Modified 支持
+
+    validators 与被装饰方法接收相同参数，返回 (etag, last_modified)；返回 None 时不做条件处理
+    （例如资源不存在，交给接口本身返回404）。装饰器需放在 marshal_with 外层。
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            version = validators(*args, **kwargs)
+            if version is None:
+                return func(*args, **kwargs)
+
+            etag, last_modified = version
+            headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
+            if last_modified is not None:
+                headers['Last-Modified'] = http_date(_as_utc(last_modified))
+
+            if is_not_modified(etag, last_modified):
+                response = make_response('', 304)
+                response.headers.update(headers)
+                return response
+
+            data, status, extra_headers = _unpack(func(*args, **kwargs))
+            if hasattr(data, 'headers'):
+                data.headers.update(headers)
+                return data
+            headers.update(extra_headers)
+            return data, status, headers
+        return wrapper
+    return decorator
+
+
+def feed_token_required(func):
+    """
+    行情源写入接口校验 X-Feed-Token 请求头
+
+    令牌由配置项 MARKET_FEED_TOKEN 指定；未配置时写入接口关闭，一律返回403。
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        expected = current_app.config.get('MARKET_FEED_TOKEN')
+        provided = request.headers.get('X-Feed-Token', '')
+        if not expected or not hmac.compare_digest(provided.encode('utf-8'), expected.encode('utf-8')):
+            abort(403, '行情源令牌无效')
+        return func(*args, **kwargs)
+    return wrapper
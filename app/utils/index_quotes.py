@@ -0,0 +1,268 @@
+"""
+主要指数行情
+
+指数最新行情和最近一个交易日的分时点数由行情源写入 market_indices / market_index_ticks
+（本地文件用 load_index_quotes.py 导入，或调用 POST /api/market/index）。每个进程在内存中保存
+一份不可变的 IndexSnapshot，市场指数接口和首页概览直接读取，不访问数据库；写入后整体构建新快照
+并替换引用（单次赋值，读方要么看到旧快照、要么看到新快照）。其他进程写入的行情每隔
+INDEX_REFRESH_SECONDS 检查一次版本后重新加载。
+"""
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, date, time as time_of_day, timedelta
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app
+
+from app import db
+from app.models.market import MarketIndex, MarketIndexTick
+
+EXTENSION_KEY = 'index_quotes'
+
+IndexQuote = namedtuple('IndexQuote', (
+    'index_code', 'index_name', 'current_point', 'previous_close', 'daily_change', 'daily_change_rate',
+    'trade_date', 'update_time', 'intraday'
+))
+
+
+class InvalidIndexFeed(ValueError):
+    """指数行情数据格式错误"""
+
+
+class IndexSnapshot:
+    """某一时刻全部指数行情的只读快照"""
+
+    __slots__ = ('quotes', '_by_code', 'version')
+
+    def __init__(self, quotes, version=None):
+        self.quotes = tuple(quotes)
+        self._by_code = {quote.index_code: quote for quote in self.quotes}
+        self.version = version
+
+    def get(self, index_code):
+        return self._by_code.get(index_code)
+
+    @property
+    def update_time(self):
+        times = [quote.update_time for quote in self.quotes if quote.update_time is not None]
+        return max(times) if times else None
+
+
+def _version_query():
+    """数据版本：指数行情和分时点的最新时间与行数"""
+    indices = db.session.query(db.func.max(MarketIndex.update_time), db.func.count(MarketIndex.index_code)).one()
+    ticks = db.session.query(db.func.max(MarketIndexTick.tick_time), db.func.count()).select_from(MarketIndexTick).one()
+    return tuple(indices) + tuple(ticks)
+
+
+def build_snapshot():
+    """从数据库构建快照：指数按展示顺序排列，分时只取各指数行情所属交易日"""
+    version = _version_query()
+    indices = MarketIndex.query.order_by(MarketIndex.display_order, MarketIndex.index_code).all()
+    ticks = {}
+    for index_code, tick_time, point in db.session.query(
+        MarketIndexTick.index_code, MarketIndexTick.tick_time, MarketIndexTick.point
+    ).order_by(MarketIndexTick.index_code, MarketIndexTick.tick_time):
+        ticks.setdefault(index_code, []).append((tick_time, point))
+
+    quotes = []
+    for index in indices:
+        series = ticks.get(index.index_code, [])
+        if index.trade_date is not None:
+            series = [tick for tick in series if tick[0].date() == index.trade_date]
+        quotes.append(IndexQuote(
+            index.index_code, index.index_name, index.current_point, index.previous_close,
+            index.daily_change, index.daily_change_rate, index.trade_date, index.update_time, tuple(series)
+        ))
+    return IndexSnapshot(quotes, version)
+
+
+class IndexQuoteStore:
+    """持有当前快照；读操作无锁，加载和替换串行"""
+
+    def __init__(self, refresh_seconds=10):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def swap(self, snapshot):
+        self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+
+    def reload(self):
+        with self._lock:
+            self.swap(build_snapshot())
+        return self._snapshot
+
+    def snapshot(self):
+        """返回当前快照；首次使用或到达检查间隔时对比数据库版本，变化后重新加载"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.refresh_seconds:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or _version_query() != self._snapshot.version:
+                self.swap(build_snapshot())
+            else:
+                self._checked_at = time.monotonic()
+            return self._snapshot
+
+
+def get_index_store():
+    store = current_app.extensions.get(EXTENSION_KEY)
+    if store is None:
+        store = current_app.extensions.setdefault(
+            EXTENSION_KEY, IndexQuoteStore(current_app.config.get('INDEX_REFRESH_SECONDS', 10))
+        )
+    return store
+
+
+def get_index_snapshot():
+    return get_index_store().snapshot()
+
+
+def _decimal(record, key, required=False):
+    value = record.get(key)
+    if value is None or value == '':
+        if required:
+            raise InvalidIndexFeed(f'指数 {record.get("index_code")} 缺少 {key}')
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise InvalidIndexFeed(f'指数 {record.get("index_code")} 的 {key} 不是数字: {value}')
+
+
+def _datetime(value, trade_date=None):
+    """解析 ISO 时间；只有时分（如 09:30）时与交易日拼接"""
+    if isinstance(value, datetime):
+        return value
+    text = str(value).strip()
+    try:
+        if trade_date is not None and len(text) <= 8 and ':' in text:
+            return datetime.combine(trade_date, time_of_day.fromisoformat(text))
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise InvalidIndexFeed(f'无法解析的时间: {value}')
+
+
+def parse_index_record(record):
+    """
+    校验并规范化一条指数行情
+
+    必填 index_code、index_name、current_point、update_time；未提供 daily_change / daily_change_rate 时
+    由 previous_close 计算。intraday 为 [[时间, 点数], ...]，时间可为完整 ISO 时间或当日时分。
+    """
+    if not isinstance(record, dict):
+        raise InvalidIndexFeed('指数行情必须为对象')
+    index_code = str(record.get('index_code') or '').strip()
+    index_name = str(record.get('index_name') or '').strip()
+    if not index_code or not index_name:
+        raise InvalidIndexFeed('指数行情缺少 index_code 或 index_name')
+    if record.get('update_time') is None:
+        raise InvalidIndexFeed(f'指数 {index_code} 缺少 update_time')
+
+    update_time = _datetime(record['update_time'])
+    try:
+        trade_date = date.fromisoformat(str(record['trade_date'])) if record.get('trade_date') else update_time.date()
+        display_order = int(record['display_order']) if record.get('display_order') is not None else None
+    except ValueError:
+        raise InvalidIndexFeed(f'指数 {index_code} 的 trade_date 或 display_order 格式错误')
+    current_point = _decimal(record, 'current_point', required=True)
+    previous_close = _decimal(record, 'previous_close')
+    daily_change = _decimal(record, 'daily_change')
+    daily_change_rate = _decimal(record, 'daily_change_rate')
+    if previous_close is None and daily_change is not None:
+        previous_close = current_point - daily_change
+    if daily_change is None and previous_close is not None:
+        daily_change = current_point - previous_close
+    if daily_change_rate is None and daily_change is not None and previous_close:
+        daily_change_rate = (daily_change / previous_close * 100).quantize(Decimal('0.01'))
+
+    intraday = None
+    if record.get('intraday') is not None:
+        intraday = {}
+        for tick in record['intraday']:
+            if not isinstance(tick, (list, tuple)) or len(tick) != 2:
+                raise InvalidIndexFeed(f'指数 {index_code} 的分时数据格式应为 [时间, 点数]')
+            intraday[_datetime(tick[0], trade_date)] = _decimal({'index_code': index_code, 'point': tick[1]}, 'point', True)
+
+    return {
+        'index_code': index_code,
+        'index_name': index_name,
+        'display_order': display_order,
+        'current_point': current_point,
+        'previous_close': previous_close,
+        'daily_change': daily_change,
+        'daily_change_rate': daily_change_rate,
+        'trade_date': trade_date,
+        'update_time': update_time,
+        'intraday': intraday
+    }
+
+
+def ingest_index_quotes(records):
+    """
+    写入指数行情并替换本进程快照，返回写入的指数数量
+
+    行情时间早于已有数据的记录不覆盖最新行情（分时点仍会合并）；进入新交易日时删除旧交易日的分时。
+    """
+    parsed = [parse_index_record(record) for record in records]
+    ticks = MarketIndexTick.__table__
+    for record in parsed:
+        index = db.session.get(MarketIndex, record['index_code'])
+        if index is None:
+            index = MarketIndex(index_code=record['index_code'], display_order=0)
+            db.session.add(index)
+        if record['display_order'] is not None:
+            index.display_order = record['display_order']
+        if index.update_time is None or record['update_time'] >= index.update_time:
+            for key in ('index_name', 'current_point', 'previous_close', 'daily_change', 'daily_change_rate',
+                        'trade_date', 'update_time'):
+                setattr(index, key, record[key])
+        db.session.flush()
+
+        if record['intraday'] is not None:
+            session_start = datetime.combine(index.trade_date, time_of_day())
+            connection = db.session.connection()
+            connection.execute(ticks.delete().where(
+                (ticks.c.index_code == index.index_code) & (
+                    (ticks.c.tick_time < session_start) | (ticks.c.tick_time >= session_start + timedelta(days=1))
+                )
+            ))
+            rows = [
+                {'index_code': index.index_code, 'tick_time': tick_time, 'point': point}
+                for tick_time, point in record['intraday'].items()
+                if tick_time.date() == index.trade_date
+            ]
+            if rows:
+                connection.execute(ticks.delete().where(
+                    (ticks.c.index_code == index.index_code) & ticks.c.tick_time.in_([row['tick_time'] for row in rows])
+                ))
+                connection.execute(ticks.insert(), rows)
+    db.session.commit()
+    get_index_store().reload()
+    return len(parsed)
+
+
+def serialize_index(quote):
+    return {
+        'index_code': quote.index_code,
+        'index_name': quote.index_name,
+        'current_point': str(quote.current_point) if quote.current_point is not None else None,
+        'daily_change': str(quote.daily_change) if quote.daily_change is not None else None,
+        'daily_change_rate': str(quote.daily_change_rate) if quote.daily_change_rate is not None else None,
+        'update_time': quote.update_time
+    }
+
+
+def serialize_intraday(quote):
+    return {
+        'index_code': quote.index_code,
+        'index_name': quote.index_name,
+        'trade_date': quote.trade_date.isoformat() if quote.trade_date else None,
+        'previous_close': str(quote.previous_close) if quote.previous_close is not None else None,
+        'current_point': str(quote.current_point) if quote.current_point is not None else None,
+        'points': [{'time': tick_time.isoformat(), 'point': str(point)} for tick_time, point in quote.intraday]
+    }
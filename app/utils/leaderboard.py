@@ -0,0 +1,306 @@
+"""
+市场涨跌排行榜
+
+在内存中按基金类型（以及全市场）维护三个有序榜单：涨幅榜、跌幅榜和波动榜（按日涨跌幅绝对值）。
+每个榜单是按 (排序键, fund_code) 排好序的列表，行情变化时用二分查找移除旧位置、插入新位置，
+单只基金的更新为 O(log n)；翻页直接切片，不再对全部行情排序。没有日涨跌幅的基金排在各榜单末尾。
+
+榜单在首次使用时从 funds ⨝ fund_latest_quotes 全量构建。之后每次读取前先做增量同步：
+本进程提交的基金和行情变更在提交后标记为待刷新；其他进程写入的行情每隔 LEADERBOARD_REFRESH_SECONDS
+按 update_time / updated_at 水位线查出一次（走索引，水位线上的记录去重，见 app/utils/watermark.py）。
+原地改写、保留 update_time 的行情（例如区间收益计算）水位线读不到，检查时同时比较 data_versions 中的
+行情版本，版本变化则全量重建。另外每隔 LEADERBOARD_RELOAD_SECONDS 全量重建一次兜底。
+
+接口的 ETag 取自榜单自身的状态（实例标识 + 每次重建、增量更新递增的版本号），与返回的内容一致：
+数据库已有新行情而榜单尚未同步时，ETag 不会先于内容变化。
+"""
+import threading
+import time
+import uuid
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.fund import Fund, FundMarketData, FundLatestQuote
+from app.utils.quotes import QUOTES_VERSION, data_version
+from app.utils.watermark import Watermark
+
+EXTENSION_KEY = 'market_leaderboard'
+_PENDING_KEY = 'market_leaderboard_changes'
+
+BOARDS = ('gainers', 'losers', 'active')
+
+# 全市场榜单的分组键
+ALL_TYPES = None
+
+
+def _format(value):
+    return str(value) if value else None
+
+
+def board_keys(rate):
+    """返回日涨跌幅在各榜单中的排序键（升序排列），无涨跌幅时为 None"""
+    if rate is None:
+        return None
+    return {'gainers': -rate, 'losers': rate, 'active': -abs(rate)}
+
+
+def market_item(fund_code, fund_name, fund_type, net_value, daily_change, daily_change_rate, update_time):
+    """榜单条目，格式与 /api/market/funds 返回一致"""
+    return {
+        'fund_code': fund_code,
+        'fund_name': fund_name,
+        'fund_type': fund_type,
+        'net_value': _format(net_value),
+        'daily_change': _format(daily_change),
+        'daily_change_rate': _format(daily_change_rate),
+        'update_time': update_time
+    }
+
+
+class _Group:
+    """一个基金类型的三个榜单，以及没有日涨跌幅的基金（按代码排序）"""
+
+    __slots__ = ('boards', 'unranked')
+
+    def __init__(self):
+        self.boards = {board: [] for board in BOARDS}
+        self.unranked = []
+
+    def __len__(self):
+        return len(self.boards['gainers']) + len(self.unranked)
+
+
+def _remove(entries, entry):
+    position = bisect_left(entries, entry)
+    if position < len(entries) and entries[position] == entry:
+        del entries[position]
+
+
+class MarketLeaderboard:
+    """按基金类型维护的涨跌排行榜，写操作加锁，翻页读取在锁内切片"""
+
+    def __init__(self, reload_seconds=300, refresh_seconds=5):
+        self.reload_seconds = reload_seconds
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._groups = {}  # fund_type（全市场为 None）-> _Group
+        self._items = {}  # fund_code -> (榜单条目, 日涨跌幅)
+        self._stale = set()
+        self.quote_watermark = Watermark()
+        self.fund_watermark = Watermark()
+        self.quote_version = None
+        self.loaded_at = None
+        self.checked_at = None
+        # 榜单内容的版本：实例标识区分不同进程（各自同步进度不同），版本号在内容变化时递增
+        self.instance_id = uuid.uuid4().hex
+        self.version = 0
+        self.modified_at = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def _insert(self, fund_code, item, rate):
+        keys = board_keys(rate)
+        for group_key in {ALL_TYPES, item['fund_type']}:
+            group = self._groups.get(group_key)
+            if group is None:
+                group = self._groups[group_key] = _Group()
+            if keys is None:
+                insort(group.unranked, fund_code)
+            else:
+                for board in BOARDS:
+                    insort(group.boards[board], (keys[board], fund_code))
+        self._items[fund_code] = (item, rate)
+
+    def _discard(self, fund_code):
+        current = self._items.pop(fund_code, None)
+        if current is None:
+            return
+        item, rate = current
+        keys = board_keys(rate)
+        for group_key in {ALL_TYPES, item['fund_type']}:
+            group = self._groups.get(group_key)
+            if group is None:
+                continue
+            if keys is None:
+                _remove(group.unranked, fund_code)
+            else:
+                for board in BOARDS:
+                    _remove(group.boards[board], (keys[board], fund_code))
+            if not len(group) and group_key is not ALL_TYPES:
+                del self._groups[group_key]
+
+    def load(self, rows, quote_watermark=None, fund_watermark=None, quote_version=None):
+        """全量构建，rows 为 (fund_code, fund_name, fund_type, net_value, daily_change, daily_change_rate, update_time)"""
+        groups = {ALL_TYPES: _Group()}
+        items = {}
+        for row in rows:
+            item = market_item(*row)
+            rate = row[5]
+            items[row[0]] = (item, rate)
+            keys = board_keys(rate)
+            for group_key in {ALL_TYPES, item['fund_type']}:
+                group = groups.get(group_key)
+                if group is None:
+                    group = groups[group_key] = _Group()
+                if keys is None:
+                    group.unranked.append(row[0])
+                else:
+                    for board in BOARDS:
+                        group.boards[board].append((keys[board], row[0]))
+        for group in groups.values():
+            group.unranked.sort()
+            for entries in group.boards.values():
+                entries.sort()
+        with self._lock:
+            self._groups = groups
+            self._items = items
+            self._stale = set()
+            # 水位线时间上的记录在下次检查时会再读到一次，重复刷新不影响结果
+            self.quote_watermark = Watermark(quote_watermark)
+            self.fund_watermark = Watermark(fund_watermark)
+            self.quote_version = quote_version
+            self.loaded_at = self.checked_at = time.monotonic()
+            self._touch()
+
+    def apply(self, fund_codes, rows):
+        """增量更新：fund_codes 为需要刷新的基金，rows 为其中仍有行情的基金的最新数据"""
+        with self._lock:
+            for fund_code in fund_codes:
+                self._discard(fund_code)
+            for row in rows:
+                self._insert(row[0], market_item(*row), row[5])
+            self._touch()
+
+    def _touch(self):
+        self.version += 1
+        self.modified_at = datetime.utcnow()
+
+    def etag_parts(self):
+        """榜单内容的版本 (实例标识, 版本号)"""
+        with self._lock:
+            return self.instance_id, self.version
+
+    def mark_stale(self, fund_codes):
+        with self._lock:
+            self._stale.update(fund_codes)
+
+    def take_stale(self):
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        return stale
+
+    def needs_reload(self):
+        return not self.loaded or time.monotonic() - self.loaded_at >= self.reload_seconds
+
+    def needs_check(self):
+        return self.checked_at is None or time.monotonic() - self.checked_at >= self.refresh_seconds
+
+    def page(self, board, fund_type=ALL_TYPES, page=1, per_page=20):
+        """返回 (本页条目, 总数)；page 从1开始"""
+        start = (page - 1) * per_page
+        stop = start + per_page
+        with self._lock:
+            group = self._groups.get(fund_type)
+            if group is None:
+                return [], 0
+            ranked = group.boards[board]
+            codes = [fund_code for _, fund_code in ranked[start:stop]]
+            if len(codes) < per_page:
+                codes.extend(group.unranked[max(start - len(ranked), 0):max(stop - len(ranked), 0)])
+            items = [self._items[fund_code][0] for fund_code in codes]
+            return items, len(group)
+
+
+def _query_rows(fund_codes=None):
+    query = db.session.query(
+        Fund.fund_code, Fund.fund_name, Fund.fund_type,
+        FundLatestQuote.net_value, FundLatestQuote.daily_change, FundLatestQuote.daily_change_rate,
+        FundLatestQuote.update_time
+    ).join(FundLatestQuote, Fund.fund_code == FundLatestQuote.fund_code)
+    if fund_codes is not None:
+        query = query.filter(Fund.fund_code.in_(list(fund_codes)))
+    return query.all()
+
+
+def _sync(board):
+    """
+    从数据库同步榜单：到期或行情版本变化时全量重建，否则只刷新待刷新的基金，
+    到达检查间隔时再加上水位线之后变更的基金
+    """
+    check = not board.needs_reload() and board.needs_check()
+    quote_version = None
+    if check:
+        board.checked_at = time.monotonic()
+        quote_version = db.session.query(data_version(QUOTES_VERSION)).scalar()
+    if board.needs_reload() or (check and quote_version != board.quote_version):
+        # 先读版本再读数据：读取期间的写入会在下次检查时再触发重建
+        if quote_version is None:
+            quote_version = db.session.query(data_version(QUOTES_VERSION)).scalar()
+        fund_watermark = db.session.query(db.func.max(Fund.updated_at)).scalar()
+        rows = _query_rows()
+        quote_times = [row[6] for row in rows if row[6] is not None]
+        board.load(rows, max(quote_times) if quote_times else None, fund_watermark, quote_version)
+        return
+
+    fund_codes = board.take_stale()
+    if check:
+        quotes = db.session.query(
+            FundLatestQuote.fund_code, FundLatestQuote.market_data_id, FundLatestQuote.update_time
+        ).filter(board.quote_watermark.condition(FundLatestQuote.update_time))
+        fund_codes.update(code for code, _ in board.quote_watermark.advance(
+            ((fund_code, market_data_id), update_time) for fund_code, market_data_id, update_time in quotes
+        ))
+        funds = db.session.query(Fund.fund_code, Fund.updated_at).filter(board.fund_watermark.condition(Fund.updated_at))
+        fund_codes.update(board.fund_watermark.advance(funds))
+    if fund_codes:
+        board.apply(fund_codes, _query_rows(fund_codes))
+
+
+def get_leaderboard():
+    """获取当前应用的排行榜，读取前与数据库做增量同步"""
+    board = current_app.extensions.get(EXTENSION_KEY)
+    if board is None:
+        board = current_app.extensions.setdefault(
+            EXTENSION_KEY, MarketLeaderboard(
+                current_app.config.get('LEADERBOARD_RELOAD_SECONDS', 300),
+                current_app.config.get('LEADERBOARD_REFRESH_SECONDS', 5)
+            )
+        )
+    _sync(board)
+    return board
+
+
+def notify_quotes_written(fund_codes):
+    """通知排行榜有行情写入（供批量导入等绕过ORM的写入路径在提交后调用）"""
+    if not has_app_context():
+        return
+    board = current_app.extensions.get(EXTENSION_KEY)
+    if board is not None:
+        board.mark_stale(fund_codes)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_quote_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Fund, FundMarketData)):
+            pending.add(obj.fund_code)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_quote_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        notify_quotes_written(pending)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_quote_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,357 @@
+"""
+基金最新行情快照文件
+
+每次行情写入提交后（批量导入、区间收益计算以及通过ORM写入 fund_market_data），发布方从
+fund_latest_quotes 读取全部最新行情，写成一个带版本号的只读二进制文件，再原子替换目录下的 CURRENT
+指针文件。各工作进程每隔 MARKET_SNAPSHOT_CHECK_SECONDS 读取一次指针，版本变化时把新文件映射到内存
+（mmap）并替换快照引用，基金详情等接口直接在映射上按代码二分查找，不访问数据库。所有进程读取的是
+同一个文件，操作系统页缓存中只有一份数据，同一版本下各进程返回的行情完全一致。
+
+文件格式（小端）：64 字节文件头（魔数、版本号、生成时间、最新行情时间、记录数、记录长度），其后为按
+fund_code 字节序排列的定长记录（基金代码、行情记录ID、8 个按列精度放大为整数的数值列、行情时间）。
+数值和时间以 INT64 最小值表示空值。
+
+每次发布都要全量读取 fund_latest_quotes 并 fsync 写盘，适合批量写入后调用：批量写入方（行情导入、区间收益
+计算）用 Core 写入并调用 schedule_market_snapshot，同一流程中的多次提交用 deferred_market_snapshot 合并为
+结束时的一次发布。通过ORM逐条写入 fund_market_data 的每次提交也会发布一次，只用于种子数据和人工修正等
+少量写入。发布失败只记录日志，不影响已经提交的数据，读方继续使用旧版本，下一次发布时追上。
+
+未配置 MARKET_SNAPSHOT_DIR 时不发布快照，读取回退到按主键查询 fund_latest_quotes。
+"""
+import fcntl
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.fund import FundMarketData, FundLatestQuote
+from app.utils.quotes import QUOTE_COLUMNS, get_latest_quote
+
+EXTENSION_KEY = 'market_snapshot'
+_PENDING_KEY = 'market_snapshot_pending'
+_DEFERRED_KEY = 'market_snapshot_deferred'
+
+MAGIC = b'FNDSNAP1'
+CURRENT_FILE = 'CURRENT'
+_LOCK_FILE = '.lock'
+_FILE_PATTERN = re.compile(r'^market-(\d+)\.snap$')
+
+# 魔数、版本号、生成时间、最新行情时间、记录数、记录长度，补齐到64字节
+_HEADER = struct.Struct('<8sQqqII24x')
+
+VALUE_COLUMNS = tuple(column for column in QUOTE_COLUMNS if column != 'update_time')
+_SCALES = tuple(FundLatestQuote.__table__.c[column].type.scale for column in VALUE_COLUMNS)
+
+_RECORD = np.dtype({
+    'names': ['fund_code', 'market_data_id', 'values', 'update_time'],
+    'formats': ['S16', 'S36', ('<i8', (len(VALUE_COLUMNS),)), '<i8'],
+    'offsets': [0, 16, 56, 120],
+    'itemsize': 128
+})
+
+NULL = np.iinfo(np.int64).min
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+# 与 FundLatestQuote 的字段同名，可直接用于序列化
+LatestQuote = namedtuple('LatestQuote', ('fund_code', 'market_data_id') + QUOTE_COLUMNS)
+
+
+def _encode_time(value):
+    return NULL if value is None else (value - _EPOCH) // _MICROSECOND
+
+
+def _decode_time(value):
+    return None if value == NULL else _EPOCH + int(value) * _MICROSECOND
+
+
+def _encode_value(value, scale):
+    return NULL if value is None else int(Decimal(value).scaleb(scale).to_integral_value())
+
+
+def _decode_value(value, scale):
+    return None if value == NULL else Decimal(int(value)).scaleb(-scale)
+
+
+def snapshot_path(directory, version):
+    return os.path.join(directory, f'market-{version:012d}.snap')
+
+
+def read_current_version(directory):
+    """读取 CURRENT 指针中的版本号，尚未发布过快照时返回 None"""
+    try:
+        with open(os.path.join(directory, CURRENT_FILE)) as f:
+            text = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return int(text) if text.isdigit() else None
+
+
+def encode_snapshot(version, rows, created_at=None):
+    """
+    把最新行情编码为快照文件内容
+
+    rows 为 (fund_code, market_data_id, 数值列..., update_time)，按 VALUE_COLUMNS 的顺序。
+    """
+    rows = sorted(rows, key=lambda row: row[0].encode('ascii'))
+    records = np.zeros(len(rows), dtype=_RECORD)
+    if rows:
+        records['fund_code'] = [row[0].encode('ascii') for row in rows]
+        records['market_data_id'] = [(row[1] or '').encode('ascii') for row in rows]
+        records['values'] = [
+            [_encode_value(value, scale) for value, scale in zip(row[2:-1], _SCALES)] for row in rows
+        ]
+        records['update_time'] = [_encode_time(row[-1]) for row in rows]
+    times = [row[-1] for row in rows if row[-1] is not None]
+    header = _HEADER.pack(
+        MAGIC, version, _encode_time(created_at or datetime.utcnow()),
+        _encode_time(max(times) if times else None), len(rows), _RECORD.itemsize
+    )
+    return header + records.tobytes()
+
+
+class MarketSnapshot:
+    """映射到内存的一个快照版本，只读；记录数组直接引用映射区，不复制"""
+
+    __slots__ = ('version', 'created_at', 'quote_time', '_records', '_codes', '_mapping')
+
+    def __init__(self, version, created_at, quote_time, records, mapping=None):
+        self.version = version
+        self.created_at = created_at
+        self.quote_time = quote_time
+        self._records = records
+        self._codes = records['fund_code']
+        self._mapping = mapping
+
+    @classmethod
+    def from_buffer(cls, buffer, mapping=None):
+        if len(buffer) < _HEADER.size:
+            raise ValueError('快照文件不完整')
+        magic, version, created_at, quote_time, count, record_size = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or record_size != _RECORD.itemsize:
+            raise ValueError('不支持的快照文件格式')
+        if len(buffer) < _HEADER.size + count * record_size:
+            raise ValueError('快照文件不完整')
+        records = np.frombuffer(buffer, dtype=_RECORD, count=count, offset=_HEADER.size)
+        return cls(version, _decode_time(created_at), _decode_time(quote_time), records, mapping)
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls.from_buffer(mapping, mapping)
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, fund_code):
+        """按基金代码二分查找，返回 LatestQuote，没有行情时返回 None"""
+        try:
+            key = fund_code.encode('ascii')
+        except UnicodeEncodeError:
+            return None
+        if len(key) > _RECORD['fund_code'].itemsize:
+            return None
+        i = int(np.searchsorted(self._codes, key))
+        if i >= len(self._codes) or self._codes[i] != key:
+            return None
+        record = self._records[i]
+        return LatestQuote(
+            fund_code,
+            record['market_data_id'].decode('ascii') or None,
+            *(_decode_value(value, scale) for value, scale in zip(record['values'].tolist(), _SCALES)),
+            _decode_time(int(record['update_time']))
+        )
+
+
+class MarketSnapshotStore:
+    """持有本进程当前映射的快照；读操作无锁，检查和替换串行"""
+
+    def __init__(self, directory, check_seconds=1.0):
+        self.directory = directory
+        self.check_seconds = check_seconds
+        self._snapshot = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def swap(self, snapshot):
+        # 旧快照的映射在最后一个引用释放后回收，正在读取的请求不受影响
+        self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+
+    def load(self, version):
+        """映射指定版本的快照文件，文件已被清理时保持当前快照"""
+        with self._lock:
+            try:
+                self.swap(MarketSnapshot.open(snapshot_path(self.directory, version)))
+            except FileNotFoundError:
+                pass
+            return self._snapshot
+
+    def snapshot(self):
+        """返回当前快照；到达检查间隔时读取 CURRENT 指针，版本变化后映射新文件。尚未发布时返回 None"""
+        snapshot = self._snapshot
+        if self._checked_at is not None and time.monotonic() - self._checked_at < self.check_seconds:
+            return snapshot
+        with self._lock:
+            version = read_current_version(self.directory)
+            if version is not None and (self._snapshot is None or self._snapshot.version != version):
+                try:
+                    self._snapshot = MarketSnapshot.open(snapshot_path(self.directory, version))
+                except FileNotFoundError:
+                    pass
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+
+def get_snapshot_store():
+    """获取当前应用的快照存储，未配置 MARKET_SNAPSHOT_DIR 时返回 None"""
+    store = current_app.extensions.get(EXTENSION_KEY)
+    if store is None:
+        directory = current_app.config.get('MARKET_SNAPSHOT_DIR')
+        if not directory:
+            return None
+        store = current_app.extensions.setdefault(
+            EXTENSION_KEY, MarketSnapshotStore(directory, current_app.config.get('MARKET_SNAPSHOT_CHECK_SECONDS', 1.0))
+        )
+    return store
+
+
+def get_market_snapshot():
+    store = get_snapshot_store()
+    return store.snapshot() if store is not None else None
+
+
+def get_market_quote(fund_code):
+    """读取一只基金的最新行情：有快照时从快照读取，否则按主键查询数据库"""
+    snapshot = get_market_snapshot()
+    if snapshot is None:
+        return get_latest_quote(fund_code)
+    return snapshot.get(fund_code)
+
+
+def get_market_quotes(fund_codes):
+    """批量读取最新行情，返回 {fund_code: 行情}"""
+    snapshot = get_market_snapshot()
+    if snapshot is None:
+        return {
+            quote.fund_code: quote
+            for quote in FundLatestQuote.query.filter(FundLatestQuote.fund_code.in_(list(fund_codes))).all()
+        }
+    quotes = {code: snapshot.get(code) for code in fund_codes}
+    return {code: quote for code, quote in quotes.items() if quote is not None}
+
+
+def _remove_old_snapshots(directory, keep):
+    versions = sorted(
+        int(match.group(1)) for match in map(_FILE_PATTERN.match, os.listdir(directory)) if match
+    )
+    for version in versions[:-keep]:
+        try:
+            os.remove(snapshot_path(directory, version))
+        except FileNotFoundError:
+            pass
+
+
+def _write_atomic(path, content):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(content)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+
+
+def publish_market_snapshot():
+    """
+    从数据库读取全部最新行情，发布为新版本快照并切换本进程，返回版本号；未配置目录时返回 None
+
+    发布过程持有目录下的文件锁：各进程的发布串行执行，且都在加锁后读取数据库，版本号越大的快照
+    数据越新。快照文件写完后再替换 CURRENT，读方不会看到写了一半的文件；只保留最近
+    MARKET_SNAPSHOT_KEEP 个版本，已被其他进程映射的旧文件删除后映射仍然有效。
+    """
+    store = get_snapshot_store()
+    if store is None:
+        return None
+    directory = store.directory
+    os.makedirs(directory, exist_ok=True)
+    table = FundLatestQuote.__table__
+    columns = [table.c.fund_code, table.c.market_data_id] + [table.c[column] for column in QUOTE_COLUMNS]
+
+    with open(os.path.join(directory, _LOCK_FILE), 'a') as lock:
+        fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        try:
+            version = (read_current_version(directory) or 0) + 1
+            # 使用独立连接读取，发布可以在会话提交后的事件中执行
+            with db.engine.connect() as connection:
+                rows = connection.execute(db.select(*columns)).all()
+            _write_atomic(snapshot_path(directory, version), encode_snapshot(version, rows))
+            _write_atomic(os.path.join(directory, CURRENT_FILE), f'{version}\n'.encode('ascii'))
+            _remove_old_snapshots(directory, current_app.config.get('MARKET_SNAPSHOT_KEEP', 3))
+        finally:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+    store.load(version)
+    return version
+
+
+def schedule_market_snapshot(session=None):
+    """标记当前事务写入了行情，提交后发布新快照（供绕过ORM的批量写入在提交前调用）"""
+    (session or db.session).info[_PENDING_KEY] = True
+
+
+def _publish_logged():
+    try:
+        publish_market_snapshot()
+    except Exception:
+        current_app.logger.exception('发布行情快照失败')
+
+
+@contextmanager
+def deferred_market_snapshot(session=None):
+    """上下文内多次提交写入的行情只在退出时发布一次快照"""
+    session = session or db.session
+    if _DEFERRED_KEY in session.info:
+        yield
+        return
+    session.info[_DEFERRED_KEY] = False
+    try:
+        yield
+    finally:
+        if session.info.pop(_DEFERRED_KEY, False) and has_app_context():
+            _publish_logged()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_quote_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, FundMarketData):
+            session.info[_PENDING_KEY] = True
+            return
+
+
+@event.listens_for(Session, 'after_commit')
+def _publish_quote_changes(session):
+    if not session.info.pop(_PENDING_KEY, None) or not has_app_context():
+        return
+    if _DEFERRED_KEY in session.info:
+        session.info[_DEFERRED_KEY] = True
+        return
+    # 数据已经提交，发布失败不能向调用方抛出
+    _publish_logged()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_quote_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,201 @@
+"""
+基金净值列式存储
+
+每只基金的历史净值在进程内保存为按日期排序的连续 NumPy 数组（日期、单位净值、累计净值、
+日涨跌额、日涨跌幅），区间查询通过 searchsorted 定位后直接返回数组视图，不复制数据，
+也不为每一行构造 ORM 对象。
+
+数组在首次访问时从 fund_nav_history 加载；之后每隔 NAV_STORE_REFRESH_SECONDS 检查一次
+数据库中是否有更新的净值日，只追加新增的行。本进程内提交的净值写入会立即触发刷新，
+修改或删除已有净值时整只基金重新加载。缓存按 LRU 最多保留 NAV_STORE_CACHE_SIZE 只基金。
+"""
+import threading
+import time
+
+import numpy as np
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.fund import FundNavHistory
+from app.utils.cache import LRUCache
+
+EXTENSION_KEY = 'nav_store'
+_PENDING_KEY = 'nav_store_changes'
+
+
+def _to_float_array(values):
+    return np.array([float(value) if value is not None else np.nan for value in values], dtype=np.float64)
+
+
+class NavSeries:
+    """一只基金的净值序列，各列等长且按日期升序，实例创建后不再修改"""
+
+    __slots__ = ('dates', 'net_values', 'accumulated_values', 'daily_changes', 'daily_change_rates')
+
+    def __init__(self, dates, net_values, accumulated_values, daily_changes, daily_change_rates):
+        self.dates = dates
+        self.net_values = net_values
+        self.accumulated_values = accumulated_values
+        self.daily_changes = daily_changes
+        self.daily_change_rates = daily_change_rates
+
+    @classmethod
+    def empty(cls):
+        return cls(np.array([], dtype='datetime64[D]'), *(np.array([], dtype=np.float64) for _ in range(4)))
+
+    @classmethod
+    def from_rows(cls, rows):
+        if not rows:
+            return cls.empty()
+        dates, net_values, accumulated_values, daily_changes, daily_change_rates = zip(*rows)
+        return cls(
+            np.array(dates, dtype='datetime64[D]'),
+            _to_float_array(net_values),
+            _to_float_array(accumulated_values),
+            _to_float_array(daily_changes),
+            _to_float_array(daily_change_rates)
+        )
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def last_date(self):
+        return self.dates[-1].astype(object) if len(self.dates) else None
+
+    def append(self, other):
+        if not len(other):
+            return self
+        return NavSeries(*(np.concatenate((getattr(self, name), getattr(other, name))) for name in self.__slots__))
+
+    def slice(self, start=None, end=None):
+        """返回 [start, end] 日期区间内的视图（闭区间），不复制数组"""
+        lo = 0 if start is None else int(np.searchsorted(self.dates, np.datetime64(start, 'D'), side='left'))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, np.datetime64(end, 'D'), side='right'))
+        return NavSeries(*(getattr(self, name)[lo:hi] for name in self.__slots__))
+
+
+class NavStore:
+    """按基金缓存 NavSeries（LRU，数量有上限），增量追加新净值"""
+
+    def __init__(self, refresh_seconds=60, maxsize=4096):
+        self.refresh_seconds = refresh_seconds
+        self._cache = LRUCache(maxsize)  # fund_code -> (NavSeries, 检查时间，None 表示需要检查)
+        self._lock = threading.Lock()
+
+    def get(self, fund_code):
+        entry = self._cache.get(fund_code)
+        if entry is not None and entry[1] is not None and time.monotonic() - entry[1] < self.refresh_seconds:
+            return entry[0]
+
+        # 数据库查询不持锁，写回时只在缓存条目未被其他线程替换或失效时生效
+        series = entry[0] if entry is not None else None
+        rows = self._query(fund_code, series.last_date if series is not None else None)
+        series = NavSeries.from_rows(rows) if series is None else series.append(NavSeries.from_rows(rows))
+        with self._lock:
+            if self._cache.get(fund_code) is entry:
+                self._cache.set(fund_code, (series, time.monotonic()))
+        return series
+
+    def mark_stale(self, fund_code):
+        """下次访问时检查并追加新净值"""
+        with self._lock:
+            entry = self._cache.get(fund_code)
+            if entry is not None:
+                self._cache.set(fund_code, (entry[0], None))
+
+    def invalidate(self, fund_code):
+        """丢弃整只基金的缓存，下次访问时全量加载"""
+        with self._lock:
+            self._cache.pop(fund_code)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def cached_last_date(self, fund_code):
+        entry = self._cache.get(fund_code)
+        return entry[0].last_date if entry is not None else None
+
+    @staticmethod
+    def _query(fund_code, after=None):
+        query = db.select(
+            FundNavHistory.nav_date,
+            FundNavHistory.net_value,
+            FundNavHistory.accumulated_value,
+            FundNavHistory.daily_change,
+            FundNavHistory.daily_change_rate
+        ).where(FundNavHistory.fund_code == fund_code)
+        if after is not None:
+            query = query.where(FundNavHistory.nav_date > after)
+        return db.session.execute(query.order_by(FundNavHistory.nav_date)).all()
+
+
+def get_nav_store():
+    store = current_app.extensions.get(EXTENSION_KEY)
+    if store is None:
+        store = current_app.extensions.setdefault(
+            EXTENSION_KEY, NavStore(
+                current_app.config.get('NAV_STORE_REFRESH_SECONDS', 60),
+                current_app.config.get('NAV_STORE_CACHE_SIZE', 4096)
+            )
+        )
+    return store
+
+
+def get_nav_series(fund_code):
+    return get_nav_store().get(fund_code)
+
+
+def notify_nav_written(fund_codes, earliest_dates=None):
+    """
+    通知列式存储有新净值写入（供批量导入等绕过ORM的写入路径调用）
+
+    earliest_dates 为 {fund_code: 本次写入的最早日期}，早于缓存末尾的写入会触发全量重载。
+    """
+    if not has_app_context():
+        return
+    store = current_app.extensions.get(EXTENSION_KEY)
+    if store is None:
+        return
+    earliest_dates = earliest_dates or {}
+    for fund_code in fund_codes:
+        earliest = earliest_dates.get(fund_code)
+        last_date = store.cached_last_date(fund_code)
+        if earliest is not None and last_date is not None and earliest <= last_date:
+            store.invalidate(fund_code)
+        else:
+            store.mark_stale(fund_code)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_nav_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, {'appended': {}, 'rewritten': set()})
+    for obj in session.new:
+        if isinstance(obj, FundNavHistory):
+            earliest = pending['appended'].get(obj.fund_code)
+            if earliest is None or obj.nav_date < earliest:
+                pending['appended'][obj.fund_code] = obj.nav_date
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, FundNavHistory):
+            pending['rewritten'].add(obj.fund_code)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_nav_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    store = current_app.extensions.get(EXTENSION_KEY)
+    if store is None:
+        return
+    for fund_code in pending['rewritten']:
+        store.invalidate(fund_code)
+    notify_nav_written(pending['appended'].keys(), pending['appended'])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_nav_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,261 @@
+"""
+市场资讯
+
+资讯由资讯源写入（本地文件用 load_news.py 导入，或调用 POST /api/market/news），入库时打上基金和板块标签：
+记录中显式给出的代码、标题和摘要中出现的6位基金代码（需为已有基金）以及提到的板块名称。标签写入
+news_tags 倒排索引，按 (标签类型, 标签代码) 前缀即可取出一个基金或板块的全部资讯序号，
+"与我的持仓和自选相关的资讯" 只读取这些基金及其所属板块的倒排列表，不扫描资讯表。
+
+每个用户的已读状态是一行：序号小于 read_before_seq 的资讯全部已读，其后用位图逐条记录；
+位图低位连续已读时自动前移起点，全部标记已读时清空位图，存储量与未读区间长度成正比。已读状态只
+逐条记录最新的 NEWS_READ_WINDOW 条资讯，起点落在窗口之前时前移到窗口起点，位图最多 NEWS_READ_WINDOW 位。
+"""
+import re
+from datetime import datetime
+
+from flask import current_app
+
+from app import db
+from app.models.fund import Fund, FavoriteFundRelation
+from app.models.market import Sector, FundSector
+from app.models.news import News, NewsTag, UserNewsRead
+from app.models.transaction import Holding
+
+TAG_FUND = 'fund'
+TAG_SECTOR = 'sector'
+
+_FUND_CODE_RE = re.compile(r'(?<!\d)\d{6}(?!\d)')
+
+
+class InvalidNewsFeed(ValueError):
+    """资讯数据格式错误"""
+
+
+class ReadBitmap:
+    """用户已读位图：base 之前全部已读，bits 的第 i 位表示序号 base + i 已读"""
+
+    __slots__ = ('base', 'bits')
+
+    def __init__(self, base=0, bits=0):
+        self.base = base
+        self.bits = bits
+
+    @classmethod
+    def from_row(cls, row):
+        if row is None:
+            return cls()
+        return cls(row.read_before_seq or 0, int.from_bytes(row.read_bitmap or b'', 'little'))
+
+    def is_read(self, seq):
+        return seq < self.base or bool((self.bits >> (seq - self.base)) & 1)
+
+    def mark(self, seq):
+        if seq >= self.base:
+            self.bits |= 1 << (seq - self.base)
+            self._compact()
+
+    def mark_all(self, before_seq):
+        """before_seq 之前的资讯全部标记已读"""
+        if before_seq > self.base:
+            self.bits >>= before_seq - self.base
+            self.base = before_seq
+            self._compact()
+
+    def _compact(self):
+        # 低位连续的已读位并入 base
+        ones = (~self.bits & (self.bits + 1)).bit_length() - 1
+        if ones > 0:
+            self.bits >>= ones
+            self.base += ones
+
+    def to_bytes(self):
+        return self.bits.to_bytes((self.bits.bit_length() + 7) // 8, 'little')
+
+
+def _parse_time(value, news_id):
+    if value is None or value == '':
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).replace(tzinfo=None)
+    except ValueError:
+        raise InvalidNewsFeed(f'资讯 {news_id} 的 publish_time 格式错误: {value}')
+
+
+def _codes(value, news_id, key):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, (list, tuple)):
+        raise InvalidNewsFeed(f'资讯 {news_id} 的 {key} 应为数组')
+    return [str(code).strip() for code in value if str(code).strip()]
+
+
+def parse_news_record(record):
+    """校验并规范化一条资讯，必填 news_id 和 title"""
+    if not isinstance(record, dict):
+        raise InvalidNewsFeed('资讯必须为对象')
+    news_id = str(record.get('news_id') or '').strip()
+    title = str(record.get('title') or '').strip()
+    if not news_id or not title:
+        raise InvalidNewsFeed('资讯缺少 news_id 或 title')
+    return {
+        'news_id': news_id,
+        'title': title[:200],
+        'summary': record.get('summary'),
+        'source': record.get('source'),
+        'category': record.get('category'),
+        'content_url': record.get('content_url'),
+        'thumbnail_url': record.get('thumbnail_url'),
+        'publish_time': _parse_time(record.get('publish_time'), news_id),
+        'fund_codes': _codes(record.get('fund_codes'), news_id, 'fund_codes'),
+        'sector_codes': _codes(record.get('sector_codes'), news_id, 'sector_codes')
+    }
+
+
+def _sector_keywords():
+    """板块名称关键词：完整名称，以及去掉“板块”后缀的名称"""
+    keywords = []
+    for sector_code, sector_name in db.session.query(Sector.sector_code, Sector.sector_name):
+        names = {sector_name}
+        if sector_name.endswith('板块') and len(sector_name) > 3:
+            names.add(sector_name[:-2])
+        keywords.extend((name, sector_code) for name in names)
+    return keywords
+
+
+def ingest_news(records):
+    """
+    写入资讯并建立倒排索引，返回新增资讯数量
+
+    news_id 已存在的资讯跳过。同一批资讯按发布时间排序后入库，使序号与发布顺序一致。
+    """
+    parsed = {}
+    for record in map(parse_news_record, records):
+        parsed[record['news_id']] = record
+    existing = {news_id for news_id, in db.session.query(News.news_id).filter(News.news_id.in_(list(parsed)))}
+    fresh = [record for news_id, record in parsed.items() if news_id not in existing]
+    if not fresh:
+        return 0
+    fresh.sort(key=lambda record: (record['publish_time'] is None, record['publish_time'] or datetime.min))
+
+    # 文本中的候选基金代码一次查询校验
+    mentioned = {
+        record['news_id']: set(_FUND_CODE_RE.findall(f"{record['title']} {record['summary'] or ''}")) for record in fresh
+    }
+    candidates = set().union(*mentioned.values()) | {code for record in fresh for code in record['fund_codes']}
+    known_funds = {
+        code for code, in db.session.query(Fund.fund_code).filter(Fund.fund_code.in_(list(candidates)))
+    } if candidates else set()
+    keywords = _sector_keywords()
+    known_sectors = {sector_code for _, sector_code in keywords}
+
+    tags = []
+    for record in fresh:
+        news = News(**{key: value for key, value in record.items() if key not in ('fund_codes', 'sector_codes')})
+        db.session.add(news)
+        db.session.flush()
+
+        text = f"{record['title']} {record['summary'] or ''}"
+        fund_codes = (set(record['fund_codes']) | mentioned[record['news_id']]) & known_funds
+        sector_codes = (set(record['sector_codes']) & known_sectors) | {code for name, code in keywords if name in text}
+        tags.extend({'tag_type': TAG_FUND, 'tag_code': code, 'news_seq': news.seq} for code in fund_codes)
+        tags.extend({'tag_type': TAG_SECTOR, 'tag_code': code, 'news_seq': news.seq} for code in sector_codes)
+
+    if tags:
+        db.session.execute(NewsTag.__table__.insert(), tags)
+    db.session.commit()
+    return len(fresh)
+
+
+def get_news_tags(seqs):
+    """按资讯序号取标签，返回 {seq: {'fund': [...], 'sector': [...]}}"""
+    result = {seq: {TAG_FUND: [], TAG_SECTOR: []} for seq in seqs}
+    if not seqs:
+        return result
+    for tag_type, tag_code, news_seq in db.session.query(NewsTag.tag_type, NewsTag.tag_code, NewsTag.news_seq).filter(
+        NewsTag.news_seq.in_(list(seqs))
+    ).order_by(NewsTag.tag_type, NewsTag.tag_code):
+        result[news_seq][tag_type].append(tag_code)
+    return result
+
+
+def _window_start():
+    """已读窗口起点：最新 NEWS_READ_WINDOW 条资讯中最小的序号，更早的资讯视为已读"""
+    latest = db.session.query(db.func.max(News.seq)).scalar() or 0
+    return max(latest + 1 - current_app.config.get('NEWS_READ_WINDOW', 10000), 0)
+
+
+def get_read_state(user_id):
+    if user_id is None:
+        return None
+    bitmap = ReadBitmap.from_row(db.session.get(UserNewsRead, user_id))
+    bitmap.mark_all(_window_start())
+    return bitmap
+
+
+def _update_read_state(user_id, update):
+    row = db.session.query(UserNewsRead).filter_by(user_id=user_id).with_for_update().first()
+    if row is None:
+        row = UserNewsRead(user_id=user_id, read_before_seq=0, read_bitmap=b'')
+        db.session.add(row)
+    bitmap = ReadBitmap.from_row(row)
+    # 新建或长期未更新的行从窗口起点开始记录，位图不随资讯总量增长
+    bitmap.mark_all(_window_start())
+    update(bitmap)
+    row.read_before_seq = bitmap.base
+    row.read_bitmap = bitmap.to_bytes()
+    db.session.commit()
+    return bitmap
+
+
+def mark_news_read(user_id, seq):
+    return _update_read_state(user_id, lambda bitmap: bitmap.mark(seq))
+
+
+def mark_all_news_read(user_id):
+    latest = db.session.query(db.func.max(News.seq)).scalar() or 0
+    return _update_read_state(user_id, lambda bitmap: bitmap.mark_all(latest + 1))
+
+
+def related_tag_codes(user_id):
+    """用户持仓和自选的基金代码，以及这些基金所属的板块代码"""
+    holdings = db.session.query(Holding.fund_code).filter(Holding.user_id == user_id, Holding.shares > 0)
+    favorites = db.session.query(FavoriteFundRelation.fund_code).filter(
+        FavoriteFundRelation.user_id == user_id, FavoriteFundRelation.is_deleted.is_(False)
+    )
+    fund_codes = {code for code, in holdings.union(favorites)}
+    sector_codes = set()
+    if fund_codes:
+        sector_codes = {code for code, in db.session.query(FundSector.sector_code).filter(
+            FundSector.fund_code.in_(list(fund_codes))
+        ).distinct()}
+    return fund_codes, sector_codes
+
+
+def related_news_seqs(fund_codes, sector_codes):
+    """合并基金和板块倒排列表的查询，按资讯序号从新到旧"""
+    conditions = []
+    if fund_codes:
+        conditions.append((NewsTag.tag_type == TAG_FUND) & NewsTag.tag_code.in_(list(fund_codes)))
+    if sector_codes:
+        conditions.append((NewsTag.tag_type == TAG_SECTOR) & NewsTag.tag_code.in_(list(sector_codes)))
+    if not conditions:
+        return None
+    return db.session.query(NewsTag.news_seq).filter(db.or_(*conditions)).distinct().order_by(NewsTag.news_seq.desc())
+
+
+def serialize_news(news, tags, read_state):
+    return {
+        'news_id': news.news_id,
+        'title': news.title,
+        'summary': news.summary,
+        'source': news.source,
+        'publish_time': news.publish_time,
+        'content_url': news.content_url,
+        'thumbnail_url': news.thumbnail_url,
+        'category': news.category,
+        'related_funds': tags[TAG_FUND],
+        'related_sectors': tags[TAG_SECTOR],
+        'is_read': read_state.is_read(news.seq) if read_state is not None else False
+    }
@@ -0,0 +1,94 @@
+"""
+游标分页（keyset pagination）
+
+按 (排序键..., 唯一键) 做范围定位代替 OFFSET，每一页的代价与翻到第几页无关。
+游标是对上一页边界值的不透明编码，附带签名以防止在不同排序方式之间混用。
+"""
+import base64
+import json
+
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    """游标无法解析或与当前排序方式不匹配"""
+
+
+def encode_cursor(values, direction, signature):
+    payload = json.dumps({'v': list(values), 'd': direction, 's': signature}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, signature):
+    """解析游标，返回 (边界值, 方向)"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        values, direction, cursor_signature = payload['v'], payload['d'], payload['s']
+    except (ValueError, KeyError, TypeError):
+        raise InvalidCursor('无效的分页游标')
+    if cursor_signature != signature or direction not in ('next', 'prev') or not isinstance(values, list):
+        raise InvalidCursor('分页游标与当前查询条件不匹配')
+    return values, direction
+
+
+class CursorPage:
+    def __init__(self, items, next_cursor, prev_cursor, per_page):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.per_page = per_page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_paginate(query, columns, key_func, per_page, cursor=None, descending=False, signature=''):
+    """
+    对查询做游标分页
+
+    columns 为排序列，最后一列必须唯一；key_func(item) 返回与 columns 对应的边界值。
+    查询本身不能带 order_by，由本函数按 columns 统一排序。
+    """
+    values = None
+    direction = 'next'
+    if cursor:
+        values, direction = decode_cursor(cursor, signature)
+        if len(values) != len(columns):
+            raise InvalidCursor('分页游标与当前查询条件不匹配')
+
+    backward = direction == 'prev'
+    reverse = descending != backward
+    key = tuple_(*columns) if len(columns) > 1 else columns[0]
+
+    if values is not None:
+        bound = tuple(values) if len(columns) > 1 else values[0]
+        query = query.filter(key < bound if reverse else key > bound)
+
+    query = query.order_by(*[column.desc() if reverse else column.asc() for column in columns])
+    rows = query.limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backward:
+        rows.reverse()
+
+    # 沿翻页方向看是否还有更多；反方向只要是从游标翻过来的就一定有数据
+    if backward:
+        has_next, has_prev = values is not None, has_more
+    else:
+        has_next, has_prev = has_more, values is not None
+
+    next_cursor = None
+    prev_cursor = None
+    if rows:
+        if has_next:
+            next_cursor = encode_cursor(key_func(rows[-1]), 'next', signature)
+        if has_prev:
+            prev_cursor = encode_cursor(key_func(rows[0]), 'prev', signature)
+
+    return CursorPage(rows, next_cursor, prev_cursor, per_page)
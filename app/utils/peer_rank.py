@@ -0,0 +1,160 @@
+"""
+同类排名
+
+按 Fund.fund_type 分组，对最新行情中的每个区间收益计算同类排名和超越同类百分比，整体写入
+fund_peer_ranks（每只基金一行）。每个区间只做一次 (分组, -收益) 的 lexsort，组内名次由排序位置
+减去组起点得到，并列收益取相同的最小名次。没有该区间收益的基金该区间为空，没有基金类型的基金不参与排名。
+"""
+from datetime import datetime
+
+import numpy as np
+
+from app import db
+from app.models.fund import Fund, FundLatestQuote, FundPeerRank
+from app.utils.quotes import bump_data_version
+
+PEER_RANKS_VERSION = 'peer_ranks'
+
+# (区间, FundLatestQuote 字段)
+PEER_RANK_PERIODS = (
+    ('daily', 'daily_change_rate'),
+    ('weekly', 'weekly_change_rate'),
+    ('monthly', 'monthly_change_rate'),
+    ('quarterly', 'quarterly_change_rate'),
+    ('yearly', 'yearly_change_rate'),
+    ('three_year', 'three_year_change_rate'),
+)
+
+PERIOD_BY_COLUMN = {column: period for period, column in PEER_RANK_PERIODS}
+
+
+def compute_group_ranks(groups, values):
+    """
+    计算组内降序名次
+
+    groups 为整数分组编号，values 为收益（NaN 表示不参与）。返回 (名次, 组内有效数量, 超越百分比)，
+    不参与排名的位置名次为 0。
+    """
+    groups = np.asarray(groups, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    size = len(values)
+    ranks = np.zeros(size, dtype=np.int64)
+    counts = np.zeros(size, dtype=np.int64)
+    percentiles = np.full(size, np.nan)
+
+    valid = np.flatnonzero(~np.isnan(values))
+    if not len(valid):
+        return ranks, counts, percentiles
+
+    order = valid[np.lexsort((-values[valid], groups[valid]))]
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    positions = np.arange(len(order))
+
+    group_start = np.r_[True, sorted_groups[1:] != sorted_groups[:-1]]
+    tie_start = group_start | np.r_[True, sorted_values[1:] != sorted_values[:-1]]
+    first_of_group = np.maximum.accumulate(np.where(group_start, positions, 0))
+    first_of_tie = np.maximum.accumulate(np.where(tie_start, positions, 0))
+
+    group_sizes = np.bincount(sorted_groups, minlength=groups.max() + 1)
+    ranks[order] = first_of_tie - first_of_group + 1
+    counts[order] = group_sizes[sorted_groups]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percentiles[order] = np.where(
+            counts[order] > 1, (counts[order] - ranks[order]) / (counts[order] - 1) * 100, 100.0
+        )
+    return ranks, counts, percentiles
+
+
+def calculate_peer_ranks():
+    """根据最新行情计算全部基金各区间的同类排名，返回待写入的行"""
+    columns = [getattr(FundLatestQuote, column) for _, column in PEER_RANK_PERIODS]
+    rows = db.session.query(Fund.fund_code, Fund.fund_type, *columns).join(
+        FundLatestQuote, FundLatestQuote.fund_code == Fund.fund_code
+    ).filter(Fund.fund_type.isnot(None)).all()
+    if not rows:
+        return []
+
+    fund_types, groups = np.unique(np.array([row[1] for row in rows], dtype=object), return_inverse=True)
+    now = datetime.utcnow()
+    result = [
+        {'fund_code': row[0], 'fund_type': row[1], 'computed_at': now}
+        for row in rows
+    ]
+
+    for index, (period, _) in enumerate(PEER_RANK_PERIODS):
+        values = np.fromiter(
+            (float(row[2 + index]) if row[2 + index] is not None else np.nan for row in rows),
+            dtype=np.float64, count=len(rows)
+        )
+        ranks, counts, percentiles = compute_group_ranks(groups, values)
+        ranked = ranks > 0
+        rank_list = ranks.tolist()
+        count_list = counts.tolist()
+        percentile_list = np.round(percentiles, 2).tolist()
+        for i, is_ranked in enumerate(ranked.tolist()):
+            item = result[i]
+            if is_ranked:
+                item[f'{period}_rank'] = rank_list[i]
+                item[f'{period}_peer_count'] = count_list[i]
+                item[f'{period}_percentile'] = percentile_list[i]
+            else:
+                item[f'{period}_rank'] = item[f'{period}_peer_count'] = item[f'{period}_percentile'] = None
+    return result
+
+
+def store_peer_ranks(rows):
+    """全量替换 fund_peer_ranks（单个事务内先删后插）"""
+    table = FundPeerRank.__table__
+    connection = db.session.connection()
+    connection.execute(table.delete())
+    if rows:
+        connection.execute(table.insert(), rows)
+    bump_data_version(connection, PEER_RANKS_VERSION)
+    db.session.commit()
+    return len(rows)
+
+
+def refresh_peer_ranks():
+    return store_peer_ranks(calculate_peer_ranks())
+
+
+def rank_label(peer_rank, period='yearly'):
+    rank = getattr(peer_rank, f'{period}_rank', None) if peer_rank is not None else None
+    if rank is None:
+        return '暂无排名'
+    return f'同类第{rank}名/{getattr(peer_rank, f"{period}_peer_count")}只'
+
+
+def period_percentile(peer_rank, period='yearly'):
+    value = getattr(peer_rank, f'{period}_percentile', None) if peer_rank is not None else None
+    return float(value) if value is not None else None
+
+
+def serialize_peer_ranks(peer_rank):
+    """各区间同类排名 {区间: {rank, peer_count, percentile, label}}，没有排名的区间不返回"""
+    if peer_rank is None:
+        return {}
+    return {
+        period: {
+            'rank': getattr(peer_rank, f'{period}_rank'),
+            'peer_count': getattr(peer_rank, f'{period}_peer_count'),
+            'percentile': period_percentile(peer_rank, period),
+            'label': rank_label(peer_rank, period)
+        }
+        for period, _ in PEER_RANK_PERIODS
+        if getattr(peer_rank, f'{period}_rank') is not None
+    }
+
+
+def get_peer_rank(fund_code):
+    """按主键读取一只基金的同类排名"""
+    return db.session.get(FundPeerRank, fund_code)
+
+
+def get_peer_ranks(fund_codes):
+    """多只基金的同类排名 {fund_code: FundPeerRank}，一次按主键查询"""
+    if not fund_codes:
+        return {}
+    rows = FundPeerRank.query.filter(FundPeerRank.fund_code.in_(list(fund_codes))).all()
+    return {row.fund_code: row for row in rows}
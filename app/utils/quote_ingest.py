@@ -0,0 +1,291 @@
+"""
+每日行情批量导入
+
+行情源每天提供全市场基金的行情文件（CSV 或每行一个 JSON 对象的 JSON Lines），由 load_quotes.py 或
+POST /api/market/quotes 导入。文件按行流式读取，每 QUOTE_INGEST_BATCH_SIZE 行校验一批后批量写入：
+
+- fund_market_data：按 (fund_code, update_time) 先删后插，重复导入同一文件结果不变；
+- fund_latest_quotes：INSERT ... ON CONFLICT 批量更新（upsert_latest_quotes）；
+- fund_nav_history：带 nav_date 的行按 (fund_code, nav_date) INSERT ... ON CONFLICT 写入净值。
+
+全部批次在一个事务内，提交后发布新的行情快照文件，并通知排行榜、板块聚合和净值存储刷新；文件中没有给出区间涨跌幅的基金
+由收益引擎根据新净值增量计算。每次导入后重算同类排名。
+"""
+import csv
+import json
+import uuid
+from datetime import date, datetime, time as time_of_day
+from decimal import Decimal, InvalidOperation
+
+from flask import current_app
+
+from app import db
+from app.models.fund import Fund, FundMarketData, FundNavHistory
+from app.utils.quotes import QUOTE_COLUMNS, UPSERT_DIALECTS, quote_row, upsert_latest_quotes
+from app.utils.leaderboard import notify_quotes_written
+from app.utils.sectors import notify_sector_quotes_written
+from app.utils.nav_store import notify_nav_written
+from app.utils.market_snapshot import deferred_market_snapshot, schedule_market_snapshot
+from app.utils.returns import RETURN_PERIODS, refresh_returns
+from app.utils.peer_rank import refresh_peer_ranks
+
+FORMATS = ('csv', 'jsonl')
+
+_DECIMAL_COLUMNS = tuple(column for column in QUOTE_COLUMNS if column != 'update_time')
+_PERIOD_COLUMNS = tuple(column for column, _ in RETURN_PERIODS)
+_NAV_COLUMNS = ('net_value', 'accumulated_value', 'daily_change', 'daily_change_rate')
+
+# 净值日期没有具体时间时，行情时间取当日收盘
+_CLOSE_TIME = time_of_day(15, 0)
+
+# 返回的错误明细条数上限
+MAX_REPORTED_ERRORS = 20
+
+
+class InvalidQuoteFeed(ValueError):
+    """行情文件格式错误，或严格模式下存在无效行"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def detect_format(name=None, content_type=None):
+    """根据文件扩展名或 Content-Type 判断文件格式，无法判断时返回 None"""
+    name = (name or '').lower()
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if name.endswith('.csv') or content_type in ('text/csv', 'application/csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')) or content_type in (
+            'application/x-ndjson', 'application/jsonl', 'application/x-jsonlines'):
+        return 'jsonl'
+    return None
+
+
+def read_records(stream, file_format):
+    """按行读取文本流，逐个产出 (行号, 记录字典)；JSON 解析失败的行产出 (行号, None)"""
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif file_format == 'jsonl':
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record
+    else:
+        raise InvalidQuoteFeed(f'不支持的文件格式: {file_format}')
+
+
+def _decimal(record, key):
+    value = record.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except InvalidOperation:
+        raise ValueError(f'{key} 不是数字: {value}')
+    if not number.is_finite():
+        raise ValueError(f'{key} 不是有效数字: {value}')
+    return number
+
+
+def parse_quote_record(record, default_time):
+    """
+    校验并规范化一行行情，返回 (行情行, 净值行或 None)
+
+    必填 fund_code 和 net_value；可选 nav_date（写入净值历史）、accumulated_value、各区间涨跌幅和
+    update_time（未提供时取 nav_date 当日 15:00，都没有时取导入时间）。格式错误时抛出 ValueError。
+    """
+    if not isinstance(record, dict):
+        raise ValueError('无法解析的行')
+    fund_code = str(record.get('fund_code') or '').strip()
+    if not fund_code:
+        raise ValueError('缺少 fund_code')
+
+    values = {column: _decimal(record, column) for column in _DECIMAL_COLUMNS}
+    if values['net_value'] is None or values['net_value'] <= 0:
+        raise ValueError('net_value 必须为正数')
+    try:
+        nav_date = record.get('nav_date')
+        nav_date = date.fromisoformat(str(nav_date).strip()) if nav_date not in (None, '') else None
+        update_time = record.get('update_time')
+        if update_time not in (None, ''):
+            update_time = datetime.fromisoformat(str(update_time).strip().replace('Z', '+00:00')).replace(tzinfo=None)
+        elif nav_date is not None:
+            update_time = datetime.combine(nav_date, _CLOSE_TIME)
+        else:
+            update_time = default_time
+    except ValueError:
+        raise ValueError('nav_date 或 update_time 格式错误')
+
+    quote = dict(values, fund_code=fund_code, update_time=update_time)
+    nav = None
+    if nav_date is not None:
+        nav = {column: values.get(column) for column in _NAV_COLUMNS}
+        nav.update(fund_code=fund_code, nav_date=nav_date, accumulated_value=_decimal(record, 'accumulated_value'))
+    return quote, nav
+
+
+def upsert_nav_history(connection, rows):
+    """批量写入净值，(fund_code, nav_date) 已存在时覆盖"""
+    if not rows:
+        return
+    table = FundNavHistory.__table__
+    insert = UPSERT_DIALECTS.get(connection.dialect.name)
+    if insert is not None:
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.fund_code, table.c.nav_date],
+            set_={column: statement.excluded[column] for column in _NAV_COLUMNS}
+        )
+        connection.execute(statement, rows)
+        return
+
+    # 其他数据库先删后插
+    keys = [(row['fund_code'], row['nav_date']) for row in rows]
+    connection.execute(table.delete().where(db.tuple_(table.c.fund_code, table.c.nav_date).in_(keys)))
+    connection.execute(table.insert(), rows)
+
+
+class _Batch:
+    """一批已校验的行，同一键只保留最后一行"""
+
+    def __init__(self):
+        self.quotes = {}  # (fund_code, update_time) -> 行情行
+        self.navs = {}  # (fund_code, nav_date) -> 净值行
+        self.lines = {}  # fund_code -> 行号列表（用于报告不存在的基金）
+        self.size = 0
+
+    def add(self, line_number, quote, nav):
+        self.quotes[(quote['fund_code'], quote['update_time'])] = quote
+        if nav is not None:
+            self.navs[(nav['fund_code'], nav['nav_date'])] = nav
+        self.lines.setdefault(quote['fund_code'], []).append(line_number)
+        self.size += 1
+
+
+class QuoteIngestion:
+    """一次导入的状态：逐批写入，最后统一提交并通知缓存"""
+
+    def __init__(self, batch_size=5000, strict=False):
+        self.batch_size = batch_size
+        self.strict = strict
+        self.default_time = datetime.utcnow().replace(microsecond=0)
+        self.rows = 0
+        self.loaded = 0
+        self.nav_rows = 0
+        self.errors = []
+        self.fund_codes = set()
+        self.nav_dates = {}  # fund_code -> 本次写入的最早净值日期
+        self.needs_returns = set()  # 文件中没有区间涨跌幅、需要由收益引擎计算的基金
+
+    def error(self, line_number, message):
+        self.errors.append({'line': line_number, 'error': message})
+
+    def reported_errors(self):
+        return sorted(self.errors, key=lambda error: error['line'])[:MAX_REPORTED_ERRORS]
+
+    def write(self, batch):
+        known = {code for code, in db.session.query(Fund.fund_code).filter(Fund.fund_code.in_(list(batch.lines)))}
+        for fund_code in set(batch.lines) - known:
+            for line_number in batch.lines[fund_code]:
+                self.error(line_number, f'基金 {fund_code} 不存在')
+        quotes = [quote for key, quote in batch.quotes.items() if key[0] in known]
+        navs = [nav for key, nav in batch.navs.items() if key[0] in known]
+        if not quotes:
+            return
+
+        connection = db.session.connection()
+        snapshots = FundMarketData.__table__
+        keys = [(quote['fund_code'], quote['update_time']) for quote in quotes]
+        connection.execute(snapshots.delete().where(db.tuple_(snapshots.c.fund_code, snapshots.c.update_time).in_(keys)))
+        for quote in quotes:
+            quote['id'] = str(uuid.uuid4())
+        connection.execute(snapshots.insert(), quotes)
+
+        latest = {}
+        for quote in quotes:
+            current = latest.get(quote['fund_code'])
+            if current is None or quote['update_time'] >= current['update_time']:
+                latest[quote['fund_code']] = quote
+        upsert_latest_quotes(connection, [quote_row(quote) for quote in latest.values()])
+        upsert_nav_history(connection, navs)
+
+        for nav in navs:
+            earliest = self.nav_dates.get(nav['fund_code'])
+            if earliest is None or nav['nav_date'] < earliest:
+                self.nav_dates[nav['fund_code']] = nav['nav_date']
+        self.needs_returns.update(
+            quote['fund_code'] for quote in latest.values()
+            if quote['fund_code'] in self.nav_dates and all(quote[column] is None for column in _PERIOD_COLUMNS)
+        )
+        self.fund_codes.update(latest)
+        self.loaded += len(quotes)
+        self.nav_rows += len(navs)
+
+    def run(self, records):
+        """records 为 (行号, 记录字典)，返回导入结果"""
+        # 导入的提交和随后收益计算的提交合并为一次快照发布
+        with deferred_market_snapshot():
+            return self._run(records)
+
+    def _run(self, records):
+        batch = _Batch()
+        try:
+            for line_number, record in records:
+                self.rows += 1
+                try:
+                    quote, nav = parse_quote_record(record, self.default_time)
+                except ValueError as e:
+                    self.error(line_number, str(e))
+                    continue
+                batch.add(line_number, quote, nav)
+                if batch.size >= self.batch_size:
+                    self.write(batch)
+                    batch = _Batch()
+            if batch.size:
+                self.write(batch)
+            if self.strict and self.errors:
+                raise InvalidQuoteFeed(f'行情文件有 {len(self.errors)} 行无效，未导入任何数据', self.reported_errors())
+            if self.loaded:
+                schedule_market_snapshot()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # 提交后通知各进程内缓存；Core 批量写入不触发 ORM 事件
+        notify_quotes_written(self.fund_codes)
+        notify_sector_quotes_written(self.fund_codes)
+        notify_nav_written(self.nav_dates.keys(), self.nav_dates)
+        if self.needs_returns:
+            # 同时重算同类排名
+            refresh_returns(self.needs_returns)
+        elif self.loaded:
+            refresh_peer_ranks()
+        return self.result()
+
+    def result(self):
+        return {
+            'rows': self.rows,
+            'loaded': self.loaded,
+            'skipped': self.rows - self.loaded,
+            'nav_rows': self.nav_rows,
+            'fund_count': len(self.fund_codes),
+            'errors': self.reported_errors()
+        }
+
+
+def ingest_quote_file(stream, file_format, strict=False, batch_size=None):
+    """
+    从文本流导入行情文件，返回导入结果
+
+    默认跳过无效行并在 errors 中报告行号；strict 为 True 时存在任何无效行则整体回滚并抛出 InvalidQuoteFeed。
+    """
+    batch_size = batch_size or current_app.config.get('QUOTE_INGEST_BATCH_SIZE', 5000)
+    return QuoteIngestion(batch_size, strict).run(read_records(stream, file_format))
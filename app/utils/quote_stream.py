@@ -0,0 +1,246 @@
+"""
+实时行情推送（Server-Sent Events）
+
+每个进程一个 QuotePublisher：按 QUOTE_STREAM_POLL_SECONDS 读取一次数据库中新写入的基金行情
+（按 update_time 水位线，走索引；水位线上的行情按 (基金代码, 行情记录) 去重，见 app/utils/watermark.py）和指数快照中变化的指数，打包成一个带序号的事件放入环形缓冲区，
+所有连接各自按订阅过滤后推送。轮询不依赖后台线程：到达轮询间隔时由某一个正在等待的连接执行
+（非阻塞加锁，其他连接只等待通知），因此 N 个连接每个间隔只读一次数据库，没有连接时不读取。
+
+事件 ID 为 "进程标识-序号"。客户端重连时带上 Last-Event-ID，若仍是本进程且之后的事件都还在缓冲区内，
+从断点补发；否则（连到其他进程、进程重启或落后太多）先推送一次订阅内容的完整快照。
+"""
+import json
+import threading
+import time
+import uuid
+from collections import deque, namedtuple
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import current_app
+
+from app import db
+from app.models.fund import FundLatestQuote
+from app.utils.index_quotes import get_index_snapshot, serialize_index
+from app.utils.watermark import Watermark
+
+EXTENSION_KEY = 'quote_stream'
+
+# 客户端断线后重连的等待时间（毫秒）
+RETRY_MILLISECONDS = 3000
+
+QuoteEvent = namedtuple('QuoteEvent', ('seq', 'funds', 'indices'))
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'无法序列化 {type(value).__name__}')
+
+
+def format_event(event_id, event_type, data):
+    """按 SSE 格式输出一个事件"""
+    payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_json_default)
+    return f'id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n'
+
+
+def _fund_query():
+    return db.session.query(
+        FundLatestQuote.fund_code, FundLatestQuote.net_value, FundLatestQuote.daily_change,
+        FundLatestQuote.daily_change_rate, FundLatestQuote.update_time
+    )
+
+
+def serialize_fund_quote(row):
+    fund_code, net_value, daily_change, daily_change_rate, update_time = row
+    return {
+        'fund_code': fund_code,
+        'net_value': str(net_value) if net_value is not None else None,
+        'daily_change': str(daily_change) if daily_change is not None else None,
+        'daily_change_rate': str(daily_change_rate) if daily_change_rate is not None else None,
+        'update_time': update_time
+    }
+
+
+class QuotePublisher:
+    """进程内的行情事件发布者：环形缓冲区保存最近的事件，等待者通过条件变量唤醒"""
+
+    def __init__(self, poll_seconds=1.0, buffer_size=1000):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.poll_seconds = poll_seconds
+        self._events = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._condition = threading.Condition()
+        self._poll_lock = threading.Lock()
+        self._polled_at = None
+        self.fund_watermark = None
+        self._index_times = None  # index_code -> 最近发布的行情时间
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def event_id(self, seq):
+        return f'{self.epoch}-{seq}'
+
+    def publish(self, funds, indices):
+        """发布一批变化的行情，funds / indices 为 {代码: 行情}"""
+        if not funds and not indices:
+            return
+        with self._condition:
+            self._seq += 1
+            self._events.append(QuoteEvent(self._seq, funds, indices))
+            self._condition.notify_all()
+
+    def events_after(self, seq):
+        """返回序号 seq 之后的事件；缓冲区已不能覆盖 seq 之后的全部事件时返回 None"""
+        with self._condition:
+            if seq > self._seq:
+                return None
+            if seq == self._seq:
+                return []
+            if not self._events or self._events[0].seq > seq + 1:
+                return None
+            return [event for event in self._events if event.seq > seq]
+
+    def resume(self, last_event_id):
+        """解析 Last-Event-ID，返回可以续传的序号；无法续传时返回 None"""
+        epoch, _, seq = (last_event_id or '').strip().partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        return seq if self.events_after(seq) is not None else None
+
+    def poll(self):
+        """读取水位线之后的基金行情和变化的指数并发布（调用方需在应用上下文中）"""
+        self._polled_at = time.monotonic()
+        try:
+            if self.fund_watermark is None:
+                # 推送起点：水位线时间上的现有行情视为已发布
+                latest = db.session.query(db.func.max(FundLatestQuote.update_time)).scalar()
+                self.fund_watermark = Watermark(latest, db.session.query(
+                    FundLatestQuote.fund_code, FundLatestQuote.market_data_id
+                ).filter(FundLatestQuote.update_time == latest) if latest is not None else ())
+                funds = {}
+            else:
+                funds = self._poll_funds()
+
+            snapshot = get_index_snapshot()
+            times = {quote.index_code: quote.update_time for quote in snapshot.quotes}
+            indices = {}
+            if self._index_times is not None:
+                indices = {
+                    quote.index_code: serialize_index(quote) for quote in snapshot.quotes
+                    if self._index_times.get(quote.index_code) != quote.update_time
+                }
+            self._index_times = times
+        finally:
+            # 结束只读事务，下次轮询能看到其他连接提交的数据
+            db.session.rollback()
+        self.publish(funds, indices)
+
+    def _poll_funds(self):
+        """读取水位线及之后的基金行情，跳过水位线上已发布过的记录"""
+        rows = _fund_query().add_columns(FundLatestQuote.market_data_id).filter(
+            self.fund_watermark.condition(FundLatestQuote.update_time)
+        ).all()
+        fresh = set(self.fund_watermark.advance(((row[0], row[5]), row[4]) for row in rows))
+        return {row[0]: serialize_fund_quote(row[:5]) for row in rows if (row[0], row[5]) in fresh}
+
+    def prime(self):
+        """首次使用时读取一次，记录当前水位线作为推送起点"""
+        with self._poll_lock:
+            if self._polled_at is None:
+                self.poll()
+
+    def wait(self, seq, timeout):
+        """
+        等待序号 seq 之后的事件，最多 timeout 秒，超时返回空列表（落后超出缓冲区时返回 None）
+
+        到达轮询间隔时，抢到轮询锁的等待者读取数据库，其余等待者在条件变量上等待通知。
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.events_after(seq)
+            if events is None or events:
+                return events
+            now = time.monotonic()
+            if now >= deadline:
+                return []
+            if (self._polled_at is None or now - self._polled_at >= self.poll_seconds) \
+                    and self._poll_lock.acquire(blocking=False):
+                try:
+                    self.poll()
+                finally:
+                    self._poll_lock.release()
+                continue
+            with self._condition:
+                if self._seq == seq:
+                    self._condition.wait(min(deadline - now, self.poll_seconds))
+
+
+def get_quote_publisher():
+    """获取当前应用的行情发布者，首次创建时记录行情水位线作为推送起点"""
+    publisher = current_app.extensions.get(EXTENSION_KEY)
+    if publisher is None:
+        config = current_app.config
+        publisher = current_app.extensions.setdefault(
+            EXTENSION_KEY,
+            QuotePublisher(config.get('QUOTE_STREAM_POLL_SECONDS', 1.0), config.get('QUOTE_STREAM_BUFFER_SIZE', 1000))
+        )
+        publisher.prime()
+    return publisher
+
+
+def subscription_snapshot(fund_codes, index_codes):
+    """订阅内容的当前完整行情"""
+    funds = [serialize_fund_quote(row) for row in _fund_query().filter(FundLatestQuote.fund_code.in_(fund_codes))] \
+        if fund_codes else []
+    db.session.rollback()
+    snapshot = get_index_snapshot()
+    indices = [serialize_index(snapshot.get(code)) for code in index_codes if snapshot.get(code) is not None]
+    return {'funds': funds, 'indices': indices}
+
+
+def _filter_event(event, fund_codes, index_codes):
+    funds = [event.funds[code] for code in fund_codes if code in event.funds]
+    indices = [event.indices[code] for code in index_codes if code in event.indices]
+    if not funds and not indices:
+        return None
+    return {'funds': funds, 'indices': indices}
+
+
+def quote_stream(publisher, fund_codes, index_codes, last_event_id=None, heartbeat_seconds=15, max_seconds=600):
+    """
+    生成一个连接的 SSE 数据
+
+    能续传时先补发断点之后的事件，否则先推送快照 (event: snapshot)；之后推送订阅内容的变化
+    (event: quotes)，空闲时每 heartbeat_seconds 发送注释行保活。连接保持 max_seconds 后结束，
+    客户端按 retry 自动重连并带上 Last-Event-ID 续传。
+    """
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+    seq = publisher.resume(last_event_id)
+    if seq is None:
+        seq = publisher.seq
+        yield format_event(publisher.event_id(seq), 'snapshot', subscription_snapshot(fund_codes, index_codes))
+
+    deadline = time.monotonic() + max_seconds
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        events = publisher.wait(seq, min(heartbeat_seconds, remaining))
+        if events is None:
+            # 落后超出缓冲区，重新推送快照
+            seq = publisher.seq
+            yield format_event(publisher.event_id(seq), 'snapshot', subscription_snapshot(fund_codes, index_codes))
+        elif not events:
+            yield ': keep-alive\n\n'
+        else:
+            for event in events:
+                seq = event.seq
+                data = _filter_event(event, fund_codes, index_codes)
+                if data is not None:
+                    yield format_event(publisher.event_id(seq), 'quotes', data)
@@ -0,0 +1,148 @@
+"""
+最新行情维护
+
+fund_latest_quotes 为每只基金保留一行最新市场数据。fund_market_data 通过ORM新增、修改、删除时，
+在同一个 flush 事务内同步更新（新数据的 update_time 不早于现有数据时才覆盖）；
+绕过ORM的批量写入需调用 upsert_latest_quotes。热点接口按主键读取最新行情，不再对快照表排序。
+每次写入最新行情都在同一事务内递增 data_versions 中的 quotes 版本，同一时间的行情修正也能使缓存失效。
+"""
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models.fund import DataVersion, FundMarketData, FundLatestQuote
+
+QUOTE_COLUMNS = (
+    'net_value',
+    'daily_change',
+    'daily_change_rate',
+    'weekly_change_rate',
+    'monthly_change_rate',
+    'quarterly_change_rate',
+    'yearly_change_rate',
+    'three_year_change_rate',
+    'update_time',
+)
+
+UPSERT_DIALECTS = {
+    'sqlite': sqlite_insert,
+    'postgresql': postgresql_insert,
+}
+
+QUOTES_VERSION = 'quotes'
+
+
+def bump_data_version(connection, name):
+    """在当前事务内递增数据版本"""
+    table = DataVersion.__table__
+    insert = UPSERT_DIALECTS.get(connection.dialect.name)
+    if insert is not None:
+        statement = insert(table).values(name=name, version=1)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.name], set_={'version': table.c.version + 1}
+        ))
+        return
+    result = connection.execute(table.update().where(table.c.name == name).values(version=table.c.version + 1))
+    if not result.rowcount:
+        connection.execute(table.insert(), {'name': name, 'version': 1})
+
+
+def data_version(name):
+    """读取数据版本的标量子查询"""
+    return db.select(DataVersion.version).where(DataVersion.name == name).scalar_subquery()
+
+
+def quote_row(market_data):
+    """从 FundMarketData 对象或字典提取最新行情行"""
+    if isinstance(market_data, dict):
+        row = {column: market_data.get(column) for column in QUOTE_COLUMNS}
+        row['fund_code'] = market_data['fund_code']
+        row['market_data_id'] = market_data['id']
+        return row
+    row = {column: getattr(market_data, column) for column in QUOTE_COLUMNS}
+    row['fund_code'] = market_data.fund_code
+    row['market_data_id'] = market_data.id
+    return row
+
+
+def upsert_latest_quotes(connection, rows):
+    """批量写入最新行情，已有记录仅在新数据不早于旧数据时覆盖"""
+    if not rows:
+        return
+    table = FundLatestQuote.__table__
+    insert = UPSERT_DIALECTS.get(connection.dialect.name)
+
+    if insert is not None:
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.fund_code],
+            set_={column: statement.excluded[column] for column in ('market_data_id',) + QUOTE_COLUMNS},
+            where=table.c.update_time.is_(None) | (statement.excluded.update_time >= table.c.update_time)
+        )
+        connection.execute(statement, rows)
+        bump_data_version(connection, QUOTES_VERSION)
+        return
+
+    # 其他数据库逐行处理
+    for row in rows:
+        current = connection.execute(
+            db.select(table.c.update_time).where(table.c.fund_code == row['fund_code'])
+        ).first()
+        if current is None:
+            connection.execute(table.insert(), row)
+        elif current.update_time is None or row['update_time'] is None or row['update_time'] >= current.update_time:
+            connection.execute(table.update().where(table.c.fund_code == row['fund_code']), row)
+    bump_data_version(connection, QUOTES_VERSION)
+
+
+def rebuild_latest_quotes(connection, fund_codes=None):
+    """根据 fund_market_data 重建最新行情（初始化已有数据库或修复时使用）"""
+    snapshots = FundMarketData.__table__
+    quotes = FundLatestQuote.__table__
+    latest_time = db.select(
+        snapshots.c.fund_code, db.func.max(snapshots.c.update_time).label('update_time')
+    ).group_by(snapshots.c.fund_code)
+    if fund_codes is not None:
+        latest_time = latest_time.where(snapshots.c.fund_code.in_(list(fund_codes)))
+    latest_time = latest_time.subquery()
+
+    rows = connection.execute(
+        db.select(snapshots).join(
+            latest_time,
+            (snapshots.c.fund_code == latest_time.c.fund_code) &
+            (snapshots.c.update_time == latest_time.c.update_time)
+        )
+    ).mappings().all()
+
+    delete = quotes.delete()
+    if fund_codes is not None:
+        delete = delete.where(quotes.c.fund_code.in_(list(fund_codes)))
+    connection.execute(delete)
+    latest = {}
+    for row in rows:
+        latest[row['fund_code']] = quote_row(dict(row))
+    if latest:
+        connection.execute(quotes.insert(), list(latest.values()))
+    bump_data_version(connection, QUOTES_VERSION)
+    return len(latest)
+
+
+def get_latest_quote(fund_code):
+    return db.session.get(FundLatestQuote, fund_code)
+
+
+@event.listens_for(FundMarketData, 'after_insert')
+@event.listens_for(FundMarketData, 'after_update')
+def _sync_latest_quote(mapper, connection, target):
+    upsert_latest_quotes(connection, [quote_row(target)])
+
+
+@event.listens_for(FundMarketData, 'after_delete')
+def _remove_latest_quote(mapper, connection, target):
+    quotes = FundLatestQuote.__table__
+    current = connection.execute(
+        db.select(quotes.c.market_data_id).where(quotes.c.fund_code == target.fund_code)
+    ).first()
+    if current is not None and current.market_data_id == target.id:
+        rebuild_latest_quotes(connection, [target.fund_code])
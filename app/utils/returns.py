@@ -0,0 +1,369 @@
+"""
+区间收益计算引擎
+
+根据 fund_nav_history 计算每只基金的日、周、月、季、年、三年涨跌幅，写入 fund_market_data。
+
+全量计算时把所有基金的净值按 (基金, 日期) 拼接成一个面板，以 基金序号 * 步长 + 日期 作为
+单调递增的复合键，对每个区间只做一次 searchsorted 即可得到全部基金的基期位置。
+计算完成后引擎保留各基金近三年的净值缓冲区和每个区间的基期指针；新交易日到来时只追加一个点并
+向前推进指针，每只基金的更新代价与历史长度无关。
+"""
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from app import db
+from app.models.fund import FundMarketData, FundLatestQuote, FundNavHistory
+from app.utils.quotes import quote_row, upsert_latest_quotes
+from app.utils.peer_rank import refresh_peer_ranks
+from app.utils.market_snapshot import schedule_market_snapshot
+from app.utils.leaderboard import notify_quotes_written
+from app.utils.sectors import notify_sector_quotes_written
+
+EXTENSION_KEY = 'return_engine'
+
+# (FundMarketData 字段, 回看自然日数)，基期取回看日当天或之前最近的一个净值日
+RETURN_PERIODS = (
+    ('weekly_change_rate', 7),
+    ('monthly_change_rate', 30),
+    ('quarterly_change_rate', 91),
+    ('yearly_change_rate', 365),
+    ('three_year_change_rate', 1095),
+)
+
+_MAX_LOOKBACK = max(days for _, days in RETURN_PERIODS)
+_EPOCH = date(1970, 1, 1)
+
+
+def _day_number(value):
+    return (value - _EPOCH).days
+
+
+def build_panel(rows):
+    """
+    将按 (fund_code, nav_date) 排序的行拆分为面板
+
+    返回 (基金代码列表, 长度为 基金数 + 1 的 offsets, 自 1970-01-01 起的天数数组)，
+    第 i 只基金的数据位于 [offsets[i], offsets[i + 1])。
+    """
+    fund_codes = []
+    offsets = [0]
+    for index, row in enumerate(rows):
+        if not fund_codes or row[0] != fund_codes[-1]:
+            if fund_codes:
+                offsets.append(index)
+            fund_codes.append(row[0])
+    if fund_codes:
+        offsets.append(len(rows))
+    dates = np.fromiter((_day_number(row[1]) for row in rows), dtype=np.int64, count=len(rows))
+    return fund_codes, np.array(offsets, dtype=np.int64), dates
+
+
+def compute_panel_returns(offsets, dates, values):
+    """
+    向量化计算面板上所有基金的区间收益
+
+    offsets 长度为 基金数 + 1，第 i 只基金的数据位于 [offsets[i], offsets[i + 1])；
+    dates 为自 1970-01-01 起的天数，每只基金内部升序；values 为对应净值。
+    返回 (各区间基期下标 {字段: ndarray}, 各区间涨跌幅 {字段: ndarray})，无法计算处为 -1 / NaN。
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    dates = np.asarray(dates, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    fund_count = len(offsets) - 1
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    nonempty = lengths > 0
+    ends = np.where(nonempty, offsets[1:] - 1, 0)
+
+    base_positions = {}
+    rates = {}
+    if not len(dates):
+        for column, _ in RETURN_PERIODS:
+            base_positions[column] = np.full(fund_count, -1, dtype=np.int64)
+            rates[column] = np.full(fund_count, np.nan)
+        return base_positions, rates
+
+    origin = dates.min() - _MAX_LOOKBACK - 1
+    stride = dates.max() - origin + 1
+    fund_ids = np.repeat(np.arange(fund_count, dtype=np.int64), lengths)
+    keys = fund_ids * stride + (dates - origin)
+    last_dates = dates[ends]
+    last_values = values[ends]
+
+    for column, days in RETURN_PERIODS:
+        targets = np.arange(fund_count, dtype=np.int64) * stride + (last_dates - days - origin)
+        positions = np.searchsorted(keys, targets, side='right') - 1
+        valid = nonempty & (positions >= starts)
+        positions = np.where(valid, positions, -1)
+        base_values = values[np.where(valid, positions, 0)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rates[column] = np.where(valid, (last_values / base_values - 1) * 100, np.nan)
+        base_positions[column] = positions
+    return base_positions, rates
+
+
+class _FundBuffer:
+    """单只基金的净值缓冲区，容量按倍数扩展以保证追加为均摊 O(1)"""
+
+    __slots__ = ('dates', 'values', 'size', 'pointers')
+
+    def __init__(self, dates, values, pointers):
+        capacity = max(16, len(dates) * 2)
+        self.dates = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.size = len(dates)
+        self.dates[:self.size] = dates
+        self.values[:self.size] = values
+        self.pointers = list(pointers)
+
+    def append(self, day, value):
+        if self.size == len(self.dates):
+            self.dates = np.concatenate((self.dates, np.empty_like(self.dates)))
+            self.values = np.concatenate((self.values, np.empty_like(self.values)))
+        self.dates[self.size] = day
+        self.values[self.size] = value
+        self.size += 1
+
+    @property
+    def last_day(self):
+        return int(self.dates[self.size - 1]) if self.size else None
+
+    def snapshot(self):
+        """按当前指针计算各区间涨跌幅"""
+        last = self.size - 1
+        result = {
+            'net_value': float(self.values[last]),
+            'daily_change': None,
+            'daily_change_rate': None
+        }
+        if last >= 1:
+            previous = float(self.values[last - 1])
+            result['daily_change'] = float(self.values[last]) - previous
+            result['daily_change_rate'] = (float(self.values[last]) / previous - 1) * 100 if previous else None
+        for (column, _), pointer in zip(RETURN_PERIODS, self.pointers):
+            base = float(self.values[pointer]) if pointer >= 0 else 0.0
+            result[column] = (float(self.values[last]) / base - 1) * 100 if pointer >= 0 and base else None
+        return result
+
+
+class ReturnEngine:
+    """区间收益引擎：一次全量向量化计算 + 按交易日增量更新"""
+
+    def __init__(self):
+        self._funds = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def rebuild(self, as_of=None):
+        """从 fund_nav_history 全量加载近三年净值并计算全部基金的区间收益"""
+        as_of = as_of or date.today()
+        since = as_of - timedelta(days=_MAX_LOOKBACK + 31)
+        rows = db.session.execute(
+            db.select(FundNavHistory.fund_code, FundNavHistory.nav_date, FundNavHistory.net_value)
+            .where(FundNavHistory.nav_date >= since)
+            .order_by(FundNavHistory.fund_code, FundNavHistory.nav_date)
+        ).all()
+        return self.load(rows)
+
+    def load(self, rows):
+        """rows 为按 (fund_code, nav_date) 排序的 (fund_code, nav_date, net_value)，返回 {fund_code: 结果}"""
+        fund_codes, offsets, dates = build_panel(rows)
+        values = np.fromiter((float(row[2]) for row in rows), dtype=np.float64, count=len(rows))
+        base_positions, rates = compute_panel_returns(offsets, dates, values)
+
+        funds = {}
+        for i, fund_code in enumerate(fund_codes):
+            start, end = offsets[i], offsets[i + 1]
+            pointers = [
+                int(base_positions[column][i] - start) if base_positions[column][i] >= 0 else -1
+                for column, _ in RETURN_PERIODS
+            ]
+            funds[fund_code] = _FundBuffer(dates[start:end], values[start:end], pointers)
+
+        with self._lock:
+            self._funds = funds
+            self.loaded = True
+
+        if not fund_codes:
+            return {}
+        ends = offsets[1:] - 1
+        has_previous = ends - 1 >= offsets[:-1]
+        last_values = values[ends]
+        previous_values = values[np.where(has_previous, ends - 1, ends)]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            columns = {
+                'net_value': last_values,
+                'daily_change': np.where(has_previous, last_values - previous_values, np.nan),
+                'daily_change_rate': np.where(has_previous, (last_values / previous_values - 1) * 100, np.nan)
+            }
+        columns.update(rates)
+        column_lists = {column: array.tolist() for column, array in columns.items()}
+        return {
+            fund_code: {column: column_lists[column][i] for column in column_lists}
+            for i, fund_code in enumerate(fund_codes)
+        }
+
+    def last_date(self, fund_code):
+        buffer = self._funds.get(fund_code)
+        if buffer is None or buffer.last_day is None:
+            return None
+        return _EPOCH + timedelta(days=buffer.last_day)
+
+    def fund_codes(self):
+        return list(self._funds)
+
+    def result(self, fund_code):
+        """该基金当前的区间收益（不追加净值），引擎中没有该基金时返回 None"""
+        with self._lock:
+            buffer = self._funds.get(fund_code)
+            return buffer.snapshot() if buffer is not None and buffer.size else None
+
+    def append(self, fund_code, nav_date, net_value):
+        """追加一个新交易日净值并返回该基金最新的区间收益；早于已有末尾日期的净值忽略"""
+        day = _day_number(nav_date)
+        with self._lock:
+            buffer = self._funds.get(fund_code)
+            if buffer is None:
+                buffer = self._funds[fund_code] = _FundBuffer([], [], [-1] * len(RETURN_PERIODS))
+            if buffer.last_day is not None and day <= buffer.last_day:
+                return None
+            buffer.append(day, float(net_value))
+            # 各区间基期指针只会向前移动：推进到回看日当天或之前的最后一个净值日
+            for i, (_, days) in enumerate(RETURN_PERIODS):
+                target = day - days
+                pointer = buffer.pointers[i]
+                while pointer + 1 < buffer.size and buffer.dates[pointer + 1] <= target:
+                    pointer += 1
+                buffer.pointers[i] = pointer
+            return buffer.snapshot()
+
+
+def get_return_engine():
+    engine = current_app.extensions.get(EXTENSION_KEY)
+    if engine is None:
+        engine = current_app.extensions.setdefault(EXTENSION_KEY, ReturnEngine())
+    return engine
+
+
+def _round(value, digits):
+    return None if value is None or value != value else round(value, digits)
+
+
+def store_returns(results):
+    """
+    将 {fund_code: 结果} 写入各基金最新一条 fund_market_data，没有记录的基金新建一条
+
+    已有记录只更新净值和涨跌幅列，保留原来的 update_time：行情导入按 (fund_code, update_time) 替换记录，
+    重复导入同一文件时不会因为收益计算改写了时间而多出一条。
+    """
+    if not results:
+        return 0
+    latest = {
+        fund_code: (market_data_id, update_time) for fund_code, market_data_id, update_time in db.session.execute(
+            db.select(FundLatestQuote.fund_code, FundLatestQuote.market_data_id, FundLatestQuote.update_time)
+            .where(FundLatestQuote.fund_code.in_(list(results)))
+        )
+    }
+
+    now = datetime.utcnow()
+    updates = []
+    quotes = []
+    inserts = []
+    for fund_code, result in results.items():
+        values = {
+            'net_value': _round(result['net_value'], 4),
+            'daily_change': _round(result['daily_change'], 4),
+            'daily_change_rate': _round(result['daily_change_rate'], 2)
+        }
+        for column, _ in RETURN_PERIODS:
+            values[column] = _round(result[column], 2)
+        if fund_code in latest:
+            market_data_id, update_time = latest[fund_code]
+            updates.append({'id': market_data_id, **values})
+            quotes.append(quote_row({'id': market_data_id, 'fund_code': fund_code, 'update_time': update_time, **values}))
+        else:
+            inserts.append(FundMarketData(fund_code=fund_code, update_time=now, **values))
+
+    if updates:
+        # 按主键批量更新不触发ORM事件，最新行情在同一事务内显式同步
+        db.session.execute(db.update(FundMarketData), updates)
+        upsert_latest_quotes(db.session.connection(), quotes)
+    if inserts:
+        db.session.add_all(inserts)
+    schedule_market_snapshot()
+    db.session.commit()
+    if updates:
+        # 按主键批量更新不触发提交钩子，显式通知排行榜和板块聚合
+        notify_quotes_written(latest)
+        notify_sector_quotes_written(latest)
+    return len(results)
+
+
+def _new_nav_condition(engine, fund_codes=None):
+    """
+    每只基金只读取其在引擎中末尾日期之后的净值：按末尾日期分组，每组一个 (代码 IN, 日期 >) 条件
+
+    指定基金时，引擎中尚不存在的基金读取其全部净值；不指定基金时，所有基金都读取全体末尾日期中
+    最晚一天之后的净值（覆盖新上线基金），末尾日期更早的基金再按各自的日期补读。
+    """
+    groups = {}
+    if fund_codes:
+        for fund_code in fund_codes:
+            groups.setdefault(engine.last_date(fund_code), []).append(fund_code)
+        conditions = [
+            FundNavHistory.fund_code.in_(codes) if last_date is None
+            else FundNavHistory.fund_code.in_(codes) & (FundNavHistory.nav_date > last_date)
+            for last_date, codes in groups.items()
+        ]
+        return db.or_(*conditions)
+
+    for fund_code in engine.fund_codes():
+        groups.setdefault(engine.last_date(fund_code), []).append(fund_code)
+    groups.pop(None, None)
+    if not groups:
+        return db.true()
+    latest = max(groups)
+    conditions = [FundNavHistory.nav_date > latest]
+    conditions.extend(
+        FundNavHistory.fund_code.in_(codes) & (FundNavHistory.nav_date > last_date)
+        for last_date, codes in groups.items() if last_date < latest
+    )
+    return db.or_(*conditions)
+
+
+def refresh_returns(fund_codes=None):
+    """
+    增量刷新：读取引擎末尾日期之后的新净值并逐日追加，写回 fund_market_data，并重算同类排名
+
+    引擎尚未加载时执行一次全量计算；fund_codes 为空时刷新所有基金。每只基金只读取其自身末尾日期之后的净值，
+    新上线基金的完整历史由每日全量计算（compute_returns.py）补齐。
+    """
+    engine = get_return_engine()
+    if not engine.loaded:
+        count = store_returns(engine.rebuild())
+        refresh_peer_ranks()
+        return count
+
+    query = db.select(FundNavHistory.fund_code, FundNavHistory.nav_date, FundNavHistory.net_value).where(
+        _new_nav_condition(engine, fund_codes)
+    )
+    rows = db.session.execute(query.order_by(FundNavHistory.fund_code, FundNavHistory.nav_date)).all()
+
+    results = {}
+    for fund_code, nav_date, net_value in rows:
+        result = engine.append(fund_code, nav_date, net_value)
+        if result is not None:
+            results[fund_code] = result
+    # 指定的基金没有新净值时写回引擎当前结果（例如重复导入同一文件，行情记录被替换后不带区间涨跌幅）
+    for fund_code in fund_codes or ():
+        if fund_code not in results:
+            result = engine.result(fund_code)
+            if result is not None:
+                results[fund_code] = result
+    count = store_returns(results)
+    if count:
+        refresh_peer_ranks()
+    return count
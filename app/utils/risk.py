@@ -0,0 +1,291 @@
+"""
+风险指标计算
+
+每日批量任务根据近一年净值为所有基金计算年化收益、年化波动率、下行波动率、最大回撤及修复期、
+夏普/索提诺/卡玛比率和相对业绩基准的贝塔，全量写入 fund_risk_metrics，接口按主键读取。
+
+计算在 (基金, 日期) 面板上一次完成：分段求和用 np.bincount 按基金序号聚合；最大回撤的前高用
+“基金序号 * 常数 + 对数净值” 做一次全局 maximum.accumulate 得到，各基金之间互不影响。
+业绩基准可配置为某只基金（如沪深300指数基金）的代码，未配置时使用全市场基金日收益的等权平均。
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from app import db
+from app.models.fund import FundNavHistory, FundRiskMetrics
+from app.utils.returns import build_panel
+
+MARKET_BENCHMARK = 'market'
+
+# 年化按每年交易日数折算
+TRADING_DAYS_PER_YEAR = 252
+
+
+def _segment_sum(fund_ids, weights, fund_count):
+    return np.bincount(fund_ids, weights=weights, minlength=fund_count)
+
+
+def compute_risk_metrics(offsets, dates, values, benchmark_index=None, risk_free_rate=0.02, min_observations=20):
+    """
+    向量化计算面板上所有基金的风险指标
+
+    offsets / dates 与 compute_panel_returns 相同，values 为复权后的净值（累计净值优先）。
+    benchmark_index 为作为业绩基准的基金序号（该基金须有数据），None 时以全市场等权平均日收益为基准。
+    返回 {指标: ndarray}，收益、波动率和回撤为小数；日期类指标为面板下标，不存在时为 -1。
+    数据点少于 min_observations 的基金各项指标为 NaN。
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    dates = np.asarray(dates, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    fund_count = len(offsets) - 1
+    total = len(values)
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    nonempty = lengths > 0
+    ends = np.where(nonempty, offsets[1:] - 1, 0)
+    fund_ids = np.repeat(np.arange(fund_count, dtype=np.int64), lengths)
+    positions = np.arange(total, dtype=np.int64)
+
+    result = {
+        'observations': lengths,
+        'start_position': np.where(nonempty, starts, -1),
+        'end_position': np.where(nonempty, ends, -1),
+    }
+    if not total:
+        for name in ('annualized_return', 'volatility', 'downside_volatility', 'max_drawdown',
+                     'sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'beta'):
+            result[name] = np.full(fund_count, np.nan)
+        for name in ('peak_position', 'trough_position', 'recovery_position'):
+            result[name] = np.full(fund_count, -1, dtype=np.int64)
+        return result
+
+    # 日收益：每只基金的第一个点没有前一日，记为 NaN
+    returns = np.full(total, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns[1:] = values[1:] / values[:-1] - 1
+    returns[starts[nonempty]] = np.nan
+    has_return = ~np.isnan(returns)
+    clean = np.where(has_return, returns, 0.0)
+
+    count = _segment_sum(fund_ids, has_return, fund_count)
+    sum_returns = _segment_sum(fund_ids, clean, fund_count)
+    sum_squares = _segment_sum(fund_ids, clean * clean, fund_count)
+    risk_free_daily = risk_free_rate / TRADING_DAYS_PER_YEAR
+    downside = np.where(has_return, np.minimum(clean - risk_free_daily, 0.0), 0.0)
+    sum_downside = _segment_sum(fund_ids, downside * downside, fund_count)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sum_returns / count
+        variance = (sum_squares - count * mean * mean) / (count - 1)
+        volatility = np.sqrt(np.maximum(variance, 0.0)) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        downside_volatility = np.sqrt(sum_downside / count) * np.sqrt(TRADING_DAYS_PER_YEAR)
+        first = starts.clip(max=total - 1)
+        span_days = dates[ends] - dates[first]
+        growth = values[ends] / values[first]
+        annualized_return = np.where(span_days > 0, growth ** (365.0 / span_days) - 1, np.nan)
+        sharpe_ratio = (annualized_return - risk_free_rate) / volatility
+        sortino_ratio = (annualized_return - risk_free_rate) / downside_volatility
+
+    # 最大回撤：对数净值加上按基金递增的常数后做一次全局累计最大值，得到各基金内部的前高位置
+    log_values = np.log(values)
+    shift = log_values.max() - log_values.min() + 1.0
+    shifted = log_values + fund_ids * shift
+    is_new_peak = shifted >= np.maximum.accumulate(shifted)
+    running_peak = np.maximum.accumulate(np.where(is_new_peak, positions, 0))
+    drawdowns = values / values[running_peak] - 1
+
+    # 按 (基金, 回撤, 位置) 排序后每段第一个即该基金最早出现的最大回撤谷底
+    order = np.lexsort((positions, drawdowns, fund_ids))
+    trough_position = np.where(nonempty, order[first], -1)
+    safe_trough = trough_position.clip(min=0)
+    max_drawdown = np.where(nonempty, drawdowns[safe_trough], np.nan)
+    peak_position = np.where(nonempty, running_peak[safe_trough], -1)
+
+    # 修复：谷底之后第一个回到前高的净值日
+    peak_values = values[peak_position.clip(min=0)]
+    recovered = (positions > trough_position[fund_ids]) & (values >= peak_values[fund_ids])
+    recovered &= (max_drawdown < 0)[fund_ids]
+    recovery_position = np.full(fund_count, -1, dtype=np.int64)
+    recovered_funds, first_index = np.unique(fund_ids[recovered], return_index=True)
+    recovery_position[recovered_funds] = positions[recovered][first_index]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        calmar_ratio = np.where(max_drawdown < 0, annualized_return / -max_drawdown, np.nan)
+
+    # 贝塔：按日期对齐基金日收益与基准日收益
+    if benchmark_index is None:
+        unique_days, day_index = np.unique(dates, return_inverse=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            market = np.bincount(day_index, weights=clean) / np.bincount(day_index, weights=has_return)
+        benchmark_returns = market[day_index]
+    else:
+        lo, hi = offsets[benchmark_index], offsets[benchmark_index + 1]
+        benchmark_days = dates[lo:hi]
+        located = np.searchsorted(benchmark_days, dates).clip(max=hi - lo - 1)
+        benchmark_returns = np.where(benchmark_days[located] == dates, returns[lo + located], np.nan)
+
+    paired = has_return & ~np.isnan(benchmark_returns)
+    x = np.where(paired, returns, 0.0)
+    y = np.where(paired, benchmark_returns, 0.0)
+    pairs = _segment_sum(fund_ids, paired, fund_count)
+    sum_x = _segment_sum(fund_ids, x, fund_count)
+    sum_y = _segment_sum(fund_ids, y, fund_count)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        covariance = _segment_sum(fund_ids, x * y, fund_count) - sum_x * sum_y / pairs
+        benchmark_variance = _segment_sum(fund_ids, y * y, fund_count) - sum_y * sum_y / pairs
+        beta = np.where(benchmark_variance > 1e-18, covariance / benchmark_variance, np.nan)
+
+    enough = lengths >= max(min_observations, 2)
+    metrics = {
+        'annualized_return': annualized_return,
+        'volatility': volatility,
+        'downside_volatility': downside_volatility,
+        'max_drawdown': max_drawdown,
+        'sharpe_ratio': sharpe_ratio,
+        'sortino_ratio': sortino_ratio,
+        'calmar_ratio': calmar_ratio,
+        'beta': beta,
+    }
+    for name, array in metrics.items():
+        result[name] = np.where(enough & np.isfinite(array), array, np.nan)
+    result['peak_position'] = np.where(enough, peak_position, -1)
+    result['trough_position'] = np.where(enough, trough_position, -1)
+    result['recovery_position'] = np.where(enough, recovery_position, -1)
+    return result
+
+
+def _number(value, digits=4):
+    return None if value != value else round(float(value), digits)
+
+
+def calculate_risk_metrics(as_of=None):
+    """
+    从 fund_nav_history 读取计算窗口内的净值并计算全部基金的风险指标，返回待写入的行
+
+    窗口终点默认为库中最新的净值日；基金的累计净值完整时使用累计净值（包含分红），否则使用单位净值。
+    """
+    config = current_app.config
+    window_days = config['RISK_METRICS_WINDOW_DAYS']
+    benchmark_code = config.get('RISK_BENCHMARK_FUND_CODE') or MARKET_BENCHMARK
+
+    if as_of is None:
+        as_of = db.session.query(db.func.max(FundNavHistory.nav_date)).scalar()
+        if as_of is None:
+            return []
+    since = as_of - timedelta(days=window_days)
+
+    rows = db.session.execute(
+        db.select(
+            FundNavHistory.fund_code,
+            FundNavHistory.nav_date,
+            FundNavHistory.net_value,
+            FundNavHistory.accumulated_value
+        )
+        .where(FundNavHistory.nav_date >= since, FundNavHistory.nav_date <= as_of)
+        .order_by(FundNavHistory.fund_code, FundNavHistory.nav_date)
+    ).all()
+    fund_codes, offsets, dates = build_panel(rows)
+    if not fund_codes:
+        return []
+
+    net_values = np.fromiter((float(row[2]) for row in rows), dtype=np.float64, count=len(rows))
+    accumulated = np.fromiter(
+        (float(row[3]) if row[3] is not None else np.nan for row in rows), dtype=np.float64, count=len(rows)
+    )
+    fund_ids = np.repeat(np.arange(len(fund_codes)), np.diff(offsets))
+    incomplete = np.bincount(fund_ids, weights=np.isnan(accumulated), minlength=len(fund_codes)) > 0
+    values = np.where(incomplete[fund_ids], net_values, accumulated)
+
+    benchmark_index = fund_codes.index(benchmark_code) if benchmark_code in fund_codes else None
+    if benchmark_index is None:
+        benchmark_code = MARKET_BENCHMARK
+    metrics = compute_risk_metrics(
+        offsets, dates, values,
+        benchmark_index=benchmark_index,
+        risk_free_rate=config['RISK_FREE_RATE'],
+        min_observations=config['RISK_METRICS_MIN_OBSERVATIONS']
+    )
+
+    day_values = dates.astype('datetime64[D]').astype(object).tolist()
+    lists = {name: array.tolist() for name, array in metrics.items()}
+
+    def day_at(name, i):
+        position = lists[name][i]
+        return day_values[position] if position >= 0 else None
+
+    now = datetime.utcnow()
+    result = []
+    for i, fund_code in enumerate(fund_codes):
+        recovery_date = day_at('recovery_position', i)
+        trough_date = day_at('trough_position', i)
+        result.append({
+            'fund_code': fund_code,
+            'window_days': window_days,
+            'start_date': day_at('start_position', i),
+            'end_date': day_at('end_position', i),
+            'observations': lists['observations'][i],
+            'annualized_return': _number(lists['annualized_return'][i] * 100),
+            'volatility': _number(lists['volatility'][i] * 100),
+            'downside_volatility': _number(lists['downside_volatility'][i] * 100),
+            'max_drawdown': _number(lists['max_drawdown'][i] * 100),
+            'drawdown_peak_date': day_at('peak_position', i),
+            'drawdown_trough_date': trough_date,
+            'recovery_date': recovery_date,
+            'recovery_days': (recovery_date - trough_date).days if recovery_date and trough_date else None,
+            'sharpe_ratio': _number(lists['sharpe_ratio'][i]),
+            'sortino_ratio': _number(lists['sortino_ratio'][i]),
+            'calmar_ratio': _number(lists['calmar_ratio'][i]),
+            'beta': _number(lists['beta'][i]),
+            'benchmark_code': benchmark_code,
+            'computed_at': now
+        })
+    return result
+
+
+def store_risk_metrics(rows):
+    """全量替换 fund_risk_metrics（单个事务内先删后插）"""
+    db.session.execute(db.delete(FundRiskMetrics))
+    if rows:
+        db.session.execute(db.insert(FundRiskMetrics), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def refresh_risk_metrics(as_of=None):
+    return store_risk_metrics(calculate_risk_metrics(as_of))
+
+
+def get_risk_metrics(fund_code):
+    """按主键读取一只基金的风险指标"""
+    return db.session.get(FundRiskMetrics, fund_code)
+
+
+def serialize_risk_metrics(metrics):
+    if metrics is None:
+        return None
+    return {
+        'window_days': metrics.window_days,
+        'start_date': metrics.start_date.isoformat() if metrics.start_date else None,
+        'end_date': metrics.end_date.isoformat() if metrics.end_date else None,
+        'observations': metrics.observations,
+        'annualized_return': _as_float(metrics.annualized_return),
+        'volatility': _as_float(metrics.volatility),
+        'downside_volatility': _as_float(metrics.downside_volatility),
+        'max_drawdown': _as_float(metrics.max_drawdown),
+        'drawdown_peak_date': metrics.drawdown_peak_date.isoformat() if metrics.drawdown_peak_date else None,
+        'drawdown_trough_date': metrics.drawdown_trough_date.isoformat() if metrics.drawdown_trough_date else None,
+        'recovery_date': metrics.recovery_date.isoformat() if metrics.recovery_date else None,
+        'recovery_days': metrics.recovery_days,
+        'sharpe_ratio': _as_float(metrics.sharpe_ratio),
+        'sortino_ratio': _as_float(metrics.sortino_ratio),
+        'calmar_ratio': _as_float(metrics.calmar_ratio),
+        'beta': _as_float(metrics.beta),
+        'benchmark_code': metrics.benchmark_code,
+        'computed_at': metrics.computed_at.isoformat() if metrics.computed_at else None
+    }
+
+
+def _as_float(value):
+    return float(value) if value is not None else None
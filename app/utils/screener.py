@@ -0,0 +1,123 @@
+"""
+基金筛选表达式
+
+筛选条件写成以分号分隔的子句，每个子句为 字段 运算符 值，例如：
+
+    fund_type=股票型|混合型;risk_level=R3;management_fee<=0.015;yearly_change_rate>=10
+
+= 和 != 的值可用 | 分隔多个候选；数值字段支持 > >= < <=。
+排序写成逗号分隔的字段列表，字段前加 - 表示降序，例如 -yearly_change_rate,fund_code。
+字段只能取 SCREEN_FIELDS 中的白名单，解析结果是 SQLAlchemy 条件和排序表达式。
+"""
+import math
+import re
+
+from app.models.fund import Fund, FundLatestQuote
+
+
+class InvalidScreen(ValueError):
+    """筛选或排序表达式无法解析"""
+
+
+# 字段名 -> (列, 是否数值)
+SCREEN_FIELDS = {
+    'fund_type': (Fund.fund_type, False),
+    'risk_level': (Fund.risk_level, False),
+    'company': (Fund.company, False),
+    'management_fee': (Fund.management_fee, True),
+    'custody_fee': (Fund.custody_fee, True),
+    'net_asset_value': (Fund.net_asset_value, True),
+    'net_value': (FundLatestQuote.net_value, True),
+    'daily_change_rate': (FundLatestQuote.daily_change_rate, True),
+    'weekly_change_rate': (FundLatestQuote.weekly_change_rate, True),
+    'monthly_change_rate': (FundLatestQuote.monthly_change_rate, True),
+    'quarterly_change_rate': (FundLatestQuote.quarterly_change_rate, True),
+    'yearly_change_rate': (FundLatestQuote.yearly_change_rate, True),
+    'three_year_change_rate': (FundLatestQuote.three_year_change_rate, True),
+}
+
+SORT_FIELDS = {
+    'fund_code': Fund.fund_code,
+    'fund_name': Fund.fund_name,
+    'management_fee': Fund.management_fee,
+    'net_asset_value': Fund.net_asset_value,
+    'net_value': FundLatestQuote.net_value,
+    'daily_change_rate': FundLatestQuote.daily_change_rate,
+    'weekly_change_rate': FundLatestQuote.weekly_change_rate,
+    'monthly_change_rate': FundLatestQuote.monthly_change_rate,
+    'quarterly_change_rate': FundLatestQuote.quarterly_change_rate,
+    'yearly_change_rate': FundLatestQuote.yearly_change_rate,
+    'three_year_change_rate': FundLatestQuote.three_year_change_rate,
+}
+
+_CLAUSE_RE = re.compile(r'^\s*([a-z_]+)\s*(>=|<=|!=|=|>|<)\s*(.+?)\s*$')
+
+_NUMERIC_OPERATORS = {
+    '>': lambda column, value: column > value,
+    '>=': lambda column, value: column >= value,
+    '<': lambda column, value: column < value,
+    '<=': lambda column, value: column <= value,
+}
+
+
+def _parse_number(field, text):
+    try:
+        value = float(text)
+    except ValueError:
+        raise InvalidScreen(f'字段 {field} 的值必须为数字: {text}')
+    # nan 与任何值比较都为假，会静默返回空结果
+    if not math.isfinite(value):
+        raise InvalidScreen(f'字段 {field} 的值必须为有限数字: {text}')
+    return value
+
+
+def parse_filter(expression):
+    """解析筛选表达式，返回 SQLAlchemy 条件列表"""
+    conditions = []
+    for clause in (expression or '').split(';'):
+        if not clause.strip():
+            continue
+        match = _CLAUSE_RE.match(clause)
+        if match is None:
+            raise InvalidScreen(f'无法解析的筛选条件: {clause.strip()}')
+        field, operator, raw_value = match.groups()
+        if field not in SCREEN_FIELDS:
+            raise InvalidScreen(f'不支持的筛选字段: {field}')
+        column, numeric = SCREEN_FIELDS[field]
+
+        if operator in ('=', '!='):
+            values = [value.strip() for value in raw_value.split('|') if value.strip()]
+            if not values:
+                raise InvalidScreen(f'筛选条件缺少取值: {clause.strip()}')
+            if numeric:
+                values = [_parse_number(field, value) for value in values]
+            condition = column.in_(values) if len(values) > 1 else column == values[0]
+            conditions.append(condition if operator == '=' else ~condition)
+        elif numeric:
+            conditions.append(_NUMERIC_OPERATORS[operator](column, _parse_number(field, raw_value)))
+        else:
+            raise InvalidScreen(f'字段 {field} 只支持 = 和 != 运算')
+    return conditions
+
+
+def parse_sort(expression):
+    """解析排序表达式，返回排序子句列表；始终以 fund_code 收尾保证顺序稳定"""
+    clauses = []
+    seen = set()
+    for item in (expression or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        descending = item.startswith('-')
+        field = item.lstrip('+-')
+        if field not in SORT_FIELDS:
+            raise InvalidScreen(f'不支持的排序字段: {field}')
+        if field in seen:
+            continue
+        seen.add(field)
+        column = SORT_FIELDS[field]
+        # 缺少该项数据的基金无论升降序都排在最后（各数据库的默认空值位置不同，显式指定）
+        clauses.append(column.desc().nullslast() if descending else column.asc().nullslast())
+    if 'fund_code' not in seen:
+        clauses.append(Fund.fund_code.asc())
+    return clauses
@@ -0,0 +1,211 @@
+"""
+基金全文检索
+
+在 SQLite 上维护一张 FTS5 影子表 funds_fts，随 funds 表的增删改同步更新，
+搜索时走倒排索引并按 bm25 相关度排序，替代 LIKE '%q%' 的全表扫描。
+中文按单字切分、数字和字母分别按连续片段切分，查询时以短语匹配实现子串语义。数字和字母片段的
+全部后缀另存一列（如 110011 存为 110011 10011 0011 011 11 1），单个片段的查询在该列上按前缀匹配，
+即可命中片段中间的子串（如 "0011"、沪深300ETF 中的 "00"）；以数字或字母开头的多词查询退回 contains。
+非 SQLite 数据库或 SQLite 未编译 FTS5 时自动退回到 contains 过滤。
+"""
+import re
+import weakref
+
+from sqlalchemy import event, inspect, text, Float, String
+
+from app import db
+from app.models.fund import Fund
+
+FUND_FTS_TABLE = 'funds_fts'
+
+FUND_FTS_COLUMNS = ('fund_id', 'fund_code', 'fund_name', 'fund_suffixes')
+
+# bm25 列权重：基金代码命中优先于名称命中
+FUND_FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+_TOKEN_RE = re.compile(r'[0-9]+|[A-Za-z]+|\w')
+_ALNUM_RE = re.compile(r'[0-9]+|[A-Za-z]+')
+
+# 记录每个数据库引擎上索引是否可用，避免每次请求都探测 sqlite_master
+_index_state = weakref.WeakKeyDictionary()
+
+
+def segment(value):
+    """将文本切分为以空格分隔的索引词：中文逐字，数字和字母分别按连续片段"""
+    if not value:
+        return ''
+    return ' '.join(token.lower() for token in _TOKEN_RE.findall(value))
+
+
+def suffixes(*values):
+    """基金代码和名称中每个数字、字母片段的全部后缀，以空格分隔"""
+    runs = [run.lower() for value in values if value for run in _ALNUM_RE.findall(value)]
+    return ' '.join(run[i:] for run in runs for i in range(len(run)))
+
+
+def build_match_expression(q):
+    """
+    将用户输入转换为 FTS5 MATCH 表达式，末尾词按前缀匹配
+
+    单个数字或字母片段在后缀列上匹配；无有效词，或多词查询以数字、字母片段开头（首词可能从片段中间
+    开始，短语无法表达）时返回 None，由调用方退回 contains。
+    """
+    tokens = segment(q).split()
+    if not tokens:
+        return None
+    if _ALNUM_RE.fullmatch(tokens[0]):
+        if len(tokens) > 1:
+            return None
+        return f'fund_suffixes : "{tokens[0]}"*'
+    phrase = ' '.join(tokens).replace('"', '""')
+    return f'{{fund_code fund_name}} : "{phrase}"*'
+
+
+def _create_index(connection):
+    connection.execute(text(
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS {FUND_FTS_TABLE} USING fts5('
+        f'fund_id UNINDEXED, fund_code, fund_name, fund_suffixes, tokenize="unicode61")'
+    ))
+
+
+def _index_values(fund_id, fund_code, fund_name):
+    return {
+        'fund_id': fund_id,
+        'fund_code': segment(fund_code),
+        'fund_name': segment(fund_name),
+        'fund_suffixes': suffixes(fund_code, fund_name)
+    }
+
+
+_INSERT_SQL = (
+    f'INSERT INTO {FUND_FTS_TABLE} (fund_id, fund_code, fund_name, fund_suffixes) '
+    f'VALUES (:fund_id, :fund_code, :fund_name, :fund_suffixes)'
+)
+
+
+def _index_columns(connection):
+    """索引表的列，表不存在时返回 None"""
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {'name': FUND_FTS_TABLE}
+    ).first()
+    if not exists:
+        return None
+    return tuple(row[1] for row in connection.execute(text(f'PRAGMA table_info({FUND_FTS_TABLE})')))
+
+
+def _index_row(connection, fund_id, fund_code, fund_name):
+    connection.execute(
+        text(f'DELETE FROM {FUND_FTS_TABLE} WHERE fund_id = :fund_id'),
+        {'fund_id': fund_id}
+    )
+    connection.execute(text(_INSERT_SQL), _index_values(fund_id, fund_code, fund_name))
+
+
+def rebuild_fund_search_index(connection):
+    """根据 funds 表全量重建检索索引（旧版本的索引表先删除后按当前列重建）"""
+    columns = _index_columns(connection)
+    if columns is not None and columns != FUND_FTS_COLUMNS:
+        connection.execute(text(f'DROP TABLE {FUND_FTS_TABLE}'))
+    _create_index(connection)
+    connection.execute(text(f'DELETE FROM {FUND_FTS_TABLE}'))
+    rows = connection.execute(text('SELECT id, fund_code, fund_name FROM funds')).fetchall()
+    if rows:
+        connection.execute(
+            text(_INSERT_SQL),
+            [_index_values(row.id, row.fund_code, row.fund_name) for row in rows]
+        )
+
+
+def _is_sqlite(connection):
+    return connection.dialect.name == 'sqlite'
+
+
+def _index_enabled(connection):
+    engine = connection.engine
+    if engine not in _index_state:
+        # 进程内尚未探测过：索引表不存在或为旧版本时交给 ensure_fund_search_index 首次使用时全量补建
+        if _index_columns(connection) != FUND_FTS_COLUMNS:
+            return False
+        _index_state[engine] = True
+    return _index_state[engine]
+
+
+def ensure_fund_search_index():
+    """确保当前数据库上的检索索引存在（已有数据库首次使用时补建），返回索引是否可用"""
+    engine = db.engine
+    if engine in _index_state:
+        return _index_state[engine]
+
+    available = False
+    if engine.dialect.name == 'sqlite':
+        try:
+            with engine.begin() as connection:
+                if _index_columns(connection) != FUND_FTS_COLUMNS:
+                    rebuild_fund_search_index(connection)
+            available = True
+        except Exception:
+            # SQLite 未编译 FTS5 或 funds 表尚未创建
+            available = False
+
+    _index_state[engine] = available
+    return available
+
+
+def apply_fund_search(query, q, ranked=True):
+    """在基金查询上应用关键词检索；ranked 为 True 时按相关度排序"""
+    match = build_match_expression(q)
+    if match is None or not ensure_fund_search_index():
+        return query.filter(Fund.fund_name.contains(q) | Fund.fund_code.contains(q))
+
+    weights = ', '.join(str(weight) for weight in FUND_FTS_WEIGHTS)
+    hits = text(
+        f'SELECT fund_id, bm25({FUND_FTS_TABLE}, 0.0, {weights}) AS score '
+        f'FROM {FUND_FTS_TABLE} WHERE {FUND_FTS_TABLE} MATCH :match'
+    ).bindparams(match=match).columns(fund_id=String, score=Float).subquery('fund_hits')
+
+    query = query.join(hits, Fund.id == hits.c.fund_id)
+    if ranked:
+        query = query.order_by(hits.c.score, Fund.fund_code)
+    return query
+
+
+@event.listens_for(Fund.__table__, 'after_create')
+def _create_index_with_table(target, connection, **kw):
+    if not _is_sqlite(connection):
+        return
+    try:
+        _create_index(connection)
+        _index_state[connection.engine] = True
+    except Exception:
+        _index_state[connection.engine] = False
+
+
+@event.listens_for(Fund.__table__, 'before_drop')
+def _drop_index_with_table(target, connection, **kw):
+    if _is_sqlite(connection):
+        connection.execute(text(f'DROP TABLE IF EXISTS {FUND_FTS_TABLE}'))
+        _index_state.pop(connection.engine, None)
+
+
+@event.listens_for(Fund, 'after_insert')
+def _add_fund(mapper, connection, target):
+    if _is_sqlite(connection) and _index_enabled(connection):
+        _index_row(connection, target.id, target.fund_code, target.fund_name)
+
+
+@event.listens_for(Fund, 'after_update')
+def _update_fund(mapper, connection, target):
+    state = inspect(target)
+    changed = state.attrs.fund_code.history.has_changes() or state.attrs.fund_name.history.has_changes()
+    if changed and _is_sqlite(connection) and _index_enabled(connection):
+        _index_row(connection, target.id, target.fund_code, target.fund_name)
+
+
+@event.listens_for(Fund, 'after_delete')
+def _remove_fund(mapper, connection, target):
+    if _is_sqlite(connection) and _index_enabled(connection):
+        connection.execute(
+            text(f'DELETE FROM {FUND_FTS_TABLE} WHERE fund_id = :fund_id'),
+            {'fund_id': target.id}
+        )
@@ -0,0 +1,205 @@
+"""
+板块趋势预测
+
+每日收盘后批量计算：读取所有板块成分基金近期的净值，按 成分矩阵 x 日收益矩阵 一次求出全部板块的
+等权日收益序列，再在每个板块的序列上计算两个信号：
+
+- 动量：最近 SECTOR_MOMENTUM_DAYS 个交易日日收益的 t 统计量（均值 / 标准差 x 根号天数），持续上涨为正；
+- 均值回归：板块累计点位（对数）偏离最近 SECTOR_REVERSION_DAYS 日均线的标准差倍数，涨得过多为正。
+
+综合得分 = 0.6 x tanh(动量 / 2) - 0.4 x tanh(偏离 / 2)，取值 -1 到 1，超过 ±0.15 判为上涨/下跌，
+否则为震荡。结果按板块写入 sector_predictions，板块预测接口只按主键读取。
+"""
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+from flask import current_app
+
+from app import db
+from app.models.fund import FundNavHistory
+from app.models.market import Sector, FundSector, SectorTrendPrediction
+from app.utils.correlation import build_return_matrix
+from app.utils.returns import build_panel
+
+MOMENTUM_WEIGHT = 0.6
+REVERSION_WEIGHT = 0.4
+# 综合得分绝对值低于该值时判为震荡
+TREND_THRESHOLD = 0.15
+
+_TREND_NAMES = {'up': '偏强', 'down': '偏弱', 'flat': '震荡'}
+
+
+def sector_return_matrix(sector_count, memberships, returns):
+    """
+    计算板块等权日收益矩阵
+
+    memberships 为 (板块下标, 基金下标)，returns 为 基金数 x 交易日数 的日收益矩阵（NaN 表示缺失）。
+    返回 板块数 x 交易日数 的矩阵，当日没有任何成分基金收益时为 NaN。
+    """
+    weights = np.zeros((sector_count, returns.shape[0]))
+    for sector_index, fund_index in memberships:
+        weights[sector_index, fund_index] = 1.0
+    mask = ~np.isnan(returns)
+    sums = weights @ np.where(mask, returns, 0.0)
+    counts = weights @ mask.astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def trend_signals(sector_returns, momentum_days, reversion_days):
+    """
+    在每个板块的日收益序列上计算信号
+
+    只使用各板块自身有收益的交易日（按时间顺序）。返回 {字段: ndarray}，包括 observations、
+    momentum（t 统计量）、momentum_return（近 momentum_days 日累计收益）、reversion（偏离均线的标准差倍数）
+    和 score（综合得分）；交易日数不足 reversion_days + 1 的板块各信号为 NaN。
+    """
+    sector_count = sector_returns.shape[0]
+    result = {key: np.full(sector_count, np.nan) for key in ('momentum', 'momentum_return', 'reversion', 'score')}
+    result['observations'] = np.zeros(sector_count, dtype=np.int64)
+    window = max(momentum_days, reversion_days)
+
+    # 每个板块取最近 window 个有效日收益，右对齐排成 板块数 x window 的矩阵
+    recent = np.full((sector_count, window), np.nan)
+    for i in range(sector_count):
+        series = sector_returns[i][~np.isnan(sector_returns[i])]
+        result['observations'][i] = len(series)
+        tail = series[-window:]
+        recent[i, window - len(tail):] = tail
+    valid = result['observations'] >= reversion_days + 1
+    if not valid.any():
+        return result
+
+    recent = recent[valid]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        momentum_window = recent[:, -momentum_days:]
+        mean = momentum_window.mean(axis=1)
+        std = momentum_window.std(axis=1, ddof=1)
+        momentum = np.where(std > 0, mean / std * math.sqrt(momentum_days), 0.0)
+        momentum_return = np.expm1(np.log1p(momentum_window).sum(axis=1))
+
+        levels = np.cumsum(np.log1p(recent[:, -reversion_days:]), axis=1)
+        deviation = levels.std(axis=1, ddof=1)
+        reversion = np.where(deviation > 0, (levels[:, -1] - levels.mean(axis=1)) / deviation, 0.0)
+
+    result['momentum'][valid] = momentum
+    result['momentum_return'][valid] = momentum_return
+    result['reversion'][valid] = reversion
+    result['score'][valid] = MOMENTUM_WEIGHT * np.tanh(momentum / 2) - REVERSION_WEIGHT * np.tanh(reversion / 2)
+    return result
+
+
+def classify(score):
+    """由综合得分得到 (趋势, 可信度)；可信度 50-95，震荡时为50"""
+    if score >= TREND_THRESHOLD:
+        trend = 'up'
+    elif score <= -TREND_THRESHOLD:
+        trend = 'down'
+    else:
+        return 'flat', 50
+    return trend, int(round(50 + 45 * min(abs(score), 1.0)))
+
+
+def describe_prediction(sector_name, trend, momentum, momentum_return, reversion, momentum_days, reversion_days):
+    """生成预测依据文字"""
+    direction = '上涨' if momentum_return >= 0 else '下跌'
+    position = '高于' if reversion >= 0 else '低于'
+    momentum_part = MOMENTUM_WEIGHT * math.tanh(momentum / 2)
+    reversion_part = -REVERSION_WEIGHT * math.tanh(reversion / 2)
+    if trend == 'flat':
+        conclusion = '动量与均值回归信号相互抵消'
+    elif abs(momentum_part) >= abs(reversion_part):
+        conclusion = '动量信号占优'
+    else:
+        conclusion = '均值回归信号占优'
+    return (
+        f'近{momentum_days}个交易日{sector_name}等权累计{direction}{abs(momentum_return) * 100:.2f}%'
+        f'（动量t值{momentum:.2f}），当前点位{position}{reversion_days}日均线{abs(reversion):.2f}个标准差，'
+        f'{conclusion}，预计短期{_TREND_NAMES[trend]}'
+    )
+
+
+def calculate_sector_predictions(as_of=None):
+    """从 fund_nav_history 读取板块成分基金的近期净值，返回全部板块的待写入预测行"""
+    config = current_app.config
+    momentum_days = config['SECTOR_MOMENTUM_DAYS']
+    reversion_days = config['SECTOR_REVERSION_DAYS']
+    if as_of is None:
+        as_of = db.session.query(db.func.max(FundNavHistory.nav_date)).scalar()
+        if as_of is None:
+            return []
+    since = as_of - timedelta(days=config['SECTOR_PREDICTION_WINDOW_DAYS'])
+
+    sectors = db.session.query(Sector.sector_code, Sector.sector_name).order_by(Sector.sector_code).all()
+    if not sectors:
+        return []
+    rows = db.session.execute(
+        db.select(FundNavHistory.fund_code, FundNavHistory.nav_date, FundNavHistory.net_value)
+        .where(
+            FundNavHistory.fund_code.in_(db.select(FundSector.fund_code).distinct()),
+            FundNavHistory.nav_date >= since, FundNavHistory.nav_date <= as_of
+        )
+        .order_by(FundNavHistory.fund_code, FundNavHistory.nav_date)
+    ).all()
+    fund_codes, offsets, dates = build_panel(rows)
+    if not fund_codes:
+        return []
+    values = np.fromiter((float(row[2]) for row in rows), dtype=np.float64, count=len(rows))
+    returns, _ = build_return_matrix(len(fund_codes), offsets, dates, values)
+
+    sector_index = {code: i for i, (code, _) in enumerate(sectors)}
+    fund_index = {code: i for i, code in enumerate(fund_codes)}
+    memberships = [
+        (sector_index[sector_code], fund_index[fund_code])
+        for sector_code, fund_code in db.session.query(FundSector.sector_code, FundSector.fund_code)
+        if sector_code in sector_index and fund_code in fund_index
+    ]
+    signals = trend_signals(sector_return_matrix(len(sectors), memberships, returns), momentum_days, reversion_days)
+
+    now = datetime.utcnow()
+    result = []
+    for i, (sector_code, sector_name) in enumerate(sectors):
+        score = signals['score'][i]
+        if not np.isfinite(score):
+            continue
+        momentum = float(signals['momentum'][i])
+        reversion = float(signals['reversion'][i])
+        trend, confidence = classify(float(score))
+        result.append({
+            'sector_code': sector_code,
+            'as_of_date': as_of,
+            'prediction_trend': trend,
+            'confidence_score': confidence,
+            'prediction_basis': describe_prediction(
+                sector_name, trend, momentum, float(signals['momentum_return'][i]), reversion,
+                momentum_days, reversion_days
+            ),
+            'momentum_score': round(momentum, 4),
+            'reversion_score': round(reversion, 4),
+            'observations': int(signals['observations'][i]),
+            'computed_at': now
+        })
+    return result
+
+
+def store_sector_predictions(rows):
+    """全量替换 sector_predictions（单个事务内先删后插）"""
+    table = SectorTrendPrediction.__table__
+    connection = db.session.connection()
+    connection.execute(table.delete())
+    if rows:
+        connection.execute(table.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def refresh_sector_predictions(as_of=None):
+    return store_sector_predictions(calculate_sector_predictions(as_of))
+
+
+def get_sector_prediction(sector_code):
+    """按主键读取板块预测，返回 (板块名称, SectorTrendPrediction 或 None)；板块不存在时返回 None"""
+    return db.session.query(Sector.sector_name, SectorTrendPrediction).outerjoin(
+        SectorTrendPrediction, SectorTrendPrediction.sector_code == Sector.sector_code
+    ).filter(Sector.sector_code == sector_code).first()
@@ -0,0 +1,290 @@
+"""
+板块行情聚合
+
+板块涨跌幅为成分基金最新行情对应区间涨跌幅的等权平均。内存中为每个板块保存各区间涨跌幅的
+累加和与计数，以及日涨跌家数；一只基金的行情变化时先减去旧贡献、再加上新贡献，只影响它所属的
+几个板块，读取时直接由累加和求平均，不再逐板块扫描成分基金。涨跌幅为 Decimal，累加和没有浮点误差。
+
+同步方式与市场排行榜相同：本进程提交的行情变更在提交后标记为待刷新，其他进程写入的行情每隔
+SECTOR_REFRESH_SECONDS 按 update_time 水位线查出一次，板块定义或成分变化、data_versions 中的行情版本
+变化（原地改写、保留 update_time 的行情水位线读不到）时全量重建，另外每隔 SECTOR_RELOAD_SECONDS
+全量重建兜底。
+"""
+import threading
+import time
+from decimal import Decimal
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.fund import FundMarketData, FundLatestQuote
+from app.models.market import Sector, FundSector
+from app.utils.quotes import QUOTES_VERSION, data_version
+from app.utils.watermark import Watermark
+
+EXTENSION_KEY = 'sector_aggregator'
+_PENDING_KEY = 'sector_aggregator_changes'
+
+# 聚合的区间 -> 最新行情列
+SECTOR_PERIODS = {
+    'daily': 'daily_change_rate',
+    'weekly': 'weekly_change_rate',
+    'monthly': 'monthly_change_rate',
+    'yearly': 'yearly_change_rate',
+}
+
+_QUOTE_COLUMNS = [getattr(FundLatestQuote, column) for column in SECTOR_PERIODS.values()]
+
+_CENT = Decimal('0.01')
+
+
+def hot_score(daily_average, advancers, decliners):
+    """
+    板块热门度（0-100）
+
+    以50为中性，日均涨跌幅每1%加减5分，上涨家数与下跌家数之差的占比（-1 到 1）最多加减30分。
+    """
+    if daily_average is None:
+        return 0
+    total = advancers + decliners
+    breadth = (advancers - decliners) / total if total else 0.0
+    score = 50 + 5 * float(daily_average) + 30 * breadth
+    return int(round(min(max(score, 0), 100)))
+
+
+class _SectorState:
+    __slots__ = ('sector_code', 'sector_name', 'fund_count', 'sums', 'counts', 'advancers', 'decliners', 'update_time')
+
+    def __init__(self, sector_code, sector_name):
+        self.sector_code = sector_code
+        self.sector_name = sector_name
+        self.fund_count = 0
+        self.sums = [Decimal(0)] * len(SECTOR_PERIODS)
+        self.counts = [0] * len(SECTOR_PERIODS)
+        self.advancers = 0
+        self.decliners = 0
+        self.update_time = None
+
+    def add(self, rates, update_time, sign):
+        """累加（sign=1）或扣除（sign=-1）一只基金的贡献"""
+        for i, rate in enumerate(rates):
+            if rate is not None:
+                self.sums[i] += rate if sign > 0 else -rate
+                self.counts[i] += sign
+        daily = rates[0]
+        if daily is not None and daily > 0:
+            self.advancers += sign
+        elif daily is not None and daily < 0:
+            self.decliners += sign
+        if sign > 0 and update_time is not None and (self.update_time is None or update_time > self.update_time):
+            self.update_time = update_time
+
+    def averages(self):
+        return [
+            (total / count).quantize(_CENT) if count else None
+            for total, count in zip(self.sums, self.counts)
+        ]
+
+
+class SectorAggregator:
+    """板块累加和，写操作加锁"""
+
+    def __init__(self, reload_seconds=300, refresh_seconds=5):
+        self.reload_seconds = reload_seconds
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._sectors = {}  # sector_code -> _SectorState
+        self._members = {}  # fund_code -> (sector_code, ...)
+        self._contributions = {}  # fund_code -> (各区间涨跌幅, update_time)
+        self._stale = set()
+        self._reload = False
+        self.quote_watermark = Watermark()
+        self.quote_version = None
+        self.loaded_at = None
+        self.checked_at = None
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+    def load(self, sectors, memberships, quotes, quote_version=None):
+        """
+        全量构建
+
+        sectors 为 (sector_code, sector_name)，memberships 为 (sector_code, fund_code)，
+        quotes 为 (fund_code, update_time, daily, weekly, monthly, yearly)，quote_version 为读取前的行情版本。
+        """
+        states = {code: _SectorState(code, name) for code, name in sectors}
+        members = {}
+        for sector_code, fund_code in memberships:
+            if sector_code in states:
+                members.setdefault(fund_code, []).append(sector_code)
+                states[sector_code].fund_count += 1
+        members = {fund_code: tuple(codes) for fund_code, codes in members.items()}
+
+        contributions = {}
+        watermark = None
+        for fund_code, update_time, *rates in quotes:
+            if update_time is not None and (watermark is None or update_time > watermark):
+                watermark = update_time
+            if fund_code not in members:
+                continue
+            contributions[fund_code] = (rates, update_time)
+            for sector_code in members[fund_code]:
+                states[sector_code].add(rates, update_time, 1)
+
+        with self._lock:
+            self._sectors = states
+            self._members = members
+            self._contributions = contributions
+            self._stale = set()
+            self._reload = False
+            # 水位线时间上的行情在下次检查时会再读到一次，重复刷新不影响结果
+            self.quote_watermark = Watermark(watermark)
+            self.quote_version = quote_version
+            self.loaded_at = self.checked_at = time.monotonic()
+
+    def apply(self, fund_codes, quotes):
+        """增量更新：fund_codes 为需要刷新的基金，quotes 为其中仍有行情的基金的最新数据（格式同 load）"""
+        latest = {quote[0]: (list(quote[2:]), quote[1]) for quote in quotes}
+        with self._lock:
+            for fund_code in fund_codes:
+                current = latest.get(fund_code)
+                sector_codes = self._members.get(fund_code)
+                if not sector_codes:
+                    continue
+                previous = self._contributions.pop(fund_code, None)
+                for sector_code in sector_codes:
+                    state = self._sectors[sector_code]
+                    if previous is not None:
+                        state.add(previous[0], previous[1], -1)
+                    if current is not None:
+                        state.add(current[0], current[1], 1)
+                if current is not None:
+                    self._contributions[fund_code] = current
+
+    def mark_stale(self, fund_codes=(), reload=False):
+        with self._lock:
+            self._stale.update(fund_codes)
+            self._reload = self._reload or reload
+
+    def take_stale(self):
+        with self._lock:
+            stale, self._stale = self._stale, set()
+        return stale
+
+    def needs_reload(self):
+        return self._reload or not self.loaded or time.monotonic() - self.loaded_at >= self.reload_seconds
+
+    def needs_check(self):
+        return self.checked_at is None or time.monotonic() - self.checked_at >= self.refresh_seconds
+
+    def sectors(self):
+        """所有板块的当前行情，按热门度从高到低排列"""
+        with self._lock:
+            states = list(self._sectors.values())
+            rows = [(state, state.averages(), state.advancers, state.decliners) for state in states]
+
+        items = []
+        for state, averages, advancers, decliners in rows:
+            item = {
+                'sector_code': state.sector_code,
+                'sector_name': state.sector_name,
+                'fund_count': state.fund_count,
+                'advancers': advancers,
+                'decliners': decliners,
+                'hot_score': hot_score(averages[0], advancers, decliners),
+                'update_time': state.update_time
+            }
+            for period, average in zip(SECTOR_PERIODS, averages):
+                item[f'{period}_change_rate'] = str(average) if average is not None else None
+            items.append(item)
+        items.sort(key=lambda item: (-item['hot_score'], item['sector_code']))
+        return items
+
+
+def _query_quotes(fund_codes=None):
+    query = db.session.query(FundLatestQuote.fund_code, FundLatestQuote.update_time, *_QUOTE_COLUMNS)
+    if fund_codes is not None:
+        query = query.filter(FundLatestQuote.fund_code.in_(list(fund_codes)))
+    return query.all()
+
+
+def _sync(aggregator):
+    """
+    从数据库同步：到期、板块定义或行情版本变化时全量重建，否则只刷新待刷新的基金，
+    到达检查间隔时再加上水位线之后更新的基金
+    """
+    check = not aggregator.needs_reload() and aggregator.needs_check()
+    quote_version = None
+    if check:
+        aggregator.checked_at = time.monotonic()
+        quote_version = db.session.query(data_version(QUOTES_VERSION)).scalar()
+    if aggregator.needs_reload() or (check and quote_version != aggregator.quote_version):
+        # 先读版本再读数据：读取期间的写入会在下次检查时再触发重建
+        if quote_version is None:
+            quote_version = db.session.query(data_version(QUOTES_VERSION)).scalar()
+        sectors = db.session.query(Sector.sector_code, Sector.sector_name).all()
+        memberships = db.session.query(FundSector.sector_code, FundSector.fund_code).all()
+        aggregator.load(sectors, memberships, _query_quotes(), quote_version)
+        return
+
+    fund_codes = aggregator.take_stale()
+    if check:
+        quotes = db.session.query(
+            FundLatestQuote.fund_code, FundLatestQuote.market_data_id, FundLatestQuote.update_time
+        ).filter(aggregator.quote_watermark.condition(FundLatestQuote.update_time))
+        fund_codes.update(code for code, _ in aggregator.quote_watermark.advance(
+            ((fund_code, market_data_id), update_time) for fund_code, market_data_id, update_time in quotes
+        ))
+    if fund_codes:
+        aggregator.apply(fund_codes, _query_quotes(fund_codes))
+
+
+def get_sector_aggregator():
+    """获取当前应用的板块聚合，读取前与数据库做增量同步"""
+    aggregator = current_app.extensions.get(EXTENSION_KEY)
+    if aggregator is None:
+        aggregator = current_app.extensions.setdefault(
+            EXTENSION_KEY, SectorAggregator(
+                current_app.config.get('SECTOR_RELOAD_SECONDS', 300), current_app.config.get('SECTOR_REFRESH_SECONDS', 5)
+            )
+        )
+    _sync(aggregator)
+    return aggregator
+
+
+def notify_sector_quotes_written(fund_codes):
+    """通知板块聚合有行情写入（供批量导入等绕过ORM的写入路径在提交后调用）"""
+    if not has_app_context():
+        return
+    aggregator = current_app.extensions.get(EXTENSION_KEY)
+    if aggregator is not None:
+        aggregator.mark_stale(fund_codes)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_sector_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, {'fund_codes': set(), 'reload': False})
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, FundMarketData):
+            pending['fund_codes'].add(obj.fund_code)
+        elif isinstance(obj, (Sector, FundSector)):
+            pending['reload'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_sector_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    aggregator = current_app.extensions.get(EXTENSION_KEY)
+    if aggregator is not None:
+        aggregator.mark_stale(pending['fund_codes'], pending['reload'])
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_sector_changes(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,199 @@
+"""
+基金输入联想
+
+在内存中维护一个按键排序的数组索引，键包括基金代码、基金名称、名称全拼和拼音首字母。
+前缀查询通过二分定位到连续区间后顺序取前 N 条，单次查询为 O(log n + N)，不访问数据库。
+索引在首次使用时从 funds 表构建，之后随会话提交的基金增删改增量更新（按键二分插入、删除，
+单只基金为 O(log n)）；其他进程写入的基金每隔 FUND_SUGGEST_REFRESH_SECONDS 对比一次数据库版本
+（基金数和最大更新时间），变化后全量重建。
+"""
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from flask import current_app, has_app_context
+from pypinyin import lazy_pinyin
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models.fund import Fund
+
+EXTENSION_KEY = 'fund_suggest'
+_PENDING_KEY = 'fund_suggest_changes'
+
+_CHUNK_RE = re.compile(r'[\u4e00-\u9fff]+|[^\u4e00-\u9fff]+')
+
+
+def normalize(value):
+    return ''.join((value or '').split()).lower()
+
+
+def pinyin_keys(fund_name):
+    """返回名称的全拼和拼音首字母，非中文片段原样保留"""
+    full = []
+    initials = []
+    for chunk in _CHUNK_RE.findall(fund_name or ''):
+        if '\u4e00' <= chunk[0] <= '\u9fff':
+            syllables = lazy_pinyin(chunk)
+            full.extend(syllables)
+            initials.extend(syllable[0] for syllable in syllables if syllable)
+        else:
+            full.append(chunk)
+            initials.append(chunk)
+    return ''.join(full), ''.join(initials)
+
+
+def suggestion_keys(fund_code, fund_name):
+    """生成一只基金的全部联想键，返回 [(key, match_type)]"""
+    name = normalize(fund_name)
+    keys = [(normalize(fund_code), 'code')]
+    if name:
+        full, initials = pinyin_keys(fund_name)
+        keys.append((name, 'name'))
+        keys.append((normalize(full), 'pinyin'))
+        keys.append((normalize(initials), 'initials'))
+    seen = set()
+    result = []
+    for key, match_type in keys:
+        if key and key not in seen:
+            seen.add(key)
+            result.append((key, match_type))
+    return result
+
+
+class FundSuggestIndex:
+    """基金联想索引：排序数组，写操作按键二分插入、删除，读写在锁内进行"""
+
+    def __init__(self, refresh_seconds=60):
+        self.refresh_seconds = refresh_seconds
+        self._entries = []  # [(key, fund_code, match_type)]，按 key 排序
+        self._names = {}  # fund_code -> fund_name
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.version = None
+        self.checked_at = None
+
+    def load(self, funds, version=None):
+        """全量构建，funds 为 (fund_code, fund_name) 序列"""
+        entries = []
+        names = {}
+        for fund_code, fund_name in funds:
+            names[fund_code] = fund_name
+            for key, match_type in suggestion_keys(fund_code, fund_name):
+                entries.append((key, fund_code, match_type))
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._names = names
+            self.loaded = True
+            self.version = version
+            self.checked_at = time.monotonic()
+
+    def _discard(self, fund_code):
+        if fund_code not in self._names:
+            return
+        fund_name = self._names.pop(fund_code)
+        for key, match_type in suggestion_keys(fund_code, fund_name):
+            entry = (key, fund_code, match_type)
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+
+    def apply(self, removed, added):
+        """增量更新：removed 为待移除的基金代码，added 为 (fund_code, fund_name)"""
+        if not removed and not added:
+            return
+        with self._lock:
+            for fund_code in set(removed) | {fund_code for fund_code, _ in added}:
+                self._discard(fund_code)
+            for fund_code, fund_name in added:
+                self._names[fund_code] = fund_name
+                for key, match_type in suggestion_keys(fund_code, fund_name):
+                    insort(self._entries, (key, fund_code, match_type))
+
+    def needs_check(self):
+        return not self.loaded or time.monotonic() - self.checked_at >= self.refresh_seconds
+
+    def suggest(self, prefix, limit=10):
+        """按前缀返回最多 limit 只基金，同一基金只出现一次"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        result = []
+        seen = set()
+        with self._lock:
+            entries = self._entries
+            position = bisect_left(entries, (prefix,))
+            while position < len(entries) and len(result) < limit:
+                key, fund_code, match_type = entries[position]
+                if not key.startswith(prefix):
+                    break
+                if fund_code not in seen:
+                    seen.add(fund_code)
+                    result.append({
+                        'fund_code': fund_code,
+                        'fund_name': self._names.get(fund_code),
+                        'match_type': match_type
+                    })
+                position += 1
+        return result
+
+
+def _version_query():
+    """基金表版本：基金数和最大更新时间"""
+    return tuple(db.session.query(db.func.count(Fund.id), db.func.max(Fund.updated_at)).one())
+
+
+def get_suggest_index():
+    """获取当前应用的联想索引，首次调用或数据库版本变化时从数据库构建"""
+    index = current_app.extensions.get(EXTENSION_KEY)
+    if index is None:
+        index = current_app.extensions.setdefault(
+            EXTENSION_KEY, FundSuggestIndex(current_app.config.get('FUND_SUGGEST_REFRESH_SECONDS', 60))
+        )
+    if index.needs_check():
+        version = _version_query()
+        if not index.loaded or version != index.version:
+            index.load(db.session.query(Fund.fund_code, Fund.fund_name).all(), version)
+        else:
+            index.checked_at = time.monotonic()
+    return index
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_fund_changes(session, flush_context):
+    pending = session.info.setdefault(_PENDING_KEY, {'removed': set(), 'added': {}})
+    for obj in session.new:
+        if isinstance(obj, Fund):
+            pending['added'][obj.fund_code] = obj.fund_name
+    for obj in session.dirty:
+        if isinstance(obj, Fund):
+            state = inspect(obj)
+            code_history = state.attrs.fund_code.history
+            if not code_history.has_changes() and not state.attrs.fund_name.history.has_changes():
+                continue
+            for old_code in code_history.deleted or ():
+                pending['removed'].add(old_code)
+                pending['added'].pop(old_code, None)
+            pending['added'][obj.fund_code] = obj.fund_name
+    for obj in session.deleted:
+        if isinstance(obj, Fund):
+            pending['removed'].add(obj.fund_code)
+            pending['added'].pop(obj.fund_code, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_fund_changes(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    index = current_app.extensions.get(EXTENSION_KEY)
+    if index is not None and index.loaded:
+        index.apply(pending['removed'], list(pending['added'].items()))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_fund_changes(session):
+    session.info.pop(_PENDING_KEY, None)
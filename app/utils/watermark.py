@@ -0,0 +1,35 @@
+"""
+增量同步水位线
+
+进程内的行情视图（排行榜、板块聚合、行情推送）按时间列读取其他进程写入的变更。只读取 "时间 > 水位线"
+会漏掉与水位线同一时间、但在上次读取之后才提交的记录，因此读取 "时间 >= 水位线"，同时记住水位线时间上
+已处理过的记录键，再次读到时跳过。
+"""
+
+
+class Watermark:
+    """时间水位线，以及水位线时间上已处理过的记录键"""
+
+    __slots__ = ('time', 'seen')
+
+    def __init__(self, time=None, seen=()):
+        self.time = time
+        self.seen = set(seen)
+
+    def condition(self, column):
+        """读取变更的条件：时间列不早于水位线；尚无水位线时读取所有带时间的记录"""
+        return column.isnot(None) if self.time is None else column >= self.time
+
+    def advance(self, rows):
+        """rows 为 (记录键, 时间)，返回未处理过的记录键并前移水位线"""
+        fresh = [
+            (key, changed_at) for key, changed_at in rows
+            if changed_at is not None and (changed_at != self.time or key not in self.seen)
+        ]
+        if fresh:
+            latest = max(changed_at for _, changed_at in fresh)
+            if latest != self.time:
+                self.time = latest
+                self.seen = set()
+            self.seen.update(key for key, changed_at in fresh if changed_at == latest)
+        return [key for key, _ in fresh]
@@ -13,7 +13,12 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
 from app.models.user import User, UserProfile, UserSetting
-from app.models.fund import Fund, FundMarketData, FundGroup, FavoriteFundRelation
+from app.models.fund import (
+    Fund, FundMarketData, FundLatestQuote, FundNavHistory, FundRiskMetrics, FundPeerRank, FundCorrelation,
+    FundPortfolioHolding, FundGroup, FavoriteFundRelation
+)
+from app.models.market import Sector, FundSector, SectorTrendPrediction, MarketIndex, MarketIndexTick, SecurityQuote
+from app.models.news import News, NewsTag, UserNewsRead
 from app.models.transaction import Holding, Transaction
 from app.models.notification import Notification
 from app import db
@@ -28,11 +33,26 @@ def clear_database():
         
         # 按依赖顺序清空表（从依赖较多的表开始）
         db.session.execute(db.delete(Notification))
+        db.session.execute(db.delete(UserNewsRead))
+        db.session.execute(db.delete(NewsTag))
+        db.session.execute(db.delete(News))
         db.session.execute(db.delete(Transaction))
         db.session.execute(db.delete(Holding))
         db.session.execute(db.delete(FavoriteFundRelation))
         db.session.execute(db.delete(FundGroup))
+        db.session.execute(db.delete(FundLatestQuote))
         db.session.execute(db.delete(FundMarketData))
+        db.session.execute(db.delete(FundPortfolioHolding))
+        db.session.execute(db.delete(SecurityQuote))
+        db.session.execute(db.delete(MarketIndexTick))
+        db.session.execute(db.delete(MarketIndex))
+        db.session.execute(db.delete(SectorTrendPrediction))
+        db.session.execute(db.delete(FundSector))
+        db.session.execute(db.delete(Sector))
+        db.session.execute(db.delete(FundCorrelation))
+        db.session.execute(db.delete(FundPeerRank))
+        db.session.execute(db.delete(FundRiskMetrics))
+        db.session.execute(db.delete(FundNavHistory))
         db.session.execute(db.delete(Fund))
         db.session.execute(db.delete(UserSetting))
         db.session.execute(db.delete(UserProfile))
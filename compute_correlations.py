@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+收益相关性计算脚本
+根据近一年日收益全量计算基金两两之间的相关系数，每只基金保留相关性最高的前 K 只写入基金相关性表
+建议每个交易日收盘、净值入库后（compute_returns.py 之后）执行一次
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.correlation import calculate_correlations, store_correlations
+
+
+def compute_correlations():
+    """全量计算收益相关性"""
+    app = create_app()
+    
+    with app.app_context():
+        print("开始计算收益相关性...")
+        started = time.time()
+        
+        count = store_correlations(calculate_correlations())
+        
+        print(f"已写入 {count} 条相关性记录，耗时 {time.time() - started:.2f} 秒")
+
+
+if __name__ == '__main__':
+    compute_correlations()
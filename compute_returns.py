@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+区间收益计算脚本
+根据历史净值全量计算所有基金的日/周/月/季/年/三年涨跌幅，写入基金市场数据，并重算同类排名
+建议每个交易日收盘、净值入库后执行一次
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.returns import get_return_engine, store_returns
+from app.utils.peer_rank import refresh_peer_ranks
+
+
+def compute_returns():
+    """全量计算区间收益"""
+    app = create_app()
+    
+    with app.app_context():
+        print("开始计算区间收益...")
+        started = time.time()
+        
+        results = get_return_engine().rebuild()
+        count = store_returns(results)
+        print(f"已更新 {count} 只基金的区间收益，耗时 {time.time() - started:.2f} 秒")
+        
+        started = time.time()
+        rank_count = refresh_peer_ranks()
+        print(f"已更新 {rank_count} 条同类排名，耗时 {time.time() - started:.2f} 秒")
+
+
+if __name__ == '__main__':
+    compute_returns()
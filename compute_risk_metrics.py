@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+风险指标计算脚本
+根据近一年历史净值全量计算所有基金的波动率、最大回撤、夏普/索提诺/卡玛比率和贝塔，写入基金风险指标表
+建议每个交易日收盘、净值入库后（compute_returns.py 之后）执行一次
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.risk import calculate_risk_metrics, store_risk_metrics
+
+
+def compute_risk_metrics():
+    """全量计算风险指标"""
+    app = create_app()
+    
+    with app.app_context():
+        print("开始计算风险指标...")
+        started = time.time()
+        
+        count = store_risk_metrics(calculate_risk_metrics())
+        
+        print(f"已更新 {count} 只基金的风险指标，耗时 {time.time() - started:.2f} 秒")
+
+
+if __name__ == '__main__':
+    compute_risk_metrics()
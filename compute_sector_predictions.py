@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+板块趋势预测计算脚本
+根据板块成分基金的近期净值计算各板块的动量和均值回归信号，写入板块预测表
+建议每个交易日收盘、净值入库后执行一次
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.sector_prediction import calculate_sector_predictions, store_sector_predictions
+
+
+def compute_sector_predictions():
+    """全量计算板块趋势预测"""
+    app = create_app()
+    
+    with app.app_context():
+        print("开始计算板块趋势预测...")
+        started = time.time()
+        
+        count = store_sector_predictions(calculate_sector_predictions())
+        
+        print(f"已写入 {count} 个板块的趋势预测，耗时 {time.time() - started:.2f} 秒")
+
+
+if __name__ == '__main__':
+    compute_sector_predictions()
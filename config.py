@@ -20,6 +20,80 @@ class Config:
     # 分页配置
     DEFAULT_PAGE_SIZE = 20
     MAX_PAGE_SIZE = 100
+    
+    # 基金输入联想：各进程检查数据库基金变更的间隔（秒）
+    FUND_SUGGEST_REFRESH_SECONDS = 60
+    
+    # 净值列式缓存：检查数据库新净值的间隔（秒）以及缓存的基金数量
+    NAV_STORE_REFRESH_SECONDS = 60
+    NAV_STORE_CACHE_SIZE = 4096
+    
+    # 市场涨跌排行榜：全量重建的间隔（秒），期间按变更增量维护；检查其他进程写入的行情的间隔（秒）
+    LEADERBOARD_RELOAD_SECONDS = 300
+    LEADERBOARD_REFRESH_SECONDS = 5
+    
+    # 板块行情聚合：全量重建的间隔（秒），期间按成分基金行情变更增量维护；检查其他进程写入的行情的间隔（秒）
+    SECTOR_RELOAD_SECONDS = 300
+    SECTOR_REFRESH_SECONDS = 5
+    
+    # 主要指数：各进程检查数据库新行情的间隔（秒）
+    INDEX_REFRESH_SECONDS = 10
+    
+    # 盘中估值：各进程检查数据库新证券行情和持仓的间隔（秒）
+    ESTIMATE_REFRESH_SECONDS = 5
+    
+    # 实时行情推送：读取数据库新行情的间隔（秒）、进程内缓冲的事件数（决定断线续传的范围）、
+    # 空闲保活间隔（秒）、单个连接的最长时间（秒，到期后客户端自动重连续传）以及单个连接订阅的代码数上限
+    QUOTE_STREAM_POLL_SECONDS = 1.0
+    QUOTE_STREAM_BUFFER_SIZE = 1000
+    QUOTE_STREAM_HEARTBEAT_SECONDS = 15
+    QUOTE_STREAM_MAX_SECONDS = 600
+    QUOTE_STREAM_MAX_CODES = 200
+    
+    # 每日行情批量导入：每批校验和写入的行数
+    QUOTE_INGEST_BATCH_SIZE = 5000
+    
+    # 最新行情快照文件：存放目录（各工作进程共用，未配置时直接查询数据库）、各进程检查新版本的间隔（秒）以及保留的版本数
+    MARKET_SNAPSHOT_DIR = os.environ.get('MARKET_SNAPSHOT_DIR')
+    MARKET_SNAPSHOT_CHECK_SECONDS = 1.0
+    MARKET_SNAPSHOT_KEEP = 3
+    
+    # 行情源写入接口（指数、行情批量导入）的令牌，未配置时写入接口关闭
+    MARKET_FEED_TOKEN = os.environ.get('MARKET_FEED_TOKEN')
+    
+    # 净值曲线降采样：resolution 参数对应的点数，以及缓存的曲线数量
+    NAV_CHART_RESOLUTIONS = {'low': 120, 'medium': 250, 'high': 500}
+    NAV_CHART_MAX_POINTS = 2000
+    NAV_DOWNSAMPLE_CACHE_SIZE = 1024
+    
+    # 资讯已读状态：只逐条记录最新的若干条资讯，更早的资讯视为已读（限制每个用户位图的大小）
+    NEWS_READ_WINDOW = 10000
+    
+    # 首页概览：按用户缓存的概览数量
+    HOME_OVERVIEW_CACHE_SIZE = 10000
+    
+    # 批量获取基金详情：单次请求的基金数量上限
+    FUND_BATCH_MAX_CODES = 50
+    
+    # 基金对比：单次对比的基金数量上限
+    FUND_COMPARE_MAX_CODES = 10
+    
+    # 风险指标：计算窗口（自然日）、最少净值个数、年化无风险利率，以及作为业绩基准的基金代码（为空时用全市场等权平均）
+    RISK_METRICS_WINDOW_DAYS = 365
+    RISK_METRICS_MIN_OBSERVATIONS = 20
+    RISK_FREE_RATE = 0.02
+    RISK_BENCHMARK_FUND_CODE = os.environ.get('RISK_BENCHMARK_FUND_CODE')
+    
+    # 收益相关性：计算窗口（自然日）、每只基金保留的高相关基金数、最少共同交易日数，以及组合分散度中视为高度相关的阈值
+    CORRELATION_WINDOW_DAYS = 365
+    CORRELATION_TOP_K = 20
+    CORRELATION_MIN_OVERLAP = 60
+    CORRELATION_HIGH_THRESHOLD = 0.9
+    
+    # 板块趋势预测：读取的净值窗口（自然日）、动量信号的交易日数、均值回归信号的均线交易日数
+    SECTOR_PREDICTION_WINDOW_DAYS = 180
+    SECTOR_MOMENTUM_DAYS = 20
+    SECTOR_REVERSION_DAYS = 60
 
 class TestingConfig(Config):
     # 测试配置
@@ -5,8 +5,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from app import create_app, db
 from app.models.user import User, UserProfile, UserSetting
 from app.models.fund import Fund, FundMarketData, FundGroup, FavoriteFundRelation
+from app.models.market import Sector, FundSector, SectorTrendPrediction, MarketIndex, MarketIndexTick, SecurityQuote
+from app.models.news import News, NewsTag, UserNewsRead
 from app.models.transaction import Holding, Transaction
 from app.models.notification import Notification
+from app.utils.quotes import rebuild_latest_quotes
 from datetime import datetime
 
 app = create_app()
@@ -17,6 +20,10 @@ def init_database():
         # 创建所有表
         db.create_all()
         
+        # 根据已有市场数据补建最新行情表
+        rebuild_latest_quotes(db.session.connection())
+        db.session.commit()
+        
         # 创建默认管理员用户（如果不存在）
         admin_user = User.query.filter_by(email='admin@example.com').first()
         if not admin_user:
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+基金持仓导入脚本
+从本地持仓文件（JSON）导入基金定期报告披露的重仓证券，用于盘中估值；每只基金的持仓整体替换
+文件内容为数组或 {"items": [...]}，每项为
+{"fund_code", "disclosure_date", "holdings": [{"security_code", "security_type", "security_name", "weight"}]}
+用法: python load_fund_holdings.py <持仓文件路径>
+"""
+
+import json
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.estimate import replace_fund_holdings
+
+
+def load_fund_holdings(path):
+    """导入持仓文件"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    records = data.get('items', []) if isinstance(data, dict) else data
+    
+    app = create_app()
+    
+    with app.app_context():
+        count = replace_fund_holdings(records)
+        print(f"已更新 {count} 只基金的持仓")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("用法: python load_fund_holdings.py <持仓文件路径>")
+        sys.exit(1)
+    load_fund_holdings(sys.argv[1])
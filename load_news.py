@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+资讯导入脚本
+从本地资讯文件（JSON）导入市场资讯并建立基金、板块倒排索引，文件内容为资讯数组或 {"items": [...]}
+用法: python load_news.py <资讯文件路径>
+"""
+
+import json
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.news import ingest_news
+
+
+def load_news(path):
+    """导入资讯文件"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    records = data.get('items', []) if isinstance(data, dict) else data
+    
+    app = create_app()
+    
+    with app.app_context():
+        count = ingest_news(records)
+        print(f"新增 {count} 条资讯（共 {len(records)} 条）")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("用法: python load_news.py <资讯文件路径>")
+        sys.exit(1)
+    load_news(sys.argv[1])
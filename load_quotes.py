@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+每日行情导入脚本
+从行情文件（CSV 或 JSON Lines）批量导入全市场基金行情，带 nav_date 的行同时写入净值历史
+用法: python load_quotes.py <行情文件路径> [--strict]
+  --strict  存在任何无效行时整体回滚，默认跳过无效行并输出行号
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.quote_ingest import InvalidQuoteFeed, detect_format, ingest_quote_file
+
+
+def load_quotes(path, strict=False):
+    """导入行情文件"""
+    file_format = detect_format(path)
+    if file_format is None:
+        print("无法识别的文件格式，请使用 .csv 或 .jsonl 文件")
+        sys.exit(1)
+    
+    app = create_app()
+    
+    with app.app_context():
+        started = time.time()
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as f:
+                result = ingest_quote_file(f, file_format, strict=strict)
+        except InvalidQuoteFeed as e:
+            print(str(e))
+            for error in e.errors:
+                print(f"  第 {error['line']} 行: {error['error']}")
+            sys.exit(1)
+        
+        print(f"读取 {result['rows']} 行，导入 {result['loaded']} 条行情（{result['fund_count']} 只基金）、"
+              f"{result['nav_rows']} 条净值，跳过 {result['skipped']} 行，耗时 {time.time() - started:.2f} 秒")
+        for error in result['errors']:
+            print(f"  第 {error['line']} 行: {error['error']}")
+
+
+if __name__ == '__main__':
+    args = [arg for arg in sys.argv[1:] if arg != '--strict']
+    if len(args) != 1:
+        print("用法: python load_quotes.py <行情文件路径> [--strict]")
+        sys.exit(1)
+    load_quotes(args[0], strict='--strict' in sys.argv[1:])
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+个股行情导入脚本
+从本地行情文件（JSON）导入个股盘中行情，用于基金盘中估值，文件内容为行情数组或 {"items": [...]}
+用法: python load_security_quotes.py <行情文件路径>
+"""
+
+import json
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.estimate import ingest_security_quotes
+
+
+def load_security_quotes(path):
+    """导入个股行情文件"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    records = data.get('items', []) if isinstance(data, dict) else data
+    
+    app = create_app()
+    
+    with app.app_context():
+        count = ingest_security_quotes(records)
+        print(f"已导入 {count} 条个股行情")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print("用法: python load_security_quotes.py <行情文件路径>")
+        sys.exit(1)
+    load_security_quotes(sys.argv[1])
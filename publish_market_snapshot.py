@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+行情快照发布脚本
+从数据库读取全部基金最新行情，发布为新版本的行情快照文件，各工作进程检查到新版本后自动切换
+行情写入后会自动发布，部署新目录、恢复数据库或直接修改行情表后可手动执行
+用法: python publish_market_snapshot.py
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from app.utils.market_snapshot import get_market_snapshot, publish_market_snapshot
+
+
+def publish():
+    """发布行情快照"""
+    app = create_app()
+    
+    with app.app_context():
+        if not app.config.get('MARKET_SNAPSHOT_DIR'):
+            print("未配置 MARKET_SNAPSHOT_DIR，不发布行情快照")
+            sys.exit(1)
+        
+        started = time.time()
+        version = publish_market_snapshot()
+        snapshot = get_market_snapshot()
+        print(f"已发布第 {version} 版行情快照（{len(snapshot)} 只基金），耗时 {time.time() - started:.2f} 秒")
+
+
+if __name__ == '__main__':
+    publish()
@@ -8,7 +8,8 @@
 import os
 import sys
 import uuid
-from datetime import datetime, date
+import random
+from datetime import datetime, date, timedelta
 from decimal import Decimal
 
 # 添加项目根目录到Python路径
@@ -16,9 +17,18 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
 from app.models.user import User, UserProfile, UserSetting
-from app.models.fund import Fund, FundMarketData, FundGroup, FavoriteFundRelation
+from app.models.fund import (
+    Fund, FundMarketData, FundLatestQuote, FundNavHistory, FundRiskMetrics, FundPeerRank, FundCorrelation,
+    FundPortfolioHolding, FundGroup, FavoriteFundRelation
+)
+from app.models.market import Sector, FundSector, SectorTrendPrediction, MarketIndex, MarketIndexTick, SecurityQuote
+from app.models.news import News, NewsTag, UserNewsRead
 from app.models.transaction import Holding, Transaction
 from app.models.notification import Notification
+from app.utils.index_quotes import ingest_index_quotes
+from app.utils.news import ingest_news
+from app.utils.estimate import replace_fund_holdings, ingest_security_quotes
+from app.utils.sector_prediction import refresh_sector_predictions
 from app import db
 
 
@@ -32,11 +42,26 @@ def create_test_data():
         # 清空现有数据（可选）
         print("清空现有测试数据...")
         db.session.execute(db.delete(Notification))
+        db.session.execute(db.delete(UserNewsRead))
+        db.session.execute(db.delete(NewsTag))
+        db.session.execute(db.delete(News))
         db.session.execute(db.delete(Transaction))
         db.session.execute(db.delete(Holding))
         db.session.execute(db.delete(FavoriteFundRelation))
         db.session.execute(db.delete(FundGroup))
+        db.session.execute(db.delete(FundLatestQuote))
         db.session.execute(db.delete(FundMarketData))
+        db.session.execute(db.delete(FundPortfolioHolding))
+        db.session.execute(db.delete(SecurityQuote))
+        db.session.execute(db.delete(MarketIndexTick))
+        db.session.execute(db.delete(MarketIndex))
+        db.session.execute(db.delete(SectorTrendPrediction))
+        db.session.execute(db.delete(FundSector))
+        db.session.execute(db.delete(Sector))
+        db.session.execute(db.delete(FundCorrelation))
+        db.session.execute(db.delete(FundPeerRank))
+        db.session.execute(db.delete(FundRiskMetrics))
+        db.session.execute(db.delete(FundNavHistory))
         db.session.execute(db.delete(Fund))
         db.session.execute(db.delete(UserSetting))
         db.session.execute(db.delete(UserProfile))
@@ -101,6 +126,112 @@ def create_test_data():
         
         db.session.commit()
         
+        print("创建基金历史净值数据...")
+        # 以最新净值为终点，倒推最近一年（250个交易日）的随机游走净值
+        rng = random.Random(20231001)
+        trading_days = []
+        nav_date = date.today()
+        while len(trading_days) < 250:
+            if nav_date.weekday() < 5:
+                trading_days.append(nav_date)
+            nav_date -= timedelta(days=1)
+        trading_days.reverse()
+        
+        for data in market_data:
+            values = [float(data['net_value'])]
+            for _ in trading_days[1:]:
+                values.append(values[-1] / (1 + rng.gauss(0.0003, 0.012)))
+            values.reverse()
+            
+            for i, (nav_date, value) in enumerate(zip(trading_days, values)):
+                previous = values[i - 1] if i > 0 else value
+                db.session.add(FundNavHistory(
+                    fund_code=data['fund_code'],
+                    nav_date=nav_date,
+                    net_value=Decimal(f'{value:.4f}'),
+                    accumulated_value=Decimal(f'{value:.4f}'),
+                    daily_change=Decimal(f'{value - previous:.4f}'),
+                    daily_change_rate=Decimal(f'{(value / previous - 1) * 100:.2f}')
+                ))
+        
+        db.session.commit()
+        
+        print("创建板块数据...")
+        # 创建板块及成分基金
+        sectors_data = [
+            {'sector_code': 'C01', 'sector_name': '科技板块', 'funds': ['000001']},
+            {'sector_code': 'C02', 'sector_name': '消费板块', 'funds': ['000002', '000005']},
+            {'sector_code': 'C03', 'sector_name': '宽基指数', 'funds': ['000003', '000004']},
+        ]
+        
+        for sector_data in sectors_data:
+            db.session.add(Sector(sector_code=sector_data['sector_code'], sector_name=sector_data['sector_name']))
+            for fund_code in sector_data['funds']:
+                db.session.add(FundSector(sector_code=sector_data['sector_code'], fund_code=fund_code))
+        
+        db.session.commit()
+        
+        # 根据成分基金历史净值计算板块趋势预测
+        refresh_sector_predictions()
+        
+        print("创建指数行情数据...")
+        # 创建主要指数行情及当日分时（每5分钟一个点）
+        index_time = datetime.now().replace(second=0, microsecond=0)
+        indices_data = [
+            {'index_code': '000001', 'index_name': '上证指数', 'previous_close': 3234.89, 'current_point': 3250.12},
+            {'index_code': '399001', 'index_name': '深证成指', 'previous_close': 10977.89, 'current_point': 11023.56},
+            {'index_code': '399006', 'index_name': '创业板指', 'previous_close': 2233.44, 'current_point': 2245.78},
+        ]
+        
+        session_open = index_time.replace(hour=9, minute=30)
+        for order, index_data in enumerate(indices_data, 1):
+            previous_close = index_data['previous_close']
+            change = index_data['current_point'] - previous_close
+            intraday = []
+            # 上午 9:30-11:30、下午 13:00-15:00 共240分钟，午间休市90分钟
+            for minutes in range(0, 240, 5):
+                tick_time = session_open + timedelta(minutes=minutes + (90 if minutes >= 120 else 0))
+                point = previous_close + change * minutes / 240 + rng.gauss(0, previous_close * 0.001)
+                intraday.append([tick_time.isoformat(), round(point, 2)])
+            intraday.append([index_time.replace(hour=15, minute=0).isoformat(), index_data['current_point']])
+            ingest_index_quotes([dict(index_data, display_order=order, update_time=index_time.isoformat(), intraday=intraday)])
+        
+        print("创建盘中估值数据...")
+        # 基金披露的重仓证券（个股或跟踪指数）及个股盘中行情
+        replace_fund_holdings([
+            {'fund_code': '000001', 'disclosure_date': '2023-09-30', 'holdings': [
+                {'security_code': '600519.SH', 'security_name': '贵州茅台', 'weight': 9.85},
+                {'security_code': '300750.SZ', 'security_name': '宁德时代', 'weight': 8.12},
+                {'security_code': '000858.SZ', 'security_name': '五粮液', 'weight': 6.47},
+            ]},
+            {'fund_code': '000003', 'disclosure_date': '2023-09-30', 'holdings': [
+                {'security_code': '399001', 'security_type': 'index', 'security_name': '深证成指', 'weight': 95},
+            ]},
+        ])
+        ingest_security_quotes([
+            {'security_code': '600519.SH', 'security_name': '贵州茅台', 'price': 1820.00, 'previous_close': 1800.00,
+             'update_time': index_time.isoformat()},
+            {'security_code': '300750.SZ', 'security_name': '宁德时代', 'price': 198.50, 'previous_close': 201.30,
+             'update_time': index_time.isoformat()},
+            {'security_code': '000858.SZ', 'security_name': '五粮液', 'change_rate': 0.85, 'update_time': index_time.isoformat()},
+        ])
+        
+        print("创建资讯数据...")
+        # 创建市场资讯，入库时按基金代码和板块名称打标签
+        news_time = datetime.now().replace(second=0, microsecond=0)
+        news_data = [
+            {'news_id': 'news_001', 'title': '科技股今日大幅上涨', 'summary': '半导体、软件方向领涨，科技板块成交放量',
+             'source': '财经日报', 'category': '市场动态'},
+            {'news_id': 'news_002', 'title': '央行发布最新货币政策', 'summary': '维持流动性合理充裕', 'source': '金融时报', 'category': '政策解读'},
+            {'news_id': 'news_003', 'title': '白酒消费旺季来临', 'summary': '招商中证白酒指数(000005)近一周走强',
+             'source': '证券时报', 'category': '行业观察'},
+            {'news_id': 'news_004', 'title': '华夏成长混合(000001)发布季度报告', 'source': '基金公告', 'category': '基金公告'},
+        ]
+        
+        for i, item in enumerate(news_data):
+            item['publish_time'] = (news_time - timedelta(hours=len(news_data) - i)).isoformat()
+        ingest_news(news_data)
+        
         print("创建持仓数据...")
         # 创建持仓数据
         holdings_data = [
@@ -206,6 +337,7 @@ def create_test_data():
         print("测试数据注入完成！")
         print(f"创建了1个用户")
         print(f"创建了5只基金")
+        print(f"创建了{len(market_data) * 250}条历史净值")
         print(f"创建了3个持仓记录")
         print(f"创建了3个交易记录")
         print(f"创建了3个自选关系")
@@ -37,4 +37,465 @@ def test_get_fund_detail(client):
 def test_search_funds(client):
     """测试搜索基金"""
     response = client.get('/api/funds/search?q=测试')
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+def test_search_funds_ranked(client, app):
+    """测试搜索基金走全文索引并按相关度排序"""
+    with app.app_context():
+        from app import db
+        db.session.add(Fund(fund_code='110011', fund_name='易方达中小盘混合'))
+        db.session.add(Fund(fund_code='000002', fund_name='易方达消费行业股票'))
+        db.session.add(Fund(fund_code='000003', fund_name='嘉实沪深300ETF联接'))
+        db.session.commit()
+
+    response = client.get('/api/funds/search?q=消费')
+    data = json.loads(response.data)
+    assert [item['fund_code'] for item in data['items']] == ['000002']
+
+    response = client.get('/api/funds/search?q=etf')
+    data = json.loads(response.data)
+    assert data['total'] == 1
+    assert data['items'][0]['fund_code'] == '000003'
+
+    # 数字片段中间的子串
+    response = client.get('/api/funds/search?q=0011')
+    assert [item['fund_code'] for item in json.loads(response.data)['items']] == ['110011']
+    response = client.get('/api/funds/search?q=00')
+    assert {item['fund_code'] for item in json.loads(response.data)['items']} == {'110011', '000002', '000003'}
+    response = client.get('/api/funds/search?q=深300')
+    assert [item['fund_code'] for item in json.loads(response.data)['items']] == ['000003']
+
+
+def test_suggest_funds_by_initials(client, app):
+    """测试按拼音首字母联想基金"""
+    with app.app_context():
+        from app import db
+        db.session.add(Fund(fund_code='110011', fund_name='易方达中小盘混合'))
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合'))
+        db.session.commit()
+
+    response = client.get('/api/funds/suggest?q=yfd')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [item['fund_code'] for item in data['items']] == ['110011']
+
+    response = client.get('/api/funds/suggest?q=0000')
+    data = json.loads(response.data)
+    assert data['items'][0]['match_type'] == 'code'
+
+    # 其他进程写入的基金（绕过本进程会话）在检查间隔后重建
+    app.extensions['fund_suggest'].refresh_seconds = 0
+    with app.app_context():
+        from app import db
+        db.session.execute(Fund.__table__.insert(), [{'id': 'suggest-core-id', 'fund_code': '161725', 'fund_name': '招商中证白酒'}])
+        db.session.commit()
+    data = json.loads(client.get('/api/funds/suggest?q=zszz').data)
+    assert [item['fund_code'] for item in data['items']] == ['161725']
+
+
+def test_get_funds_with_cursor(client, app):
+    """测试游标分页逐页遍历基金列表"""
+    with app.app_context():
+        from app import db
+        for i in range(5):
+            db.session.add(Fund(fund_code=f'00000{i}', fund_name=f'测试基金{i}'))
+        db.session.commit()
+
+    response = client.get('/api/funds/?cursor=&per_page=2')
+    data = json.loads(response.data)
+    codes = [item['fund_code'] for item in data['items']]
+    assert data['prev_cursor'] is None
+
+    while data['next_cursor']:
+        response = client.get(f"/api/funds/?per_page=2&cursor={data['next_cursor']}")
+        data = json.loads(response.data)
+        codes.extend(item['fund_code'] for item in data['items'])
+
+    assert codes == ['000000', '000001', '000002', '000003', '000004']
+
+    response = client.get('/api/funds/?cursor=invalid')
+    assert response.status_code == 400
+
+
+def test_get_fund_history_range(client, app):
+    """测试按日期区间查询历史净值"""
+    from datetime import date, timedelta
+    from app.models.fund import FundNavHistory
+
+    with app.app_context():
+        from app import db
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合'))
+        for i in range(10):
+            db.session.add(FundNavHistory(fund_code='000001', nav_date=date(2023, 10, 1) + timedelta(days=i), net_value=1 + i / 100))
+        db.session.commit()
+
+    response = client.get('/api/funds/000001/history?days=3')
+    data = json.loads(response.data)
+    assert [item['date'] for item in data['history']] == ['2023-10-08', '2023-10-09', '2023-10-10']
+
+    response = client.get('/api/funds/000001/history?start=2023-10-02&end=2023-10-03')
+    data = json.loads(response.data)
+    assert [item['net_value'] for item in data['history']] == ['1.0100', '1.0200']
+
+
+def test_get_fund_history_picks_up_new_nav(client, app):
+    """测试新净值写入后历史净值接口增量刷新"""
+    from datetime import date
+    from app.models.fund import FundNavHistory
+
+    with app.app_context():
+        from app import db
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合'))
+        db.session.add(FundNavHistory(fund_code='000001', nav_date=date(2023, 10, 9), net_value=1))
+        db.session.commit()
+
+    response = client.get('/api/funds/000001/history?days=1')
+    assert json.loads(response.data)['end_date'] == '2023-10-09'
+
+    with app.app_context():
+        from app import db
+        db.session.add(FundNavHistory(fund_code='000001', nav_date=date(2023, 10, 10), net_value=1.01))
+        db.session.commit()
+
+    response = client.get('/api/funds/000001/history?days=1')
+    data = json.loads(response.data)
+    assert data['history'] == [{
+        'date': '2023-10-10',
+        'net_value': '1.0100',
+        'accumulated_value': None,
+        'daily_change': None,
+        'daily_change_rate': None
+    }]
+
+
+def test_get_fund_history_downsampled(client, app):
+    """测试长区间净值按目标点数降采样并保留首尾"""
+    from datetime import date, timedelta
+    from app.models.fund import FundNavHistory
+
+    with app.app_context():
+        from app import db
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合'))
+        for i in range(500):
+            db.session.add(FundNavHistory(fund_code='000001', nav_date=date(2022, 1, 1) + timedelta(days=i), net_value=1 + (i % 50) / 100))
+        db.session.commit()
+
+    response = client.get('/api/funds/000001/history?start=2022-01-01&points=50')
+    data = json.loads(response.data)
+    assert len(data['history']) == 50
+    assert data['total_points'] == 500
+    assert data['downsampled'] is True
+    assert data['history'][0]['date'] == '2022-01-01'
+    assert data['history'][-1]['date'] == (date(2022, 1, 1) + timedelta(days=499)).isoformat()
+
+    response = client.get('/api/funds/000001/history?points=2')
+    assert response.status_code == 400
+
+
+def test_get_fund_detail_not_modified(client, app):
+    """测试基金详情的条件请求"""
+    with app.app_context():
+        from app import db
+        db.session.add(Fund(fund_code='000009', fund_name='条件请求测试基金'))
+        db.session.commit()
+    
+    response = client.get('/api/funds/000009')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    
+    response = client.get('/api/funds/000009', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    
+    response = client.get('/api/funds/000009', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+
+
+def test_serialize_fund_detail_without_update_time(app):
+    """测试最新行情缺少更新时间时基金详情仍可序列化"""
+    from app.api.fund import serialize_fund_detail
+    from app.models.fund import FundLatestQuote
+    
+    with app.app_context():
+        fund = Fund(fund_code='000010', fund_name='缺少时间测试基金')
+        quote = FundLatestQuote(fund_code='000010', market_data_id='1', net_value=1.0)
+        assert serialize_fund_detail(fund, quote)['market_data']['update_time'] is None
+
+
+def test_get_funds_batch(client, app):
+    """测试批量获取基金详情"""
+    with app.app_context():
+        from app import db
+        db.session.add(Fund(fund_code='000011', fund_name='批量测试基金A'))
+        db.session.add(Fund(fund_code='000012', fund_name='批量测试基金B'))
+        db.session.commit()
+    
+    response = client.get('/api/funds/batch?codes=000011,000012,999999')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert set(data['items']) == {'000011', '000012'}
+    assert data['items']['000012']['fund_name'] == '批量测试基金B'
+    assert data['missing'] == ['999999']
+    
+    response = client.post('/api/funds/batch',
+                           data=json.dumps({'fund_codes': ['000011']}),
+                           content_type='application/json')
+    assert response.status_code == 200
+    assert list(json.loads(response.data)['items']) == ['000011']
+    
+    response = client.post('/api/funds/batch', data=json.dumps(['000011']), content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_compare_funds(client, app):
+    """测试多基金业绩对比"""
+    with app.app_context():
+        from datetime import date, timedelta
+        from app import db
+        from app.models.fund import FundNavHistory
+        db.session.add(Fund(fund_code='000021', fund_name='对比测试基金A'))
+        db.session.add(Fund(fund_code='000022', fund_name='对比测试基金B'))
+        for i in range(10):
+            nav_date = date(2024, 1, 1) + timedelta(days=i)
+            db.session.add(FundNavHistory(fund_code='000021', nav_date=nav_date, net_value=1 + i * 0.1))
+            # B 缺少第一天的净值，只在共同交易日上对齐
+            if i > 0:
+                db.session.add(FundNavHistory(fund_code='000022', nav_date=nav_date, net_value=2.0))
+        db.session.commit()
+    
+    response = client.get('/api/funds/compare?codes=000021,000022&range=all')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert data['start_date'] == '2024-01-02'
+    assert len(data['dates']) == 9
+    assert data['series'][0]['values'][0] == 1.0
+    assert abs(data['series'][0]['values'][-1] - 1.9 / 1.1) < 1e-4
+    assert data['summary'][1]['total_return'] == 0
+    
+    response = client.get('/api/funds/compare?codes=000021')
+    assert response.status_code == 400
+
+
+def test_screen_funds(client, app):
+    """测试多条件筛选基金"""
+    with app.app_context():
+        from app import db
+        from app.models.fund import FundMarketData
+        for code, fund_type, fee, yearly in [('000031', '股票型', 0.015, 20),
+                                             ('000032', '股票型', 0.008, 35),
+                                             ('000033', '债券型', 0.005, 5)]:
+            db.session.add(Fund(fund_code=code, fund_name=f'筛选测试基金{code}', fund_type=fund_type,
+                                risk_level='R3', management_fee=fee))
+            db.session.add(FundMarketData(fund_code=code, net_value=1.0, yearly_change_rate=yearly))
+        db.session.commit()
+    
+    response = client.get('/api/funds/screen?filter=fund_type=股票型|债券型;yearly_change_rate>=10&sort=-yearly_change_rate')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [item['fund_code'] for item in data['items']] == ['000032', '000031']
+    
+    response = client.get('/api/funds/screen?filter=management_fee<=0.01&sort=yearly_change_rate')
+    data = json.loads(response.data)
+    assert [item['fund_code'] for item in data['items']] == ['000033', '000032']
+    
+    response = client.get('/api/funds/screen?filter=unknown=1')
+    assert response.status_code == 400
+    for value in ('nan', 'inf', '-inf'):
+        assert client.get(f'/api/funds/screen?filter=yearly_change_rate>={value}').status_code == 400
+
+
+def test_fund_detail_peer_ranks(client, app):
+    """测试基金详情返回同类排名"""
+    with app.app_context():
+        from datetime import datetime
+        from app import db
+        from app.models.fund import FundMarketData
+        from app.utils.peer_rank import refresh_peer_ranks
+        for code, yearly in [('000041', 10), ('000042', 30), ('000043', 20)]:
+            db.session.add(Fund(fund_code=code, fund_name=f'排名测试基金{code}', fund_type='混合型'))
+            db.session.add(FundMarketData(fund_code=code, net_value=1.0, yearly_change_rate=yearly, update_time=datetime(2023, 1, 1)))
+        db.session.commit()
+        
+        assert refresh_peer_ranks() == 3
+    
+    response = client.get('/api/funds/000043')
+    data = json.loads(response.data)
+    assert data['peer_ranks']['yearly']['rank'] == 2
+    assert data['peer_ranks']['yearly']['peer_count'] == 3
+    assert data['peer_ranks']['yearly']['percentile'] == 50.0
+    assert data['peer_ranks']['yearly']['label'] == '同类第2名/3只'
+    assert 'monthly' not in data['peer_ranks']
+    
+    # 排名重算时间参与 Last-Modified：基金资料较早更新时，排名变化后不应返回 304
+    with app.app_context():
+        from app import db
+        Fund.query.filter_by(fund_code='000043').update({'updated_at': datetime(2023, 1, 1)})
+        db.session.commit()
+    response = client.get('/api/funds/000043', headers={'If-Modified-Since': 'Thu, 01 Jun 2023 00:00:00 GMT'})
+    assert response.status_code == 200
+
+
+def test_get_correlated_funds(client, app):
+    """测试高相关基金"""
+    with app.app_context():
+        from datetime import date, timedelta
+        from app import db
+        from app.models.fund import FundNavHistory
+        from app.utils.correlation import refresh_correlations
+        app.config['CORRELATION_MIN_OVERLAP'] = 5
+        # 000052 的日收益是 000051 的两倍，000053 与二者走势相反
+        moves = [0.01, -0.02, 0.015, 0.005, -0.01, 0.02, -0.005, 0.01]
+        for code, scale in [('000051', 1), ('000052', 2), ('000053', -1)]:
+            db.session.add(Fund(fund_code=code, fund_name=f'相关性测试基金{code}', fund_type='股票型'))
+            value = 1.0
+            for day in range(len(moves) + 1):
+                db.session.add(FundNavHistory(fund_code=code, nav_date=date(2023, 1, 2) + timedelta(days=day), net_value=round(value, 4)))
+                if day < len(moves):
+                    value *= 1 + moves[day] * scale
+        db.session.commit()
+        
+        assert refresh_correlations() == 6
+    
+    response = client.get('/api/funds/000051/correlated?limit=5')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert [item['fund_code'] for item in data['items']] == ['000052', '000053']
+    assert data['items'][0]['correlation'] > 0.99
+    assert data['items'][1]['correlation'] < -0.99
+    assert data['items'][0]['overlap_days'] == 8
+
+
+def test_fund_detail_estimate(client, app):
+    """测试盘中估值：按重仓证券涨跌幅加权估算，新行情写入后重算"""
+    from datetime import datetime
+    from app import db
+    from app.models.fund import FundMarketData
+    from app.utils.estimate import replace_fund_holdings, ingest_security_quotes
+
+    with app.app_context():
+        db.session.add(Fund(fund_code='000061', fund_name='估值测试基金', fund_type='股票型'))
+        db.session.add(Fund(fund_code='000062', fund_name='无持仓基金', fund_type='股票型'))
+        db.session.add(Fund(fund_code='000063', fund_name='同一时间行情测试基金', fund_type='股票型'))
+        db.session.add(FundMarketData(fund_code='000061', net_value=2.0, update_time=datetime(2023, 10, 9, 20)))
+        db.session.add(FundMarketData(fund_code='000063', net_value=1.0, update_time=datetime(2023, 10, 9, 20)))
+        db.session.commit()
+        replace_fund_holdings([{'fund_code': '000061', 'holdings': [
+            {'security_code': '600519.SH', 'weight': 30},
+            {'security_code': '000858.SZ', 'weight': 10},
+            {'security_code': '601318.SH', 'weight': 10},
+        ]}, {'fund_code': '000063', 'holdings': [
+            {'security_code': '300750.SZ', 'weight': 50},
+            {'security_code': '600036.SH', 'weight': 50},
+        ]}])
+        ingest_security_quotes([
+            {'security_code': '600519.SH', 'change_rate': 2.0, 'update_time': '2023-10-10T10:00:00'},
+            {'security_code': '000858.SZ', 'price': 99, 'previous_close': 100, 'update_time': '2023-10-10T10:00:00'},
+        ])
+
+    # 有行情的重仓证券占净值40%：(30 x 2% + 10 x -1%) / 40 = 1.25%
+    estimate = json.loads(client.get('/api/funds/000061').data)['estimate']
+    assert estimate['estimated_change_rate'] == '1.25'
+    assert estimate['estimated_nav'] == '2.0250'
+    assert estimate['coverage'] == '40.00'
+    assert json.loads(client.get('/api/funds/000062').data)['estimate'] is None
+
+    app.config['MARKET_FEED_TOKEN'] = 'feed-token'
+    response = client.post('/api/market/securities', headers={'X-Feed-Token': 'feed-token'}, json=[{'security_code': '601318.SH'}])
+    assert response.status_code == 400
+    response = client.post('/api/market/securities', headers={'X-Feed-Token': 'feed-token'}, json={'items': [
+        {'security_code': '601318.SH', 'change_rate': -3.0, 'update_time': '2023-10-10T10:01:00'}
+    ]})
+    assert response.status_code == 200
+    estimate = json.loads(client.get('/api/funds/000061').data)['estimate']
+    assert estimate['estimated_change_rate'] == '0.40'
+    assert estimate['coverage'] == '50.00'
+    assert estimate['estimate_time'] == '2023-10-10T10:01:00'
+
+    # 与水位线同一时间、之后才写入的行情也要读到
+    with app.app_context():
+        ingest_security_quotes([{'security_code': '300750.SZ', 'change_rate': 4.0, 'update_time': '2023-10-10T10:02:00'}])
+    estimate = json.loads(client.get('/api/funds/000063').data)['estimate']
+    assert (estimate['estimated_change_rate'], estimate['coverage']) == ('4.00', '50.00')
+    with app.app_context():
+        ingest_security_quotes([{'security_code': '600036.SH', 'change_rate': -4.0, 'update_time': '2023-10-10T10:02:00'}])
+    estimate = json.loads(client.get('/api/funds/000063').data)['estimate']
+    assert (estimate['estimated_change_rate'], estimate['coverage']) == ('0.00', '100.00')
+
+    # 同一时间的净值修正也会更新估值基准
+    with app.app_context():
+        from app.utils.estimate import get_estimate_engine
+        market_data = FundMarketData.query.filter_by(fund_code='000061').one()
+        market_data.net_value = 2.2
+        db.session.commit()
+        get_estimate_engine().refresh()
+    estimate = json.loads(client.get('/api/funds/000061').data)['estimate']
+    assert (estimate['base_nav'], estimate['estimated_nav']) == ('2.2000', '2.2088')
+
+    # 估值交易日的净值公布后不再返回估值
+    with app.app_context():
+        from app.utils.estimate import get_estimate_engine
+        db.session.add(FundMarketData(fund_code='000061', net_value=2.01, update_time=datetime(2023, 10, 10, 20)))
+        db.session.commit()
+        get_estimate_engine().refresh()
+    assert json.loads(client.get('/api/funds/000061').data)['estimate'] is None
+
+
+def test_fund_detail_market_snapshot(client, app, tmp_path):
+    """测试行情快照：写入后发布新版本，详情从快照读取，其他进程按版本号切换"""
+    from datetime import datetime
+    from app import db
+    from app.models.fund import FundMarketData, FundLatestQuote
+    from app.utils.market_snapshot import MarketSnapshotStore, read_current_version
+
+    app.config['MARKET_SNAPSHOT_DIR'] = str(tmp_path)
+    with app.app_context():
+        db.session.add(Fund(fund_code='000071', fund_name='快照测试基金', fund_type='混合型'))
+        db.session.add(FundMarketData(
+            fund_code='000071', net_value=1.2345, daily_change=-0.0123, daily_change_rate=-0.99,
+            yearly_change_rate=12.5, update_time=datetime(2023, 10, 9, 20)
+        ))
+        db.session.commit()
+        assert read_current_version(str(tmp_path)) == 1
+
+        # 绕过发布直接修改数据库，详情仍返回快照中的行情
+        db.session.execute(db.update(FundLatestQuote).values(net_value=9.9999))
+        db.session.commit()
+
+    market_data = json.loads(client.get('/api/funds/000071').data)['market_data']
+    assert market_data['net_value'] == '1.2345'
+    assert market_data['daily_change'] == '-0.0123'
+    assert market_data['daily_change_rate'] == '-0.99'
+    assert market_data['yearly_change_rate'] == '12.50'
+    assert market_data['weekly_change_rate'] == 'None'
+    assert market_data['update_time'] == '2023-10-09T20:00:00'
+
+    with app.app_context():
+        db.session.add(FundMarketData(fund_code='000071', net_value=1.3, update_time=datetime(2023, 10, 10, 20)))
+        db.session.commit()
+    assert read_current_version(str(tmp_path)) == 2
+    assert json.loads(client.get('/api/funds/000071').data)['market_data']['net_value'] == '1.3000'
+
+    # 另一个进程映射同一版本的文件，读到相同的行情
+    other = MarketSnapshotStore(str(tmp_path)).snapshot()
+    assert other.version == 2
+    assert str(other.get('000071').net_value) == '1.3000'
+    assert other.get('999999') is None
+
+    # 同一流程中的多次提交合并为一次发布
+    import os
+    from app.utils.market_snapshot import deferred_market_snapshot
+    with app.app_context():
+        with deferred_market_snapshot():
+            for day in (11, 12):
+                db.session.add(FundMarketData(fund_code='000071', net_value=1.4, update_time=datetime(2023, 10, day, 20)))
+                db.session.commit()
+            assert read_current_version(str(tmp_path)) == 2
+        assert read_current_version(str(tmp_path)) == 3
+
+        # 发布失败只记录日志，写入照常提交
+        os.remove(os.path.join(str(tmp_path), '.lock'))
+        os.mkdir(os.path.join(str(tmp_path), '.lock'))
+        db.session.add(FundMarketData(fund_code='000071', net_value=1.5, update_time=datetime(2023, 10, 13, 20)))
+        db.session.commit()
+        assert read_current_version(str(tmp_path)) == 3
+        assert db.session.query(FundMarketData).filter_by(fund_code='000071').count() == 5
@@ -35,4 +35,70 @@ def test_get_home_overview(client):
     assert 'index_summary' in data
     assert 'recommended_funds' in data
     assert 'quick_actions' in data
-    assert 'unread_notifications_count' in data
\ No newline at end of file
+    assert 'unread_notifications_count' in data
+
+def test_home_overview_cache(client, app):
+    """测试首页概览缓存：命中时只执行一条状态查询，买入和新行情入库后重建"""
+    from datetime import datetime
+    from sqlalchemy import event
+    from app import db
+    from app.models.fund import FundMarketData
+
+    with app.app_context():
+        db.session.add(Fund(fund_code='000081', fund_name='首页测试基金', fund_type='混合型', risk_level='R3'))
+        db.session.add(FundMarketData(fund_code='000081', net_value=1.5, daily_change_rate=0.8, update_time=datetime(2023, 10, 9, 20)))
+        db.session.commit()
+
+    client.post('/api/auth/register', json={
+        'username': 'home_cache_user', 'email': 'home_cache@example.com', 'password': 'testpassword123'
+    })
+    token = json.loads(client.post('/api/auth/login', json={
+        'email': 'home_cache@example.com', 'password': 'testpassword123'
+    }).data)['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+
+    data = json.loads(client.get('/api/home/overview', headers=headers).data)
+    assert data['asset_overview']['holdings_count'] == 0
+    assert [fund['net_value'] for fund in data['recommended_funds']] == ['1.5000']
+    assert data['update_time'].startswith('2023-10-09T20:00:00')
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        assert json.loads(client.get('/api/home/overview', headers=headers).data) == data
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1
+
+    assert client.post('/api/transactions/buy', json={'fund_code': '000081', 'amount': 300}, headers=headers).status_code == 200
+    data = json.loads(client.get('/api/home/overview', headers=headers).data)
+    assert data['asset_overview']['holdings_count'] == 1
+    assert data['holdings_summary'][0]['fund_name'] == '首页测试基金'
+
+    with app.app_context():
+        db.session.add(FundMarketData(fund_code='000081', net_value=1.6, daily_change_rate=1.2, update_time=datetime(2023, 10, 10, 20)))
+        db.session.commit()
+    data = json.loads(client.get('/api/home/overview', headers=headers).data)
+    assert [fund['net_value'] for fund in data['recommended_funds']] == ['1.6000']
+
+    # 同一时间的行情修正（绕过ORM批量写入）也会使推荐基金失效，且不重建持仓部分
+    from app.utils.quotes import quote_row, upsert_latest_quotes
+    with app.app_context():
+        market_data = FundMarketData.query.filter_by(fund_code='000081', update_time=datetime(2023, 10, 10, 20)).one()
+        market_data.net_value = 1.65
+        row = quote_row(market_data)
+        db.session.rollback()
+        upsert_latest_quotes(db.session.connection(), [row])
+        db.session.commit()
+    statements = []
+    event.listen(engine, 'before_cursor_execute', listener)
+    try:
+        data = json.loads(client.get('/api/home/overview', headers=headers).data)
+    finally:
+        event.remove(engine, 'before_cursor_execute', listener)
+    assert [fund['net_value'] for fund in data['recommended_funds']] == ['1.6500']
+    assert data['asset_overview']['holdings_count'] == 1
+    assert not any('FROM holdings' in statement and 'JOIN' in statement for statement in statements)
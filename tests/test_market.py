@@ -24,4 +24,488 @@ def test_get_sector_performance(client):
     response = client.get('/api/market/sectors')
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert 'sectors' in data
\ No newline at end of file
+    assert 'sectors' in data
+
+def test_compute_period_returns(app):
+    """测试根据历史净值计算区间涨跌幅并写入市场数据"""
+    from datetime import date, timedelta
+    from app import db
+    from app.models.fund import FundNavHistory
+    from app.utils.returns import refresh_returns
+
+    with app.app_context():
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合'))
+        today = date.today()
+        for i in range(400):
+            db.session.add(FundNavHistory(fund_code='000001', nav_date=today - timedelta(days=399 - i), net_value=1 + i / 100))
+        db.session.commit()
+
+        assert refresh_returns() == 1
+        market_data = FundMarketData.query.filter_by(fund_code='000001').one()
+        assert float(market_data.net_value) == 4.99
+        assert float(market_data.weekly_change_rate) == round((4.99 / 4.92 - 1) * 100, 2)
+        assert float(market_data.yearly_change_rate) == round((4.99 / 1.34 - 1) * 100, 2)
+        assert market_data.three_year_change_rate is None
+
+        # 增量计算：只有一只基金有新净值时，其他基金的历史不影响结果
+        db.session.add(Fund(fund_code='000002', fund_name='华夏债券'))
+        db.session.add(FundNavHistory(fund_code='000002', nav_date=today - timedelta(days=10), net_value=1))
+        db.session.add(FundNavHistory(fund_code='000001', nav_date=today + timedelta(days=1), net_value=5))
+        db.session.commit()
+        assert refresh_returns(['000001', '000002']) == 2
+        market_data = FundMarketData.query.filter_by(fund_code='000001').order_by(FundMarketData.update_time.desc()).first()
+        assert float(market_data.net_value) == 5
+
+
+def test_market_funds_use_latest_quote(client, app):
+    """测试市场基金列表每只基金只返回最新一条行情"""
+    from datetime import datetime, timedelta
+    from app import db
+
+    with app.app_context():
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合'))
+        db.session.commit()
+        update_time = datetime(2023, 10, 1)
+        db.session.add(FundMarketData(fund_code='000001', net_value=1.1, update_time=update_time))
+        db.session.add(FundMarketData(fund_code='000001', net_value=1.2, update_time=update_time + timedelta(days=1)))
+        db.session.commit()
+
+    response = client.get('/api/market/funds')
+    data = json.loads(response.data)
+    assert data['total'] == 1
+    assert data['items'][0]['net_value'] == '1.2000'
+
+
+
+def test_market_funds_etag_counts_rows(client, app):
+    """测试市场基金列表的 ETag 包含行数：新增更新时间较早的基金也会使缓存失效"""
+    from datetime import datetime
+    from app import db
+
+    with app.app_context():
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合', updated_at=datetime(2023, 10, 2)))
+        db.session.commit()
+
+    response = client.get('/api/market/funds')
+    etag = response.headers['ETag']
+    assert client.get('/api/market/funds', headers={'If-None-Match': etag}).status_code == 304
+
+    with app.app_context():
+        db.session.add(Fund(fund_code='000002', fund_name='易方达消费行业', updated_at=datetime(2023, 10, 1)))
+        db.session.commit()
+
+    response = client.get('/api/market/funds', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_market_funds_leaderboards(client, app):
+    """测试市场基金涨跌榜单及行情写入后的增量更新"""
+    from datetime import datetime, timedelta
+    from app import db
+
+    update_time = datetime(2023, 10, 1)
+    with app.app_context():
+        for code, fund_type, rate in [('000001', '股票型', 1.5), ('000002', '股票型', -2.0), ('000003', '债券型', 0.5), ('000004', '债券型', None)]:
+            db.session.add(Fund(fund_code=code, fund_name=f'榜单测试基金{code}', fund_type=fund_type))
+            db.session.add(FundMarketData(fund_code=code, net_value=1.0, daily_change_rate=rate, update_time=update_time))
+        db.session.commit()
+
+    def codes(query):
+        data = json.loads(client.get('/api/market/funds' + query).data)
+        return [item['fund_code'] for item in data['items']]
+
+    assert codes('') == ['000001', '000003', '000002', '000004']
+    assert codes('?board=losers') == ['000002', '000003', '000001', '000004']
+    assert codes('?board=active') == ['000002', '000001', '000003', '000004']
+    assert codes('?type=债券型') == ['000003', '000004']
+    assert codes('?per_page=3&page=2') == ['000004']
+    assert client.get('/api/market/funds?board=volume').status_code == 400
+
+    with app.app_context():
+        db.session.add(FundMarketData(fund_code='000003', net_value=1.1, daily_change_rate=3.0, update_time=update_time + timedelta(days=1)))
+        db.session.commit()
+
+    assert codes('?per_page=1') == ['000003']
+
+    # 其他进程写入的行情（绕过本进程的提交钩子）与水位线同一时间时也要读到
+    from app.models.fund import FundLatestQuote
+    app.extensions['market_leaderboard'].refresh_seconds = 0
+    assert codes('?per_page=1') == ['000003']
+    with app.app_context():
+        db.session.execute(FundLatestQuote.__table__.update().where(FundLatestQuote.fund_code == '000002').values(
+            market_data_id='other-process', daily_change_rate=5.0, update_time=update_time + timedelta(days=1)
+        ))
+        db.session.commit()
+
+    assert codes('?per_page=1') == ['000002']
+
+    # 榜单尚未同步其他进程的写入时，ETag 与返回的旧内容一致；同步后 ETag 随内容变化
+    app.extensions['market_leaderboard'].refresh_seconds = 3600
+    response = client.get('/api/market/funds?per_page=1')
+    etag = response.headers['ETag']
+    with app.app_context():
+        db.session.execute(FundLatestQuote.__table__.update().where(FundLatestQuote.fund_code == '000001').values(
+            market_data_id='other-process-2', daily_change_rate=9.0, update_time=update_time + timedelta(days=2)
+        ))
+        db.session.commit()
+    assert client.get('/api/market/funds?per_page=1', headers={'If-None-Match': etag}).status_code == 304
+    app.extensions['market_leaderboard'].refresh_seconds = 0
+    response = client.get('/api/market/funds?per_page=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [item['fund_code'] for item in json.loads(response.data)['items']] == ['000001']
+
+    # 原地改写、保留 update_time 和 market_data_id 的行情（如区间收益计算）按行情版本重建
+    from app.utils.quotes import upsert_latest_quotes
+    etag = client.get('/api/market/funds?per_page=1').headers['ETag']
+    with app.app_context():
+        row = dict(db.session.execute(
+            db.select(FundLatestQuote.__table__).where(FundLatestQuote.fund_code == '000003')
+        ).mappings().one())
+        row['daily_change_rate'] = 10.0
+        upsert_latest_quotes(db.session.connection(), [row])
+        db.session.commit()
+    response = client.get('/api/market/funds?per_page=1', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert [item['fund_code'] for item in json.loads(response.data)['items']] == ['000003']
+
+
+
+def test_sector_aggregates(client, app):
+    """测试板块涨跌幅按成分基金最新行情聚合并随行情增量更新"""
+    from datetime import datetime, timedelta
+    from app import db
+    from app.models.market import Sector, FundSector
+
+    update_time = datetime(2023, 10, 1)
+    with app.app_context():
+        db.session.add(Sector(sector_code='C01', sector_name='科技板块'))
+        db.session.add(Sector(sector_code='C02', sector_name='消费板块'))
+        for code, rate, sectors in [('000001', 1.5, ['C01']), ('000002', -0.5, ['C01', 'C02']), ('000003', 2.0, ['C02'])]:
+            db.session.add(Fund(fund_code=code, fund_name=f'板块测试基金{code}'))
+            db.session.add(FundMarketData(fund_code=code, net_value=1.0, daily_change_rate=rate, update_time=update_time))
+            for sector_code in sectors:
+                db.session.add(FundSector(sector_code=sector_code, fund_code=code))
+        db.session.commit()
+
+    data = json.loads(client.get('/api/market/sectors').data)
+    sectors = {item['sector_code']: item for item in data['items']}
+    assert sectors['C01']['daily_change_rate'] == '0.50'
+    assert sectors['C02']['daily_change_rate'] == '0.75'
+    assert sectors['C01']['fund_count'] == 2
+    assert (sectors['C01']['advancers'], sectors['C01']['decliners']) == (1, 1)
+
+    with app.app_context():
+        db.session.add(FundMarketData(fund_code='000002', net_value=1.1, daily_change_rate=3.5, update_time=update_time + timedelta(days=1)))
+        db.session.commit()
+
+    data = json.loads(client.get('/api/market/sectors').data)
+    sectors = {item['sector_code']: item for item in data['items']}
+    assert sectors['C01']['daily_change_rate'] == '2.50'
+    assert sectors['C02']['daily_change_rate'] == '2.75'
+    assert data['items'][0]['sector_code'] == 'C02'
+
+    # 其他进程写入的行情（绕过本进程的提交钩子）与水位线同一时间时也要读到
+    from app.models.fund import FundLatestQuote
+    app.extensions['sector_aggregator'].refresh_seconds = 0
+    client.get('/api/market/sectors')
+    with app.app_context():
+        db.session.execute(FundLatestQuote.__table__.update().where(FundLatestQuote.fund_code == '000003').values(
+            market_data_id='other-process', daily_change_rate=4.0, update_time=update_time + timedelta(days=1)
+        ))
+        db.session.commit()
+
+    data = json.loads(client.get('/api/market/sectors').data)
+    sectors = {item['sector_code']: item for item in data['items']}
+    assert sectors['C02']['daily_change_rate'] == '3.75'
+
+    # 原地改写、保留 update_time 和 market_data_id 的行情按行情版本重建
+    from app.utils.quotes import upsert_latest_quotes
+    with app.app_context():
+        row = dict(db.session.execute(
+            db.select(FundLatestQuote.__table__).where(FundLatestQuote.fund_code == '000003')
+        ).mappings().one())
+        row['daily_change_rate'] = 6.0
+        upsert_latest_quotes(db.session.connection(), [row])
+        db.session.commit()
+    data = json.loads(client.get('/api/market/sectors').data)
+    sectors = {item['sector_code']: item for item in data['items']}
+    assert sectors['C02']['daily_change_rate'] == '4.75'
+
+
+
+def test_index_quotes_snapshot(client, app):
+    """测试指数行情写入后市场指数接口和分时接口读取新快照"""
+    app.config['MARKET_FEED_TOKEN'] = 'feed-token'
+    feed = {'items': [{
+        'index_code': '000001',
+        'index_name': '上证指数',
+        'current_point': 3250.12,
+        'previous_close': 3234.89,
+        'update_time': '2023-10-09T15:00:00',
+        'intraday': [['09:30', 3236.1], ['15:00', 3250.12]]
+    }]}
+
+    assert client.post('/api/market/index', json=feed).status_code == 403
+    response = client.post('/api/market/index', json=feed['items'], headers={'X-Feed-Token': 'feed-token'})
+    assert response.status_code == 400
+    response = client.post('/api/market/index', json=feed, headers={'X-Feed-Token': 'feed-token'})
+    assert response.status_code == 200
+
+    data = json.loads(client.get('/api/market/index').data)
+    assert data['items'][0]['current_point'] == '3250.12'
+    assert data['items'][0]['daily_change'] == '15.23'
+    assert data['items'][0]['daily_change_rate'] == '0.47'
+
+    data = json.loads(client.get('/api/market/index/000001/intraday').data)
+    assert data['trade_date'] == '2023-10-09'
+    assert [point['point'] for point in data['points']] == ['3236.10', '3250.12']
+
+
+
+def test_related_news_and_read_state(client, app):
+    """测试资讯按持仓基金打标签、相关资讯查询和已读状态"""
+    from flask_jwt_extended import create_access_token
+    from app import db
+    from app.models.user import User
+    from app.models.transaction import Holding
+
+    app.config['MARKET_FEED_TOKEN'] = 'feed-token'
+    with app.app_context():
+        user = User(username='newsreader', email='newsreader@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合'))
+        db.session.flush()
+        db.session.add(Holding(user_id=user.id, fund_code='000001', shares=100))
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+
+    feed = {'items': [
+        {'news_id': 'news_001', 'title': '华夏成长混合(000001)发布季度报告', 'publish_time': '2023-10-01T08:00:00'},
+        {'news_id': 'news_002', 'title': '央行发布最新货币政策', 'publish_time': '2023-10-02T08:00:00'}
+    ]}
+    response = client.post('/api/market/news', json=feed['items'], headers={'X-Feed-Token': 'feed-token'})
+    assert response.status_code == 400
+    response = client.post('/api/market/news', json=feed, headers={'X-Feed-Token': 'feed-token'})
+    assert json.loads(response.data)['created_count'] == 2
+
+    data = json.loads(client.get('/api/market/news/related', headers=headers).data)
+    assert [item['news_id'] for item in data['items']] == ['news_001']
+    assert data['items'][0]['related_funds'] == ['000001']
+    assert data['items'][0]['is_read'] is False
+
+    assert client.post('/api/market/news/news_001/read', headers=headers).status_code == 200
+    data = json.loads(client.get('/api/market/news', headers=headers).data)
+    assert {item['news_id']: item['is_read'] for item in data['items']} == {'news_001': True, 'news_002': False}
+
+    # 已读状态只记录最新的资讯：窗口之前的资讯视为已读，位图从窗口起点开始
+    app.config['NEWS_READ_WINDOW'] = 1
+    feed = {'items': [{'news_id': 'news_003', 'title': '基金发行回暖', 'publish_time': '2023-10-03T08:00:00'}]}
+    client.post('/api/market/news', json=feed, headers={'X-Feed-Token': 'feed-token'})
+    data = json.loads(client.get('/api/market/news', headers=headers).data)
+    assert {item['news_id']: item['is_read'] for item in data['items']} == {
+        'news_001': True, 'news_002': True, 'news_003': False
+    }
+    assert client.post('/api/market/news/news_003/read', headers=headers).status_code == 200
+    with app.app_context():
+        from app.models.news import News, UserNewsRead
+        row = db.session.get(UserNewsRead, user.id)
+        assert row.read_before_seq == News.query.filter_by(news_id='news_003').one().seq + 1
+        assert row.read_bitmap == b''
+
+
+def test_fund_analysis_reads_risk_metrics(client, app):
+    """测试基金分析读取批量计算的风险指标"""
+    from datetime import date, timedelta
+    from app import db
+    from app.models.fund import FundNavHistory
+    from app.utils.risk import refresh_risk_metrics
+
+    with app.app_context():
+        db.session.add(Fund(fund_code='000001', fund_name='华夏成长混合', risk_level='R3'))
+        start = date(2023, 1, 1)
+        # 1.0 -> 2.0 -> 1.5 -> 2.5：最大回撤 -25%，回到前高后修复
+        values = [1 + i / 30 for i in range(30)] + [2 - i / 40 for i in range(21)] + [1.5 + i / 20 for i in range(21)]
+        for i, value in enumerate(values):
+            db.session.add(FundNavHistory(fund_code='000001', nav_date=start + timedelta(days=i), net_value=value))
+        db.session.add(FundMarketData(fund_code='000001', net_value=values[-1]))
+        db.session.commit()
+
+        assert refresh_risk_metrics() == 1
+
+    response = client.get('/api/market/funds/000001/analysis')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    metrics = data['risk_metrics']
+    assert metrics['max_drawdown'] == -25.0
+    assert metrics['drawdown_peak_date'] == '2023-01-31'
+    assert metrics['drawdown_trough_date'] == '2023-02-20'
+    assert metrics['recovery_date'] is not None
+    assert '最大回撤' in data['risk_analysis']
+
+
+def test_sector_prediction_batch(client, app):
+    """测试板块趋势预测由批量任务计算后按板块读取"""
+    from datetime import date, timedelta
+    from app import db
+    from app.models.fund import FundNavHistory
+    from app.models.market import Sector, FundSector
+    from app.utils.sector_prediction import refresh_sector_predictions
+
+    with app.app_context():
+        for sector_code, fund_code, drift, days in [('C01', '000001', 0.01, 120), ('C02', '000002', -0.01, 120), ('C03', '000003', 0.01, 30)]:
+            db.session.add(Sector(sector_code=sector_code, sector_name=f'{sector_code}板块'))
+            db.session.add(Fund(fund_code=fund_code, fund_name=f'预测测试基金{fund_code}'))
+            db.session.add(FundSector(sector_code=sector_code, fund_code=fund_code))
+            value = 1.0
+            for i in range(days):
+                value *= 1 + drift + (0.002 if i % 2 else -0.002)
+                db.session.add(FundNavHistory(fund_code=fund_code, nav_date=date(2023, 10, 9) - timedelta(days=days - 1 - i), net_value=round(value, 4)))
+        db.session.commit()
+
+    assert client.get('/api/market/sectors/C01/prediction').status_code == 404
+
+    with app.app_context():
+        assert refresh_sector_predictions() == 2
+
+    data = json.loads(client.get('/api/market/sectors/C01/prediction').data)
+    assert data['prediction_trend'] == 'up'
+    assert data['prediction_id'] == 'pred_C01_20231009'
+    assert 50 < data['confidence_score'] <= 95
+    assert data['momentum_score'] > 0 and data['reversion_score'] > 0
+    assert 'C01板块' in data['prediction_basis']
+
+    data = json.loads(client.get('/api/market/sectors/C02/prediction').data)
+    assert data['prediction_trend'] == 'down'
+
+    # 历史不足的板块没有预测，未知板块返回404
+    assert client.get('/api/market/sectors/C03/prediction').status_code == 404
+    assert client.get('/api/market/sectors/C99/prediction').status_code == 404
+
+
+def test_market_stream_resume(client, app):
+    """测试行情推送：首次连接推送快照，行情变化推送增量，带 Last-Event-ID 重连时从断点补发"""
+    from datetime import datetime
+    from app import db
+
+    app.config.update(QUOTE_STREAM_POLL_SECONDS=0, QUOTE_STREAM_HEARTBEAT_SECONDS=0.05, QUOTE_STREAM_MAX_SECONDS=5)
+    with app.app_context():
+        db.session.add(Fund(fund_code='000001', fund_name='推送测试基金'))
+        db.session.add(FundMarketData(fund_code='000001', net_value=1.0, daily_change_rate=0.5, update_time=datetime(2023, 10, 9, 15)))
+        db.session.commit()
+
+    def read_event(chunks):
+        for chunk in chunks:
+            chunk = chunk.decode('utf-8')
+            if chunk.startswith('id:'):
+                fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+                return fields['id'], fields['event'], json.loads(fields['data'])
+
+    assert client.get('/api/market/stream').status_code == 400
+
+    response = client.get('/api/market/stream?funds=000001,000002')
+    assert response.mimetype == 'text/event-stream'
+    chunks = response.iter_encoded()
+    snapshot_id, event, data = read_event(chunks)
+    assert event == 'snapshot'
+    assert data['funds'][0]['net_value'] == '1.0000'
+
+    with app.app_context():
+        db.session.add(FundMarketData(fund_code='000001', net_value=1.1, daily_change_rate=10, update_time=datetime(2023, 10, 10, 15)))
+        db.session.commit()
+    event_id, event, data = read_event(chunks)
+    assert event == 'quotes'
+    assert [item['net_value'] for item in data['funds']] == ['1.1000']
+
+    # 与水位线同一时间、之后才写入的行情也要推送
+    with app.app_context():
+        db.session.add(Fund(fund_code='000002', fund_name='推送测试基金B'))
+        db.session.add(FundMarketData(fund_code='000002', net_value=2.0, daily_change_rate=1, update_time=datetime(2023, 10, 10, 15)))
+        db.session.commit()
+    _, event, data = read_event(chunks)
+    assert event == 'quotes'
+    assert [item['fund_code'] for item in data['funds']] == ['000002']
+    response.close()
+
+    # 从快照之后续传，补发错过的增量
+    response = client.get('/api/market/stream?funds=000001', headers={'Last-Event-ID': snapshot_id})
+    assert read_event(response.iter_encoded())[:2] == (event_id, 'quotes')
+    response.close()
+
+    # 无法识别的事件 ID 重新推送快照
+    response = client.get('/api/market/stream?funds=000001', headers={'Last-Event-ID': 'other-1'})
+    assert read_event(response.iter_encoded())[1] == 'snapshot'
+    response.close()
+
+
+def test_bulk_quote_ingest(client, app):
+    """测试批量导入每日行情文件：写入行情和净值，报告无效行，严格模式整体回滚"""
+    from app import db
+    from app.models.fund import FundNavHistory, FundLatestQuote
+
+    app.config['MARKET_FEED_TOKEN'] = 'feed-token'
+    headers = {'X-Feed-Token': 'feed-token', 'Content-Type': 'text/csv'}
+    with app.app_context():
+        for code in ('000001', '000002'):
+            db.session.add(Fund(fund_code=code, fund_name=f'导入测试基金{code}', fund_type='股票型'))
+        db.session.commit()
+
+    csv_data = (
+        'fund_code,nav_date,net_value,daily_change_rate,weekly_change_rate\n'
+        '000001,2023-10-09,1.2345,1.50,2.10\n'
+        '000002,2023-10-09,2.5000,-0.80,0.30\n'
+        '999999,2023-10-09,1.0000,,\n'
+        '000002,2023-10-09,abc,,\n'
+    )
+    assert client.post('/api/market/quotes', data=csv_data, headers={'Content-Type': 'text/csv'}).status_code == 403
+
+    response = client.post('/api/market/quotes?strict=true', data=csv_data, headers=headers)
+    assert response.status_code == 400
+    assert [error['line'] for error in json.loads(response.data)['errors']] == [4, 5]
+    with app.app_context():
+        assert db.session.query(FundNavHistory).count() == 0
+
+    for _ in range(2):
+        data = json.loads(client.post('/api/market/quotes', data=csv_data, headers=headers).data)
+        assert (data['rows'], data['loaded'], data['nav_rows'], data['skipped']) == (4, 2, 2, 2)
+    with app.app_context():
+        assert db.session.query(FundMarketData).count() == 2
+        quote = db.session.get(FundLatestQuote, '000001')
+        assert str(quote.net_value) == '1.2345' and str(quote.weekly_change_rate) == '2.10'
+
+    data = json.loads(client.get('/api/market/funds?board=losers').data)
+    assert data['items'][0]['fund_code'] == '000002'
+
+    # 文件已给出区间涨跌幅时同样重算同类排名
+    from app.models.fund import FundPeerRank
+    with app.app_context():
+        assert db.session.get(FundPeerRank, '000001').weekly_rank == 1
+
+
+def test_bulk_quote_ingest_computes_returns(client, app, tmp_path):
+    """测试导入不带区间涨跌幅的行情文件：由收益引擎计算，保留行情时间，重复导入结果不变，每次导入发布一次快照"""
+    from datetime import date, datetime, timedelta
+    from app import db
+    from app.models.fund import FundNavHistory, FundLatestQuote
+    from app.utils.market_snapshot import read_current_version
+
+    app.config['MARKET_FEED_TOKEN'] = 'feed-token'
+    app.config['MARKET_SNAPSHOT_DIR'] = str(tmp_path)
+    headers = {'X-Feed-Token': 'feed-token', 'Content-Type': 'text/csv'}
+    with app.app_context():
+        db.session.add(Fund(fund_code='000001', fund_name='导入测试基金'))
+        start = date(2023, 10, 9) - timedelta(days=10)
+        for i in range(10):
+            db.session.add(FundNavHistory(fund_code='000001', nav_date=start + timedelta(days=i), net_value=1.0))
+        db.session.commit()
+
+    csv_data = 'fund_code,nav_date,net_value\n000001,2023-10-09,1.1000\n'
+    for version in (1, 2):
+        assert json.loads(client.post('/api/market/quotes', data=csv_data, headers=headers).data)['loaded'] == 1
+        assert read_current_version(str(tmp_path)) == version
+    with app.app_context():
+        assert db.session.query(FundMarketData).count() == 1
+        quote = db.session.get(FundLatestQuote, '000001')
+        assert quote.update_time == datetime(2023, 10, 9, 15)
+        assert str(quote.weekly_change_rate) == '10.00'